@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+The MIT License (MIT)
+
+Copyright (c) 2017 Stefan Graupner
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Compare the per-url latency of cache lookup paths
+#
+# Fills a cache with synthetic entities and measures the old two step
+# lookup (`has` followed by `get`), the single round-trip `get_or_none`
+# and the batched `get_many` with a list page's worth of urls per call.
+# Requires a local Redis server unless another backend is selected.
+#
+#     python3 -m benchmarks.cache_lookup --entities 5000 --batch 100
+
+import argparse
+import time
+
+from oparl_validator.core.cache import Cache
+from oparl_validator.core.cache_backends import create_cache_backends
+
+
+def measure(description, urls, lookup):
+    start = time.perf_counter()
+    lookup(urls)
+    elapsed = time.perf_counter() - start
+
+    print('{:<16} {:>10.1f} µs/url'.format(description, elapsed / len(urls) * 1e6))
+
+
+def lookup_has_get(cache):
+    def lookup(urls):
+        for url in urls:
+            if cache.has(url):
+                cache.get(url)
+
+    return lookup
+
+
+def lookup_get_or_none(cache):
+    def lookup(urls):
+        for url in urls:
+            cache.get_or_none(url)
+
+    return lookup
+
+
+def lookup_get_many(cache, batch_size):
+    def lookup(urls):
+        for offset in range(0, len(urls), batch_size):
+            cache.get_many(urls[offset:offset + batch_size])
+
+    return lookup
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cache lookup micro-benchmark')
+    parser.add_argument('--entities', type=int, default=5000)
+    parser.add_argument('--batch', type=int, default=100, help='urls per get_many call, i.e. a list page')
+    parser.add_argument('--backend', default='redis', choices=['redis', 'sqlite', 'memory'])
+    args = parser.parse_args()
+
+    tiers = create_cache_backends(args.backend, path='cache_benchmark.sqlite')
+    cache = Cache(basekey='OParlValidator_Benchmark_{}_'.format(int(time.time())), tiers=tiers)
+
+    urls = ['https://oparl.example.org/paper/{}'.format(i) for i in range(args.entities)]
+    document = '{"id": "%s", "type": "https://schema.oparl.org/1.0/Paper", "name": "' + 'x' * 512 + '"}'
+    cache.set_many(dict((url, document % url) for url in urls))
+
+    print('{} cached entities, {} backend'.format(args.entities, args.backend))
+    measure('has + get', urls, lookup_has_get(cache))
+    measure('get_or_none', urls, lookup_get_or_none(cache))
+    measure('get_many', urls, lookup_get_many(cache, args.batch))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,549 @@
+#!/usr/bin/env python3
+"""
+The MIT License (MIT)
+
+Copyright (c) 2017 Stefan Graupner
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Synthetic OParl endpoint for benchmarks
+#
+# Serves a System with a configurable number of bodies, each listing
+# organizations, persons, meetings and papers on paginated lists. Papers
+# embed their main files, whose access and download urls serve synthetic
+# documents. Entities are generated on request from their ids, so large
+# endpoints do not need any memory. Everything is deterministic for the
+# same seed, except for the errors injected at `--error_rate`.
+#
+#     python3 -m benchmarks.oparl_server --port 8080 --bodies 3 --papers 10000 --latency 0.02
+#
+# The endpoint is then http://localhost:8080/oparl/v1/system
+
+import argparse
+from datetime import datetime, timedelta, timezone
+from email.utils import formatdate
+import hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import random
+import re
+import sys
+from threading import Lock, Thread
+import time
+from urllib.parse import parse_qs, urlencode, urlparse
+
+from oparl_validator.core.utils import sha1_hexdigest
+
+SCHEMA = 'https://schema.oparl.org/1.0/'
+
+ENTITY_LISTS = {
+    'organization': 'Organization',
+    'person': 'Person',
+    'meeting': 'Meeting',
+    'paper': 'Paper'
+}
+
+# all entities were modified in the 30 days before this date
+EPOCH = datetime(2018, 1, 1, tzinfo=timezone.utc)
+
+
+class Configuration:
+    """
+        Shape of a synthetic endpoint
+
+        `shared` is the fraction of organizations and persons which are
+        the same entities in all bodies, `invalid_rate` the fraction of
+        entities with validation errors and `error_rate` the fraction
+        of requests answered with a server error. Requests exceeding a
+        `capacity` of concurrent requests are answered with 429.
+    """
+
+    def __init__(self, bodies=1, organizations=10, persons=50, meetings=100, papers=500, files_per_paper=1,
+                 file_size=64 * 1024, page_size=100, latency=0, error_rate=0, invalid_rate=0, shared=0, seed=0,
+                 capacity=0):
+        self.bodies = bodies
+        self.counts = {
+            'organization': organizations,
+            'person': persons,
+            'meeting': meetings,
+            'paper': papers
+        }
+        self.files_per_paper = files_per_paper
+        self.file_size = file_size
+        self.page_size = page_size
+        self.latency = latency
+        self.error_rate = error_rate
+        self.invalid_rate = invalid_rate
+        self.shared = shared
+        self.seed = seed
+        self.capacity = capacity
+
+    def num_entities(self):
+        """ Number of distinct entities including bodies and files """
+        total = self.bodies
+
+        for list_name, count in self.counts.items():
+            if list_name in ['organization', 'person']:
+                shared = sum(1 for index in range(count) if self.is_shared(index))
+                total += shared + (count - shared) * self.bodies
+            else:
+                total += count * self.bodies
+
+        return total + self.counts['paper'] * self.bodies * self.files_per_paper
+
+    def is_shared(self, index):
+        if self.shared <= 0:
+            return False
+
+        return index % max(int(round(1 / self.shared)), 1) == 0
+
+    def chance(self, rate, *key):
+        """ Deterministic decision with the given probability for a key """
+        if rate <= 0:
+            return False
+
+        return int(sha1_hexdigest('{}:{}'.format(self.seed, key))[:8], 16) / 0xffffffff < rate
+
+
+class OParlGenerator:
+    """ Generates the documents of a synthetic endpoint from their paths """
+
+    def __init__(self, configuration, base_url):
+        self.configuration = configuration
+        self.base_url = base_url
+
+    def url(self, path, **query):
+        if len(query) > 0:
+            return '{}{}?{}'.format(self.base_url, path, urlencode(query))
+
+        return '{}{}'.format(self.base_url, path)
+
+    def modified(self, *key):
+        minutes = int(sha1_hexdigest('{}:{}'.format(self.configuration.seed, key))[:6], 16) % (30 * 24 * 60)
+        return EPOCH - timedelta(minutes=minutes)
+
+    def dates(self, *key):
+        modified = self.modified(*key)
+
+        return {
+            'created': (modified - timedelta(days=365)).isoformat(),
+            'modified': modified.isoformat()
+        }
+
+    def system(self):
+        return dict({
+            'id': self.url('/oparl/v1/system'),
+            'type': SCHEMA + 'System',
+            'oparlVersion': SCHEMA,
+            'name': 'Synthetic OParl Endpoint',
+            'body': self.url('/oparl/v1/body')
+        }, **self.dates('system'))
+
+    def body(self, body):
+        document = {
+            'id': self.url('/oparl/v1/body/{}'.format(body)),
+            'type': SCHEMA + 'Body',
+            'system': self.url('/oparl/v1/system'),
+            'name': 'Body {}'.format(body),
+            'legislativeTerm': []
+        }
+
+        for list_name in ENTITY_LISTS:
+            document[list_name] = self.url('/oparl/v1/body/{}/{}'.format(body, list_name))
+
+        document.update(self.dates('body', body))
+
+        return document
+
+    def entity_owner(self, list_name, body, index):
+        """ Shared entities belong to the first body """
+        if list_name in ['organization', 'person'] and self.configuration.is_shared(index):
+            return 0
+
+        return body
+
+    def entity(self, list_name, body, index):
+        body = self.entity_owner(list_name, body, index)
+
+        document = {
+            'id': self.url('/oparl/v1/body/{}/{}/{}'.format(body, list_name, index)),
+            'type': SCHEMA + ENTITY_LISTS[list_name],
+            'name': '{} {}'.format(ENTITY_LISTS[list_name], index)
+        }
+
+        document.update(self.dates(list_name, body, index))
+
+        if list_name in ['organization', 'person', 'paper']:
+            document['body'] = self.url('/oparl/v1/body/{}'.format(body))
+
+        if list_name == 'meeting':
+            start = self.modified(list_name, body, index) + timedelta(days=7)
+            document['start'] = start.isoformat()
+            document['end'] = (start + timedelta(hours=2)).isoformat()
+
+        if list_name == 'paper':
+            document['reference'] = 'DS {}/{}'.format(body, index)
+            files = [self.file(body, index, number) for number in range(self.configuration.files_per_paper)]
+
+            if len(files) > 0:
+                document['mainFile'] = files[0]
+                document['auxiliaryFile'] = files[1:]
+
+        if self.configuration.chance(self.configuration.invalid_rate, 'invalid', list_name, body, index):
+            document['modified'] = 'yesterday'
+
+        return document
+
+    def file(self, body, paper, number):
+        path = '/oparl/v1/body/{}/file/{}-{}'.format(body, paper, number)
+
+        document = {
+            'id': self.url(path),
+            'type': SCHEMA + 'File',
+            'name': 'Attachment {} of paper {}'.format(number, paper),
+            'fileName': 'paper-{}-{}.pdf'.format(paper, number),
+            'mimeType': 'application/pdf',
+            'size': self.configuration.file_size,
+            'sha1Checksum': hashlib.sha1(self.file_content(path)).hexdigest(),
+            'accessUrl': self.url(path + '/access'),
+            'downloadUrl': self.url(path + '/download')
+        }
+
+        document.update(self.dates('file', body, paper, number))
+
+        if self.configuration.chance(self.configuration.invalid_rate, 'invalid', 'file', body, paper, number):
+            del document['accessUrl']
+
+        return document
+
+    def file_content(self, path):
+        seed = sha1_hexdigest('{}:{}'.format(self.configuration.seed, path)).encode('ascii')
+        return (seed * (self.configuration.file_size // len(seed) + 1))[:self.configuration.file_size]
+
+    def entity_list(self, list_name, body, page, modified_since=None):
+        count = self.configuration.counts[list_name] if list_name != 'body' else self.configuration.bodies
+        indices = range(count)
+
+        if modified_since is not None:
+            key = lambda index: ('body', index) if list_name == 'body' else \
+                (list_name, self.entity_owner(list_name, body, index), index)
+            indices = [index for index in indices if self.modified(*key(index)) >= modified_since]
+
+        page_size = self.configuration.page_size
+        total_pages = max((len(indices) + page_size - 1) // page_size, 1)
+        page_indices = indices[(page - 1) * page_size:page * page_size]
+
+        if list_name == 'body':
+            path = '/oparl/v1/body'
+            data = [self.body(index) for index in page_indices]
+        else:
+            path = '/oparl/v1/body/{}/{}'.format(body, list_name)
+            data = [self.entity(list_name, body, index) for index in page_indices]
+
+        query = {}
+        if modified_since is not None:
+            query['modified_since'] = modified_since.isoformat()
+
+        links = {
+            'first': self.url(path, **query),
+            'last': self.url(path, page=total_pages, **query)
+        }
+
+        if page < total_pages:
+            links['next'] = self.url(path, page=page + 1, **query)
+
+        if page > 1:
+            links['prev'] = self.url(path, page=page - 1, **query)
+
+        return {
+            'data': data,
+            'pagination': {
+                'totalElements': len(indices),
+                'elementsPerPage': page_size,
+                'currentPage': page,
+                'totalPages': total_pages
+            },
+            'links': links
+        }
+
+
+class OParlRequestHandler(BaseHTTPRequestHandler):
+    """ Serves the documents of the server's OParlGenerator """
+
+    protocol_version = 'HTTP/1.1'
+
+    routes = [
+        (re.compile(r'^/oparl/v1/system$'), 'handle_system'),
+        (re.compile(r'^/oparl/v1/body$'), 'handle_body_list'),
+        (re.compile(r'^/oparl/v1/body/(\d+)$'), 'handle_body'),
+        (re.compile(r'^/oparl/v1/body/(\d+)/(organization|person|meeting|paper)$'), 'handle_entity_list'),
+        (re.compile(r'^/oparl/v1/body/(\d+)/(organization|person|meeting|paper)/(\d+)$'), 'handle_entity'),
+        (re.compile(r'^/oparl/v1/body/(\d+)/file/(\d+)-(\d+)$'), 'handle_file'),
+        (re.compile(r'^/oparl/v1/body/(\d+)/file/(\d+)-(\d+)/(access|download)$'), 'handle_file_content')
+    ]
+
+    def do_GET(self):
+        self.handle_request(send_body=True)
+
+    def do_HEAD(self):
+        self.handle_request(send_body=False)
+
+    def handle_request(self, send_body):
+        self.server.count_request()
+
+        if not self.server.enter():
+            return self.send_document(429, b'Too many requests', 'text/plain', send_body, {'Retry-After': '1'})
+
+        try:
+            self.route_request(send_body)
+        finally:
+            self.server.leave()
+
+    def route_request(self, send_body):
+        configuration = self.server.generator.configuration
+        if configuration.latency > 0:
+            time.sleep(configuration.latency)
+
+        components = urlparse(self.path)
+        self.query = parse_qs(components.query)
+
+        for pattern, handler in self.routes:
+            match = pattern.match(components.path)
+            if match is None:
+                continue
+
+            if components.path != '/oparl/v1/system' and self.server.inject_error():
+                return self.send_document(500, b'Injected error', 'text/plain', send_body)
+
+            try:
+                return getattr(self, handler)(send_body, *match.groups())
+            except ValueError:
+                return self.send_document(400, b'Bad request', 'text/plain', send_body)
+
+        self.send_document(404, b'Not found', 'text/plain', send_body)
+
+    def get_page(self):
+        try:
+            return max(int(self.query.get('page', ['1'])[0]), 1)
+        except ValueError:
+            return 1
+
+    def get_modified_since(self):
+        if 'modified_since' not in self.query:
+            return None
+
+        modified_since = datetime.fromisoformat(self.query['modified_since'][0])
+        if modified_since.tzinfo is None:
+            modified_since = modified_since.replace(tzinfo=timezone.utc)
+
+        return modified_since
+
+    def handle_system(self, send_body):
+        self.send_json(self.server.generator.system(), send_body)
+
+    def handle_body_list(self, send_body):
+        document = self.server.generator.entity_list('body', None, self.get_page(), self.get_modified_since())
+        self.send_json(document, send_body)
+
+    def handle_body(self, send_body, body):
+        if int(body) >= self.server.generator.configuration.bodies:
+            return self.send_document(404, b'Not found', 'text/plain', send_body)
+
+        self.send_json(self.server.generator.body(int(body)), send_body)
+
+    def handle_entity_list(self, send_body, body, list_name):
+        document = self.server.generator.entity_list(list_name, int(body), self.get_page(), self.get_modified_since())
+        self.send_json(document, send_body)
+
+    def handle_entity(self, send_body, body, list_name, index):
+        self.send_json(self.server.generator.entity(list_name, int(body), int(index)), send_body)
+
+    def handle_file(self, send_body, body, paper, number):
+        self.send_json(self.server.generator.file(int(body), int(paper), int(number)), send_body)
+
+    def handle_file_content(self, send_body, body, paper, number, kind):
+        path = '/oparl/v1/body/{}/file/{}-{}'.format(body, paper, number)
+        content = self.server.generator.file_content(path)
+        headers = {'Accept-Ranges': 'bytes'}
+
+        if kind == 'download':
+            headers['Content-Disposition'] = 'attachment; filename="paper-{}-{}.pdf"'.format(paper, number)
+
+        status = 200
+        match = re.match(r'^bytes=(\d+)-(\d*)$', self.headers.get('Range', ''))
+        if match is not None:
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else len(content) - 1
+            headers['Content-Range'] = 'bytes {}-{}/{}'.format(start, end, len(content))
+            content = content[start:end + 1]
+            status = 206
+
+        self.send_document(status, content, 'application/pdf', send_body, headers)
+
+    def send_json(self, document, send_body):
+        self.send_document(200, json.dumps(document).encode('utf-8'), 'application/json; charset=utf-8', send_body)
+
+    def send_document(self, status, content, content_type, send_body, headers=None):
+        etag = '"{}"'.format(hashlib.sha1(content).hexdigest())
+
+        if status == 200 and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        self.send_header('Date', formatdate(usegmt=True))
+
+        if status == 200:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'max-age={}'.format(self.server.max_age))
+
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+
+        self.end_headers()
+
+        if send_body:
+            self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class OParlServer(ThreadingHTTPServer):
+    """ Threaded HTTP server of a synthetic OParl endpoint """
+
+    daemon_threads = True
+
+    def __init__(self, configuration, host='localhost', port=0, max_age=3600):
+        super(OParlServer, self).__init__((host, port), OParlRequestHandler)
+        self.generator = OParlGenerator(configuration, 'http://{}:{}'.format(host, self.server_port))
+        self.max_age = max_age
+        self.lock = Lock()
+        self.random = random.Random(configuration.seed)
+        self.num_requests = 0
+        self.num_concurrent = 0
+        self.num_throttled = 0
+
+    @property
+    def endpoint(self):
+        return self.generator.url('/oparl/v1/system')
+
+    def handle_error(self, request, client_address):
+        # clients verifying large files drop their connections once they have read enough
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+
+        super(OParlServer, self).handle_error(request, client_address)
+
+    def count_request(self):
+        with self.lock:
+            self.num_requests += 1
+
+    def enter(self):
+        """ Admits a request, unless the server is at its capacity """
+        with self.lock:
+            capacity = self.generator.configuration.capacity
+
+            if capacity > 0 and self.num_concurrent >= capacity:
+                self.num_throttled += 1
+                return False
+
+            self.num_concurrent += 1
+            return True
+
+    def leave(self):
+        with self.lock:
+            self.num_concurrent -= 1
+
+    def inject_error(self):
+        with self.lock:
+            return self.random.random() < self.generator.configuration.error_rate
+
+    def start(self):
+        """ Serves in a background thread """
+        thread = Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+
+        return self
+
+
+def add_arguments(parser):
+    parser.add_argument('--bodies', type=int, default=1)
+    parser.add_argument('--organizations', type=int, default=10)
+    parser.add_argument('--persons', type=int, default=50)
+    parser.add_argument('--meetings', type=int, default=100)
+    parser.add_argument('--papers', type=int, default=500)
+    parser.add_argument('--files_per_paper', type=int, default=1)
+    parser.add_argument('--file_size', type=int, default=64 * 1024)
+    parser.add_argument('--page_size', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0, help='Seconds every request is delayed')
+    parser.add_argument('--error_rate', type=float, default=0, help='Fraction of requests failing with 500')
+    parser.add_argument('--invalid_rate', type=float, default=0, help='Fraction of entities with errors')
+    parser.add_argument('--shared', type=float, default=0,
+                        help='Fraction of organizations and persons shared between all bodies')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--capacity', type=int, default=0,
+                        help='Concurrent requests served before answering 429, 0 for no limit')
+
+
+def create_configuration(args):
+    return Configuration(
+        bodies=args.bodies,
+        organizations=args.organizations,
+        persons=args.persons,
+        meetings=args.meetings,
+        papers=args.papers,
+        files_per_paper=args.files_per_paper,
+        file_size=args.file_size,
+        page_size=args.page_size,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        invalid_rate=args.invalid_rate,
+        shared=args.shared,
+        seed=args.seed,
+        capacity=args.capacity
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Synthetic OParl endpoint')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8080)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    configuration = create_configuration(args)
+    server = OParlServer(configuration, args.host, args.port)
+
+    print('Serving {} entities at {}'.format(configuration.num_entities(), server.endpoint))
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+The MIT License (MIT)
+
+Copyright (c) 2017 Stefan Graupner
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Measure validation throughput against the number of validation processes
+#
+# Validates an endpoint once to warm the cache and then once per given
+# process count (0 validates in threads), so that the numbers reflect
+# validation rather than network throughput.
+#
+#     python3 -m benchmarks.process_scaling --cache sqlite --processes 0 1 2 4 8 16 32 https://my.oparl.endpoint/
+
+import argparse
+import time
+
+from oparl_validator.core.validator import Validator
+
+
+def create_options(args, processes):
+    return argparse.Namespace(
+        format='json',
+        num_workers=args.num_workers,
+        queue_size=1000,
+        porcelain=False,
+        result=None,
+        read=False,
+        silent=True,
+        verbosity=0,
+        cache=args.cache,
+        processes=processes
+    )
+
+
+def run_validation(endpoint, options):
+    validator = Validator(endpoint, options)
+    validator.client = validator.create_client()
+
+    start = time.perf_counter()
+    result = validator.validate()
+    elapsed = time.perf_counter() - start
+
+    return result.total_entities, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Validation throughput per number of processes')
+    parser.add_argument('endpoint')
+    parser.add_argument('--processes', type=int, nargs='+', default=[0, 1, 2, 4, 8])
+    parser.add_argument('--num_workers', type=int, default=3)
+    parser.add_argument('--cache', default='redis', choices=['redis', 'sqlite'])
+    args = parser.parse_args()
+
+    run_validation(args.endpoint, create_options(args, 0))
+
+    print('{:>9} {:>9} {:>9} {:>12}'.format('processes', 'entities', 'seconds', 'entities/s'))
+
+    for processes in args.processes:
+        entities, elapsed = run_validation(args.endpoint, create_options(args, processes))
+        print('{:>9} {:>9} {:>9.1f} {:>12.1f}'.format(processes, entities, elapsed, entities / elapsed))
+
+
+if __name__ == '__main__':
+    main()
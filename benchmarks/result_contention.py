@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+The MIT License (MIT)
+
+Copyright (c) 2017 Stefan Graupner
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Compare result aggregation under contention
+#
+# Several threads record synthetic validation messages, either into one
+# shared Result guarded by its lock (the former behaviour of the workers)
+# or into accumulators of their own which are merged at the end.
+#
+#     python3 -m benchmarks.result_contention --threads 8 --entities 20000
+
+import argparse
+from threading import Thread
+import time
+
+from oparl_validator.core.result import Result, ResultAccumulator
+
+DESCRIPTIONS = [
+    'Object is missing a name',
+    'Date is not formatted correctly',
+    'Url does not resolve',
+    'Keyword list is empty'
+]
+
+
+def record_messages(target, thread_index, num_entities, lock=None):
+    for entity_index in range(num_entities):
+        entity_id = 'https://oparl.example.org/paper/{}-{}'.format(thread_index, entity_index)
+
+        if lock is not None:
+            lock.acquire()
+
+        target.failed_entities += 1
+        for description in DESCRIPTIONS:
+            target.add_message('Paper', entity_id, 'warning', description)
+
+        if lock is not None:
+            lock.release()
+
+
+def run_threads(targets):
+    threads = [Thread(target=target) for target in targets]
+
+    start = time.perf_counter()
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    return time.perf_counter() - start
+
+
+def shared_result(args):
+    result = Result()
+
+    return run_threads([
+        lambda index=index: record_messages(result, index, args.entities, result.lock)
+        for index in range(args.threads)
+    ])
+
+
+def merged_accumulators(args):
+    result = Result()
+    accumulators = [ResultAccumulator() for _ in range(args.threads)]
+
+    elapsed = run_threads([
+        lambda index=index: record_messages(accumulators[index], index, args.entities)
+        for index in range(args.threads)
+    ])
+
+    start = time.perf_counter()
+    for accumulator in accumulators:
+        result.merge(accumulator)
+
+    return elapsed + time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Result aggregation contention benchmark')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--entities', type=int, default=20000, help='entities per thread')
+    args = parser.parse_args()
+
+    messages = args.threads * args.entities * len(DESCRIPTIONS)
+
+    for name, benchmark in [('shared result', shared_result), ('merged accumulators', merged_accumulators)]:
+        elapsed = benchmark(args)
+        print('{:<20} {:>8.2f}s {:>12.0f} messages/s'.format(name, elapsed, messages / elapsed))
+
+
+if __name__ == '__main__':
+    main()
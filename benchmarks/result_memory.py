@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+The MIT License (MIT)
+
+Copyright (c) 2017 Stefan Graupner
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Peak memory of recording affected entities for a synthetic large run
+#
+# One message is recorded for a million papers (configurable), once with
+# the former representation (a plain list of id strings), once into a
+# Result with compact id lists and once in count plus sample mode.
+#
+#     python3 -m benchmarks.result_memory --entities 1000000 --samples 100
+
+import argparse
+import tracemalloc
+
+from oparl_validator.core.result import Result
+
+
+def entity_ids(num_entities):
+    for index in range(num_entities):
+        yield 'https://oparl.example.org/api/paper/{}'.format(index)
+
+
+def id_strings(args):
+    objects = []
+
+    for entity_id in entity_ids(args.entities):
+        objects.append(entity_id)
+
+    return objects
+
+
+def compact_result(args, max_samples=None):
+    result = Result(max_samples=max_samples)
+
+    for entity_id in entity_ids(args.entities):
+        result.add_message('Paper', entity_id, 'warning', 'Paper has no main file')
+
+    return result
+
+
+def measure(description, benchmark):
+    tracemalloc.start()
+    retained = benchmark()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print('{:<24} {:>10.1f} MiB peak'.format(description, peak / 1024 / 1024))
+
+    return retained
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Affected entity storage memory benchmark')
+    parser.add_argument('--entities', type=int, default=1000000)
+    parser.add_argument('--samples', type=int, default=100)
+    args = parser.parse_args()
+
+    measure('id strings (before)', lambda: id_strings(args))
+    measure('compact id list', lambda: compact_result(args))
+    measure('count plus sample', lambda: compact_result(args, args.samples))
+
+
+if __name__ == '__main__':
+    main()
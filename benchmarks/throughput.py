@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+The MIT License (MIT)
+
+Copyright (c) 2017 Stefan Graupner
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# End-to-end validation throughput against a synthetic OParl endpoint
+#
+# Starts the synthetic endpoint of benchmarks.oparl_server (or uses the
+# given one) and validates it once per combination of worker count and
+# queue size. Every validation runs in a fresh process with a cold
+# in-memory cache, so that its peak RSS and CPU time are its own.
+# Reports entities per second, the median and 99th percentile latency
+# of all responses, the peak RSS and the CPU time of the validation.
+#
+#     python3 -m benchmarks.throughput --bodies 3 --papers 5000 --latency 0.02 \
+#         --num_workers 1 3 8 16 --queue_size 100 1000
+
+import argparse
+import multiprocessing
+import resource
+import time
+
+from benchmarks.oparl_server import OParlServer, add_arguments, create_configuration
+from oparl_validator.core.validator import Validator
+
+
+def create_options(args, num_workers, queue_size):
+    return argparse.Namespace(
+        format='json',
+        num_workers=num_workers,
+        queue_size=queue_size,
+        porcelain=False,
+        result=None,
+        read=False,
+        silent=True,
+        verbosity=0,
+        cache='memory',
+        prefetch=args.prefetch,
+        processes=args.processes
+    )
+
+
+def percentile(values, fraction):
+    if len(values) == 0:
+        return 0
+
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def run_validation(endpoint, options):
+    """ Validates the endpoint, runs in a process of its own """
+    validator = Validator(endpoint, options)
+    validator.client = validator.create_client()
+
+    latencies = []
+    validator.client.transport.session.hooks['response'].append(
+        lambda response, *args, **kwargs: latencies.append(response.elapsed.total_seconds())
+    )
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    start = time.perf_counter()
+
+    result = validator.validate()
+
+    elapsed = time.perf_counter() - start
+    end_usage = resource.getrusage(resource.RUSAGE_SELF)
+
+    return {
+        'entities': result.total_entities,
+        'seconds': elapsed,
+        'p50': percentile(latencies, 0.5),
+        'p99': percentile(latencies, 0.99),
+        # ru_maxrss is given in KiB on Linux
+        'peak_rss': end_usage.ru_maxrss * 1024,
+        'cpu': (end_usage.ru_utime + end_usage.ru_stime) - (usage.ru_utime + usage.ru_stime)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Validation throughput against a synthetic endpoint')
+    parser.add_argument('--endpoint', default=None, help='Validate this endpoint instead of a synthetic one')
+    parser.add_argument('--num_workers', type=int, nargs='+', default=[1, 3, 8])
+    parser.add_argument('--queue_size', type=int, nargs='+', default=[1000])
+    parser.add_argument('--prefetch', type=int, default=8)
+    parser.add_argument('--processes', type=int, default=0)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    endpoint = args.endpoint
+    if endpoint is None:
+        configuration = create_configuration(args)
+        server = OParlServer(configuration).start()
+        endpoint = server.endpoint
+
+        print('Serving {} entities at {}'.format(configuration.num_entities(), endpoint))
+
+    # validations must not share the memory and cpu time of each other
+    context = multiprocessing.get_context('spawn')
+
+    print('{:>7} {:>7} {:>9} {:>9} {:>11} {:>9} {:>9} {:>10} {:>9}'.format(
+        'workers', 'queue', 'entities', 'seconds', 'entities/s', 'p50 ms', 'p99 ms', 'rss MiB', 'cpu s'
+    ))
+
+    for num_workers in args.num_workers:
+        for queue_size in args.queue_size:
+            with context.Pool(1) as pool:
+                statistics = pool.apply(run_validation, (endpoint, create_options(args, num_workers, queue_size)))
+
+            print('{:>7} {:>7} {:>9} {:>9.1f} {:>11.1f} {:>9.1f} {:>9.1f} {:>10.1f} {:>9.1f}'.format(
+                num_workers,
+                queue_size,
+                statistics['entities'],
+                statistics['seconds'],
+                statistics['entities'] / statistics['seconds'],
+                statistics['p50'] * 1000,
+                statistics['p99'] * 1000,
+                statistics['peak_rss'] / (1024 * 1024),
+                statistics['cpu']
+            ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2017 Stefan Graupner
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from datetime import timedelta
+import io
+import json
+import shutil
+import tempfile
+from threading import Lock
+import time
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+
+class ArchiveWriter:
+    """
+        Records HTTP responses into an archive file
+
+        The archive is a sequence of records, each made of a JSON header
+        line describing the request and response followed by the raw
+        response body, whose length is given in the header. Responses are
+        passed in through a requests response hook, see Transport.record.
+
+        Streamed responses, i.e. file downloads, are not read by the hook,
+        as that would load their body into memory. Their readers record
+        the chunks they read through an ArchiveStream instead.
+    """
+
+    def __init__(self, file_name):
+        self.file = open(file_name, 'wb')
+        self.lock = Lock()
+        self.num_records = 0
+
+    def record(self, response, *args, **kwargs):
+        if kwargs.get('stream', False):
+            return
+
+        body = response.content or b''
+        self.write(response, io.BytesIO(body), len(body))
+
+    def stream(self, response):
+        """ Returns an ArchiveStream recording the chunks read from a streamed response """
+        return ArchiveStream(self, response)
+
+    def write(self, response, body, length):
+        """ Writes the record of a response, with `length` bytes of the file object `body` """
+        header = {
+            'method': response.request.method,
+            'url': response.request.url,
+            'status': response.status_code,
+            'reason': response.reason,
+            'headers': dict(response.headers),
+            'elapsed': response.elapsed.total_seconds(),
+            'length': length
+        }
+
+        with self.lock:
+            self.file.write(json.dumps(header).encode('utf-8') + b'\n')
+            shutil.copyfileobj(body, self.file)
+            self.file.flush()
+            self.num_records += 1
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+class ArchiveStream:
+    """
+        The body of a streamed response on its way into the archive
+
+        Readers write every chunk they read from the response. Chunks
+        are spooled to a temporary file, as the length of the body has
+        to be known before it is added to the archive on close. Only
+        the chunks actually read are recorded, which is what a replay
+        of the same reads needs.
+    """
+
+    # bodies up to this size are spooled in memory
+    max_memory_size = 1024 * 1024
+
+    def __init__(self, writer, response):
+        self.writer = writer
+        self.response = response
+        self.body = tempfile.SpooledTemporaryFile(max_size=self.max_memory_size)
+        self.length = 0
+
+    def write(self, chunk):
+        self.body.write(chunk)
+        self.length += len(chunk)
+
+    def close(self):
+        self.body.seek(0)
+        self.writer.write(self.response, self.body, self.length)
+        self.body.close()
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+        Serves the responses of an archive instead of the network
+
+        All records are indexed by method and url when the archive is
+        opened. Responses to the same request are served in the order
+        they were recorded, the last one is repeated once all of them
+        were served. Requests which are not in the archive fail like an
+        unreachable host would.
+
+        With `latency`, every response is delayed by the time the
+        recorded response took.
+    """
+
+    def __init__(self, file_name, latency=False):
+        super(ReplayAdapter, self).__init__()
+        self.file_name = file_name
+        self.latency = latency
+        self.lock = Lock()
+        self.index = {}
+        self.served = {}
+
+        self.statistics = {
+            'served': 0,
+            'missing': 0
+        }
+
+        self.read_index()
+
+    def read_index(self):
+        """ Reads the headers of all records and remembers the offsets of their bodies """
+        with open(self.file_name, 'rb') as f:
+            while True:
+                line = f.readline()
+
+                if not line:
+                    break
+
+                header = json.loads(line.decode('utf-8'))
+                key = (header['method'], header['url'])
+
+                self.index.setdefault(key, []).append((header, f.tell()))
+                f.seek(header['length'], 1)
+
+    def get_record(self, method, url):
+        with self.lock:
+            records = self.index.get((method, url))
+
+            if records is None:
+                self.statistics['missing'] += 1
+                return None, None
+
+            position = self.served.get((method, url), 0)
+            self.served[(method, url)] = position + 1
+            self.statistics['served'] += 1
+
+        header, offset = records[min(position, len(records) - 1)]
+
+        with open(self.file_name, 'rb') as f:
+            f.seek(offset)
+            body = f.read(header['length'])
+
+        return header, body
+
+    def send(self, request, **kwargs):
+        header, body = self.get_record(request.method, request.url)
+
+        if header is None:
+            raise requests.exceptions.ConnectionError('{} {} is not in the archive'.format(request.method, request.url))
+
+        if self.latency:
+            time.sleep(header['elapsed'])
+
+        response = requests.Response()
+        response.status_code = header['status']
+        response.reason = header['reason']
+        response.headers = CaseInsensitiveDict(header['headers'])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.elapsed = timedelta(seconds=header['elapsed'])
+        response.connection = self
+        response._content = body
+
+        # streamed reads are served from the body, there is no raw connection to read from or close
+        response._content_consumed = True
+
+        return response
+
+    def close(self):
+        pass
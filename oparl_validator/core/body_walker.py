@@ -25,7 +25,6 @@ SOFTWARE.
 from threading import Thread
 
 from oparl_validator.core.output import Output
-from oparl_validator.core.seen_list import SeenList
 from oparl_validator.core.utils import sha1_hexdigest
 
 import gi
@@ -36,20 +35,38 @@ class BodyWalker(Thread):
     """
         Worker Thread for fetching all entities from an OParl Body.
 
-        This may yield entities which are linked to multiple bodies,
-        which is not dealt with during the fetching process as that
-        would require communication between the fetching threads
-        which would slow the whole process down and in a worst
-        case even completely abolish all the benefits of fetching
-        in multiple threads.
+        This may yield entities which are linked to multiple bodies.
+        All walkers of a validation run share one seen list, so that
+        every entity is only enqueued by the walker which found it first.
+
+        With `created_since`, a unix timestamp, the walker counts the
+        entities created after it, e.g. to tell new entities apart from
+        changed ones in incremental validations. The filtered lists of
+        incremental validations also contain the entities deleted since
+        then, which are not validated but remembered in `deleted_ids`.
+        Those of them which existed before `created_since` are counted
+        in `num_deleted`.
     """
-    def __init__(self, client, body, queue):
+    def __init__(self, client, body, queue, seen_list, created_since=None):
         super(BodyWalker, self).__init__()
         self.client = client
         self.body = body
         self.queue = queue
         self.id = 'walker_{}'.format(sha1_hexdigest(self.body.get_id())[:6])
-        self.seen_list = SeenList()
+
+        # identifies the walker in the fetch metrics of the client
+        self.name = self.id
+        self.seen_list = seen_list
+        self.num_enqueued = 0
+        self.created_since = created_since
+        self.num_created = 0
+        self.deleted_ids = set()
+        self.num_deleted = 0
+        self.finished = False
+        self.finished_lists = []
+
+        # registered right away so that the queue is not considered drained before the walker started
+        self.queue.add_enqueuing_flag(self.id)
 
     def connect_signals(self):
         """
@@ -76,10 +93,9 @@ class BodyWalker(Thread):
             self.body.connect(incoming_signal, self.handle_incoming)
 
         for finished_signal in finished_signals:
-            self.body.connect(finished_signal, self.handle_finished)
+            self.body.connect(finished_signal, self.handle_finished, finished_signal.split('_')[1])
 
     def run(self):
-        self.queue.add_enqueuing_flag(self.id)
         Output.add_progress_bar(
             self.id,
             'Fetching from \'{}\''.format(self.get_body_name())
@@ -97,10 +113,14 @@ class BodyWalker(Thread):
                 self.body.get_id()
             )
             return
+        finally:
+            self.queue.update_enqueuing_flag(self.id, False)
+
+        self.finished = True
 
         Output.message(
             'Fetched {} objects from {}',
-            len(self.seen_list) + 1,
+            self.num_enqueued + 1,
             self.body.get_id()
         )
 
@@ -117,27 +137,57 @@ class BodyWalker(Thread):
         )
 
         for index, entity in enumerate(object_list):
-            if not self.is_seen_entity(entity) and not self.queue.full():
+            if self.created_since is not None and entity.get_deleted():
+                self.handle_deleted(entity)
+            elif not self.is_seen_entity(entity):
                 self.queue.put(entity)
+                self.num_enqueued += 1
+
+                if self.created_since is not None and self.is_created_entity(entity):
+                    self.num_created += 1
 
-                known_remaining_entities_in_body = len(self.seen_list) - index - 1
                 Output.update_progress_bar(
                     self.id,
-                    remaining=known_remaining_entities_in_body
+                    remaining=num_new_objects - index - 1
                 )
 
     # NOTE: this is very similar to ValidationWorker.is_seen_object...
     def is_seen_entity(self, entity):
         """ Check whether an entity was already fetched """
-        if entity.get_id() in self.seen_list:
-            return True
+        return not self.seen_list.add(entity.get_id(), self.id)
+
+    def is_created_entity(self, entity):
+        """ Check whether an entity was created after created_since """
+        created = entity.get_created()
 
-        self.seen_list.push(entity.get_id())
+        return created is not None and created.to_unix() >= self.created_since
 
-        return False
+    def handle_deleted(self, entity):
+        """ Remember an entity which was deleted since created_since """
+        if entity.get_id() in self.deleted_ids:
+            return
+
+        self.deleted_ids.add(entity.get_id())
 
-    def handle_finished(self, _):
+        if not self.is_created_entity(entity):
+            self.num_deleted += 1
+
+    def handle_finished(self, _, list_name):
+        self.finished_lists.append(list_name)
         self.missing_finished_signals -= 1
 
         if self.missing_finished_signals == 0:
             self.queue.update_enqueuing_flag(self.id, False)
+
+    def get_progress(self):
+        """
+            Returns the progress of the walker for checkpoints
+
+            liboparl paginates the lists of a body internally, so the
+            progress is tracked per list instead of per page.
+        """
+        return {
+            'finished': self.finished,
+            'finished_lists': list(self.finished_lists),
+            'enqueued': self.num_enqueued
+        }
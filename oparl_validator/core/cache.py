@@ -22,7 +22,167 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-import redis
+import json
+import re
+from threading import Lock
+import time
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from oparl_validator.core.cache_backends import RedisCacheBackend
+
+# Marks a cache value as an entry with metadata, values without it are plain document texts
+ENTRY_MARKER = b'\x00'
+
+# How long entries with validators are retained after they become stale
+REVALIDATION_RETENTION = 7 * 24 * 3600
+
+# Documents smaller than this are not worth compressing
+COMPRESSION_THRESHOLD = 256
+
+# Lower bound for the freshness lifetime of documents without Cache-Control, avoids revalidating during a single run
+MINIMUM_TTL = 300
+
+
+def get_available_compressions():
+    compressions = ['none', 'zlib']
+
+    if zstandard is not None:
+        compressions.append('zstd')
+
+    return compressions
+
+
+def compress(data, compression):
+    if compression == 'zlib':
+        return zlib.compress(data, 6)
+
+    if compression == 'zstd':
+        return zstandard.ZstdCompressor(level=3).compress(data)
+
+    return data
+
+
+def decompress(data, compression):
+    if compression == 'zlib':
+        return zlib.decompress(data)
+
+    if compression == 'zstd':
+        return zstandard.ZstdDecompressor().decompress(data)
+
+    return data
+
+
+class CacheEntry:
+    """
+        A cached document together with its HTTP validators
+    """
+
+    def __init__(self, body, etag=None, last_modified=None, expires=None):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires = expires
+
+    def is_fresh(self):
+        return self.expires is None or self.expires > time.time()
+
+    def has_validators(self):
+        return self.etag is not None or self.last_modified is not None
+
+    def get_conditional_headers(self):
+        """ Request headers for revalidating this entry with the origin server """
+        headers = {}
+
+        if self.etag is not None:
+            headers['If-None-Match'] = self.etag
+
+        if self.last_modified is not None:
+            headers['If-Modified-Since'] = self.last_modified
+
+        return headers
+
+    def encode(self, compression=None):
+        """
+        Serializes the entry
+
+        The metadata header records the compression of the body, so that
+        compressed and plain entries can be read alike.
+        """
+        body = self.body.encode('utf-8')
+        self.original_size = len(body)
+
+        if compression in ['zlib', 'zstd'] and len(body) >= COMPRESSION_THRESHOLD:
+            body = compress(body, compression)
+        else:
+            compression = None
+
+        meta = {
+            'etag': self.etag,
+            'last_modified': self.last_modified,
+            'expires': self.expires,
+            'compression': compression
+        }
+
+        return ENTRY_MARKER + json.dumps(meta).encode('utf-8') + b'\n' + body
+
+    @staticmethod
+    def decode(value):
+        """
+        Deserializes an entry
+
+        Returns None for entries compressed with an algorithm which is
+        not available, e.g. zstd entries written by another run sharing
+        the cache on a host without zstandard.
+        """
+        if not value.startswith(ENTRY_MARKER):
+            return CacheEntry(str(value, 'utf-8'))
+
+        meta, body = value[len(ENTRY_MARKER):].split(b'\n', 1)
+        meta = json.loads(str(meta, 'utf-8'))
+
+        compression = meta.get('compression')
+        if compression is not None and compression not in get_available_compressions():
+            return None
+
+        body = decompress(body, compression)
+
+        return CacheEntry(
+            str(body, 'utf-8'),
+            etag=meta['etag'],
+            last_modified=meta['last_modified'],
+            expires=meta['expires']
+        )
+
+
+def get_max_age(headers, default):
+    """
+    Extracts the freshness lifetime from a Cache-Control header
+
+    Documents marked no-cache or no-store are stale right away, so they
+    are only kept for revalidation. Only documents without a
+    Cache-Control header get at least the minimum lifetime.
+    """
+    cache_control = headers.get('cache-control')
+
+    if cache_control is None:
+        return max(default, MINIMUM_TTL)
+
+    directives = [directive.strip().lower() for directive in cache_control.split(',')]
+
+    if 'no-cache' in directives or 'no-store' in directives:
+        return 0
+
+    match = re.search(r'max-age=(\d+)', cache_control)
+
+    if match is None:
+        return default
+
+    return int(match.group(1))
 
 
 class Cache:
@@ -33,54 +193,228 @@ class Cache:
         it will be stored in the cache for a certain amount of time to reduce
         load on the endpoint, eliminate network latency and speed up the validation
         process.
-    """
 
-    redis = None
+        Entries are stored with the validators (ETag, Last-Modified) of
+        their response. Stale entries with validators are kept for a while
+        longer, so that they can be revalidated with a conditional request
+        instead of being downloaded again.
+
+        The cache consists of one or more tiers (see cache_backends),
+        ordered from fastest to slowest. Lookups go through the tiers in
+        order and entries found in a slower tier are copied to the faster
+        ones.
+
+        Documents are optionally stored compressed, the cache keeps
+        track of the original and stored sizes as well as the time
+        spent on (de)compression.
+    """
 
-    def __init__(self, basekey='', redis_server='localhost', redis_port=6379):
+    def __init__(self, basekey='', tiers=None, compression='none'):
         """
         Initialize a Cache instance
 
         Caches can preprend a basekey to every cached item, e.g. for using a cache provider such as Redis with multiple
         Cache instances. Remember to include a seperator in the base key
+
+        Without any tiers given, the cache is backed by the local Redis server.
         """
         self.basekey = basekey
         self.hits = 0
         self.misses = 0
         self.lookups = 0
-        self.redis = redis.Redis(host=redis_server, port=redis_port, db=0)
 
-    def has(self, key):
-        """ Checks wether a key exists. """
-        self.lookups += 1
-        result = self.redis.exists(self.fullkey(key))
+        if tiers is None:
+            tiers = [RedisCacheBackend()]
 
-        if result:
-            self.hits += 1
-        else:
-            self.misses += 1
+        self.tiers = tiers
 
-        return result
+        self.compression = compression
+        self.compression_lock = Lock()
+        self.original_bytes = 0
+        self.stored_bytes = 0
+        self.compression_time = 0
+        self.decompression_time = 0
+
+    def has(self, key):
+        """ Checks wether a fresh entry for a key exists. """
+        entry = self.get_entry(key)
+
+        return entry is not None and entry.is_fresh()
 
     def get(self, key):
+        entry = self.get_entry(key)
+
+        if entry is None:
+            return None
+
+        return entry.body
+
+    def get_or_none(self, key):
+        """ Gets the contents of a fresh entry in a single lookup, None if there is none. """
+        entry = self.get_entry(key)
+
+        if entry is None or not entry.is_fresh():
+            return None
+
+        return entry.body
+
+    def get_entry(self, key):
+        """ Gets the entry of a key including stale entries, returns None if there is none. """
         self.lookups += 1
+        fullkey = self.fullkey(key)
 
-        result = self.redis.get(self.fullkey(key))
+        for index, tier in enumerate(self.tiers):
+            result = tier.get(fullkey)
 
-        if result:
-            self.hits += 1
+            if result is not None:
+                break
         else:
             self.misses += 1
+            return None
+
+        entry = self.decode_entry(result)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+
+        # tiers in front of the one the entry was found in only keep it for the current run
+        for faster_tier in self.tiers[:index]:
+            faster_tier.set(fullkey, result)
+
+        return entry
+
+    def get_many(self, keys):
+        """
+        Gets the entries of several keys with one lookup per tier
+
+        Returns a dict of the keys an entry was found for, including
+        stale entries.
+        """
+        keys = list(keys)
+        self.lookups += len(keys)
 
-        return str(result, 'utf-8')
+        entries = {}
+        missing = [self.fullkey(key) for key in keys]
+        keys_by_fullkey = dict(zip(missing, keys))
 
-    def set(self, key, value, ttl=3600):
+        for index, tier in enumerate(self.tiers):
+            if len(missing) == 0:
+                break
+
+            found = {}
+            for fullkey, result in zip(missing, tier.get_many(missing)):
+                if result is None:
+                    continue
+
+                entry = self.decode_entry(result)
+
+                # undecodable entries count as misses, see CacheEntry.decode
+                if entry is not None:
+                    found[fullkey] = result
+                    entries[keys_by_fullkey[fullkey]] = entry
+
+            for faster_tier in self.tiers[:index]:
+                faster_tier.set_many(found)
+
+            missing = [fullkey for fullkey in missing if fullkey not in found]
+
+        self.hits += len(entries)
+        self.misses += len(keys) - len(entries)
+
+        return entries
+
+    def set(self, key, value, ttl=3600, etag=None, last_modified=None):
         """
         Sets the contents of a key
 
         This allows to optionally set the time this cache item will be kept
+        and the validators of the response the contents originate from.
         """
-        return self.redis.set(self.fullkey(key), value, ttl)
+        entry = CacheEntry(value, etag=etag, last_modified=last_modified, expires=time.time() + ttl)
+
+        return self.set_entry(key, entry, ttl)
+
+    def set_entry(self, key, entry, ttl):
+        retention = ttl
+        if entry.has_validators():
+            retention = ttl + REVALIDATION_RETENTION
+
+        # uncacheable documents without validators could not even be revalidated
+        if retention <= 0:
+            return False
+
+        value = self.encode_entry(entry)
+        fullkey = self.fullkey(key)
+
+        for tier in self.tiers:
+            tier.set(fullkey, value, retention)
+
+        return True
+
+    def set_many(self, values, ttl=3600):
+        """ Sets the contents of several keys with one write per tier """
+        expires = time.time() + ttl
+
+        encoded = {}
+        for key, value in values.items():
+            encoded[self.fullkey(key)] = self.encode_entry(CacheEntry(value, expires=expires))
+
+        for tier in self.tiers:
+            tier.set_many(encoded, ttl)
+
+        return True
+
+    def refresh(self, key, entry, ttl=3600):
+        """ Marks a revalidated entry as fresh again """
+        entry.expires = time.time() + ttl
+
+        return self.set_entry(key, entry, ttl)
+
+    def encode_entry(self, entry):
+        start = time.perf_counter()
+        value = entry.encode(self.compression)
+        elapsed = time.perf_counter() - start
+
+        with self.compression_lock:
+            self.original_bytes += entry.original_size
+            self.stored_bytes += len(value)
+            self.compression_time += elapsed
+
+        return value
+
+    def decode_entry(self, value):
+        start = time.perf_counter()
+        entry = CacheEntry.decode(value)
+        elapsed = time.perf_counter() - start
+
+        with self.compression_lock:
+            self.decompression_time += elapsed
+
+        return entry
+
+    def statistics(self):
+        """ Lookup and storage statistics of the cache as a whole and per tier """
+        ratio = 0
+        if self.original_bytes > 0:
+            ratio = self.stored_bytes / self.original_bytes
+
+        return {
+            'lookups': self.lookups,
+            'hits': self.hits,
+            'misses': self.misses,
+            'tiers': dict((tier.name, tier.statistics()) for tier in self.tiers),
+            'compression': {
+                'algorithm': self.compression,
+                'original_bytes': self.original_bytes,
+                'stored_bytes': self.stored_bytes,
+                'ratio': ratio,
+                'compression_seconds': self.compression_time,
+                'decompression_seconds': self.decompression_time
+            }
+        }
 
     def fullkey(self, key):
         """
@@ -91,4 +425,4 @@ class Cache:
         if self.basekey:
             return "{}{}".format(self.basekey, key)
         else:
-            return key
\ No newline at end of file
+            return key
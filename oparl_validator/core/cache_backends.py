@@ -0,0 +1,262 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2017 Stefan Graupner
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from collections import OrderedDict
+import sqlite3
+from threading import Lock
+import time
+
+import redis
+
+
+class CacheBackend:
+    """
+        Storage tier of the Cache
+
+        Backends store opaque byte values with an optional time to
+        live in seconds and keep lookup statistics of their own.
+    """
+
+    name = None
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """ Returns the value of a key or None """
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None):
+        raise NotImplementedError
+
+    def get_many(self, keys):
+        """ Returns the values of several keys, None for every missing key """
+        return [self.get(key) for key in keys]
+
+    def set_many(self, values, ttl=None):
+        """ Sets several key value pairs with the same time to live """
+        for key, value in values.items():
+            self.set(key, value, ttl)
+
+        return True
+
+    def count_lookup(self, value):
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return value
+
+    def statistics(self):
+        lookups = self.hits + self.misses
+
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups > 0 else 0
+        }
+
+
+class RedisCacheBackend(CacheBackend):
+    name = 'redis'
+
+    def __init__(self, redis_server='localhost', redis_port=6379):
+        super(RedisCacheBackend, self).__init__()
+        self.redis = redis.Redis(host=redis_server, port=redis_port, db=0)
+
+    def get(self, key):
+        return self.count_lookup(self.redis.get(key))
+
+    def set(self, key, value, ttl=None):
+        return self.redis.set(key, value, ttl)
+
+    def get_many(self, keys):
+        if len(keys) == 0:
+            return []
+
+        return [self.count_lookup(value) for value in self.redis.mget(keys)]
+
+    def set_many(self, values, ttl=None):
+        pipeline = self.redis.pipeline(transaction=False)
+
+        for key, value in values.items():
+            pipeline.set(key, value, ttl)
+
+        pipeline.execute()
+
+        return True
+
+
+class MemoryCacheBackend(CacheBackend):
+    """
+        Bounded in-process LRU tier
+
+        The size limit is given in bytes of stored values, the least
+        recently used entries are evicted once it is exceeded.
+    """
+
+    name = 'memory'
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        super(MemoryCacheBackend, self).__init__()
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.evictions = 0
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.entries.get(key)
+
+            if item is not None and item[1] is not None and item[1] <= time.time():
+                self.remove(key)
+                item = None
+
+            if item is None:
+                return self.count_lookup(None)
+
+            self.entries.move_to_end(key)
+
+            return self.count_lookup(item[0])
+
+    def set(self, key, value, ttl=None):
+        if len(value) > self.max_bytes:
+            return False
+
+        expires = None
+        if ttl is not None:
+            expires = time.time() + ttl
+
+        with self.lock:
+            if key in self.entries:
+                self.remove(key)
+
+            self.entries[key] = (value, expires)
+            self.size += len(value)
+
+            while self.size > self.max_bytes:
+                oldest = next(iter(self.entries))
+                self.remove(oldest)
+                self.evictions += 1
+
+        return True
+
+    def remove(self, key):
+        value, _ = self.entries.pop(key)
+        self.size -= len(value)
+
+    def statistics(self):
+        statistics = super(MemoryCacheBackend, self).statistics()
+        statistics['bytes'] = self.size
+        statistics['evictions'] = self.evictions
+
+        return statistics
+
+
+class SqliteCacheBackend(CacheBackend):
+    """
+        Embedded on-disk tier for hosts without a Redis server
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path='oparl_validator_cache.sqlite'):
+        super(SqliteCacheBackend, self).__init__()
+        self.lock = Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, expires REAL)'
+        )
+        self.connection.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+
+    def get(self, key):
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT value FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (key, time.time())
+            ).fetchone()
+
+        if row is None:
+            return self.count_lookup(None)
+
+        return self.count_lookup(bytes(row[0]))
+
+    def set(self, key, value, ttl=None):
+        return self.set_many({key: value}, ttl)
+
+    def get_many(self, keys):
+        found = {}
+
+        # stay below sqlite's limit of bound parameters per statement
+        for offset in range(0, len(keys), 500):
+            chunk = keys[offset:offset + 500]
+            query = 'SELECT key, value FROM cache WHERE key IN ({}) AND (expires IS NULL OR expires > ?)'.format(
+                ', '.join('?' * len(chunk))
+            )
+
+            with self.lock:
+                rows = self.connection.execute(query, list(chunk) + [time.time()]).fetchall()
+
+            for key, value in rows:
+                found[key] = bytes(value)
+
+        return [self.count_lookup(found.get(key)) for key in keys]
+
+    def set_many(self, values, ttl=None):
+        expires = None
+        if ttl is not None:
+            expires = time.time() + ttl
+
+        with self.lock:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+                [(key, value, expires) for key, value in values.items()]
+            )
+
+        return True
+
+
+def create_cache_backends(backend='redis', memory_size=0, path=None, redis_server='localhost', redis_port=6379):
+    """ Create the cache tiers for a backend name, fastest tier first """
+    tiers = []
+
+    if backend == 'memory' and memory_size <= 0:
+        memory_size = 64 * 1024 * 1024
+
+    if memory_size > 0:
+        tiers.append(MemoryCacheBackend(memory_size))
+
+    if backend == 'redis':
+        tiers.append(RedisCacheBackend(redis_server, redis_port))
+    elif backend == 'sqlite':
+        tiers.append(SqliteCacheBackend(path or 'oparl_validator_cache.sqlite'))
+    elif backend != 'memory':
+        raise ValueError('Unknown cache backend {}'.format(backend))
+
+    return tiers
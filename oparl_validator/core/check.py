@@ -30,10 +30,9 @@ class CheckResult:
 
         self.severity = severity.lower()
         self.description = description
-        self.context = context
 
     def validate_severity(self, severity : str):
-        if type(severity) is not 'string':
+        if not isinstance(severity, str):
             raise InvalidSeverityException()
 
         valid_severities = [
@@ -53,6 +52,24 @@ class CheckResult:
         return self.description
 
 class Check:
+    # the shared oparl_validator.core.transport.Transport, set by the check pool
+    transport = None
+
+    # whether the results only depend on the entity document, see oparl_validator.core.memo
+    memoizable = True
+
+    # whether the urls of the check are requested by the file check stage, see oparl_validator.core.file_checker
+    deferred = False
+
+    def configure(self, options) -> bool:
+        """
+            Configure the check from the options of the validator.
+
+            Options are None outside of the validator's main process.
+            Must return whether the check is enabled.
+        """
+        return True
+
     def evaluates_entity_type(self) -> [str]:
         """
             Return the type of entities which can be evaluated.
@@ -69,4 +86,46 @@ class Check:
 
             Must return a CheckResult list
         """
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
+
+    def get_urls(self, entity : object) -> dict:
+        """
+            Return the urls a deferred check needs the outcomes of.
+
+            Must return a dict of names to urls, urls may be None.
+        """
+        raise NotImplementedError
+
+    def get_context(self, entity : object):
+        """
+            Return what a deferred check needs to know about the entity
+            besides the outcomes of its urls, e.g. declared metadata.
+        """
+        return None
+
+    def check_url(self, transport, url : str) -> dict:
+        """
+            Request an url of a deferred check.
+
+            Must return a json serializable outcome, which does not
+            depend on the entity, as urls shared by several entities
+            are only requested once.
+        """
+        raise NotImplementedError
+
+    def evaluate_outcomes(self, urls : dict, outcomes : dict, context = None) -> [CheckResult]:
+        """
+            Evaluate the outcomes of the urls of a deferred check.
+
+            `urls` is the dict returned by `get_urls`, `outcomes` maps
+            each of its urls to the outcome returned by `check_url` and
+            `context` is the value returned by `get_context`. If
+            `check_url` raised, the outcome only holds `status`, `headers`
+            and the exception's name as `error`.
+            Must return a CheckResult list
+        """
+        raise NotImplementedError
+
+    def get_statistics(self):
+        """ Return statistics of the check for the result, or None """
+        return None
\ No newline at end of file
@@ -0,0 +1,185 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2017 Stefan Graupner
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from datetime import datetime
+import json
+import os
+from threading import Event, Thread
+
+from oparl_validator.core.output import Output
+from oparl_validator.core.result_stream import ResultStream, fatal_record, message_record, read_records
+
+
+class Checkpoint:
+    """
+        Crash-safe checkpoint of a validation run
+
+        A checkpoint consists of a journal and a state file next to it.
+        Validation workers append a record for every entity they
+        finished to the journal. The state file holds the ids of the
+        entities which were queued or in flight and the progress of the
+        body walkers, it is replaced atomically by the `Checkpointer`.
+
+        The journal is flushed before each state file is written, so
+        every entity missing from the state file has its record on disk.
+        Entities whose record got lost are simply validated again.
+    """
+
+    def __init__(self, file_name, resume=False):
+        self.file_name = file_name
+        self.state_file_name = '{}.state'.format(file_name)
+        self.journal = ResultStream(file_name, append=resume)
+
+    def record_entity(self, entity_id, entity_type, messages):
+        """ Records a validated entity with its (severity, description) messages """
+        self.journal.write_records([{
+            'record': 'entity',
+            'id': entity_id,
+            'type': entity_type,
+            'messages': messages
+        }])
+
+    def record_fatal(self, entity_id):
+        self.journal.write_records([{
+            'record': 'fatal',
+            'id': entity_id
+        }])
+
+    def write_state(self, endpoint, pending, walkers):
+        self.journal.flush()
+
+        state = {
+            'endpoint': endpoint,
+            'timestamp': datetime.now().isoformat(),
+            'pending': pending,
+            'walkers': walkers
+        }
+
+        temporary_file_name = '{}.tmp'.format(self.state_file_name)
+
+        with open(temporary_file_name, 'w') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(temporary_file_name, self.state_file_name)
+
+    def close(self):
+        self.journal.close()
+
+    @staticmethod
+    def read_state(file_name):
+        """ Reads the state of a checkpoint, None if no state was written yet """
+        try:
+            with open('{}.state'.format(file_name), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def replay(file_name, seen_list, accumulator, stream=None):
+        """
+            Adds the entities recorded in a checkpoint journal to the seen
+            list and their messages to the accumulator
+
+            With a result stream, the entities are written to it as well.
+        """
+        if not os.path.exists(file_name):
+            return 0
+
+        num_entities = 0
+
+        for record in read_records(file_name):
+            if not seen_list.add(record['id']):
+                continue
+
+            num_entities += 1
+
+            if record['record'] == 'fatal':
+                accumulator.fatal_objects.append(record['id'])
+
+                if stream is not None:
+                    stream.write_records([fatal_record(record['id'])])
+
+                continue
+
+            if len(record['messages']) > 0:
+                accumulator.failed_entities += 1
+
+            for severity, description in record['messages']:
+                accumulator.add_message(record['type'], record['id'], severity, description)
+
+            if stream is not None and len(record['messages']) > 0:
+                stream.write_records([
+                    message_record(record['type'], record['id'], severity, description)
+                    for severity, description in record['messages']
+                ])
+
+        return num_entities
+
+
+class Checkpointer(Thread):
+    """
+        Thread periodically writing the state of a validation run
+
+        Walkers of bodies which were completely walked in a previous run
+        are passed as `finished_walkers` and carried forward. Entities
+        waiting in the FileChecker count as pending.
+    """
+
+    def __init__(self, checkpoint, endpoint, queue, walkers, interval=60, finished_walkers=None, file_checker=None):
+        super(Checkpointer, self).__init__()
+        self.checkpoint = checkpoint
+        self.endpoint = endpoint
+        self.queue = queue
+        self.walkers = walkers
+        self.interval = interval
+        self.finished_walkers = finished_walkers or {}
+        self.file_checker = file_checker
+        self.stopped = Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.write()
+
+    def write(self):
+        walkers = dict(self.finished_walkers)
+
+        for walker in self.walkers:
+            walkers[walker.body.get_id()] = walker.get_progress()
+
+        pending = self.queue.snapshot(lambda entity: entity.get_id())
+
+        # entities are handed to the file checker before their worker takes the next one from the queue
+        if self.file_checker is not None:
+            pending.extend(self.file_checker.get_pending())
+
+        self.checkpoint.write_state(self.endpoint, pending, walkers)
+        Output.message('Checkpoint written with {} pending entities', len(pending))
+
+    def stop(self):
+        """ Stops the thread and writes a final state """
+        self.stopped.set()
+        self.join()
+        self.write()
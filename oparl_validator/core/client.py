@@ -22,45 +22,96 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
+import json
+from threading import Lock, current_thread
+import time
 from urllib.parse import urlparse
 
 import gi
 import requests
+from requests.exceptions import HTTPError, RequestException
 
 from oparl_validator.core.body_walker import BodyWalker
-from oparl_validator.core.cache import Cache
+from oparl_validator.core.cache import Cache, get_max_age
 from oparl_validator.core.exceptions import EndpointNotReachableException, EndpointIsNotAnOParlEndpointException
+from oparl_validator.core.metrics import metrics
 from oparl_validator.core.output import Output
-#from core.validator import get_validator_version
+from oparl_validator.core.prefetcher import Prefetcher
+from oparl_validator.core.transport import PERMANENT_STATUS_CODES, Transport
+from oparl_validator.core.utils import add_query_parameter, get_entity_type_from_document
 
 gi.require_version('OParl', '0.2')
 from gi.repository import OParl
 from gi.repository import GLib
 
+# the entity lists of a body which are filtered in incremental validations
+BODY_LISTS = ['organization', 'person', 'meeting', 'paper']
+
 
 class Client:
     """
         The client wrapping liboparl- and general endpoint communication
+
+        Given a `modified_since` datetime, the entity lists of all bodies
+        are requested with the corresponding filter, so that only the
+        entities changed since then are walked. liboparl follows the next
+        links of the filtered lists, which carry the filter on.
+
+        Urls which do not exist (404, 410) are remembered in the negative
+        cache for `negative_ttl` seconds, so that an url referenced by
+        many entities is only requested once. All urls which could not
+        be resolved are counted in `failed_urls` with their number of
+        references. Urls which failed even after retrying are not
+        requested again for the rest of the run.
+
+        Without `revalidate`, stale cache entries are fetched again with
+        unconditional requests, e.g. so that recorded archives contain
+        complete responses instead of 304s.
     """
-    def __init__(self, endpoint):
+    def __init__(self, endpoint, transport=None, cache=None, prefetch=0, embedded_cache=None, modified_since=None,
+                 negative_cache=None, negative_ttl=300, revalidate=True):
         self.endpoint = endpoint
+        self.modified_since = modified_since
+        self.revalidate = revalidate
+
+        self.negative_cache = negative_cache
+        self.negative_ttl = negative_ttl
+
+        # failed urls with the status code or exception name of their failure and their number of references
+        self.failed_urls = {}
+        self.failed_urls_lock = Lock()
+
+        # list urls of all bodies seen so far, see collect_list_urls
+        self.list_urls = set()
         self.network = {
             'ssl': False,
-            'average_ttl': 0,
-            'encodings': []
+            'encodings': [],
+            'connections': {},
+            'prefetch': {},
+            'revalidated': 0
         }
 
-        # default_headers = requests.utils.default_headers()
-        # headers.update({
-        #     'User-Agent': 'OParlValidator/{} (https://dev.oparl.org/validator)'.format(get_validator_version())
-        # })
+        if transport is None:
+            transport = Transport()
+
+        self.transport = transport
 
         if not self.is_reachable():
             raise EndpointNotReachableException()
 
         self.check_ssl()
 
-        self.cache = Cache()
+        if cache is None:
+            cache = Cache()
+
+        self.cache = cache
+
+        # stores the entities embedded in list pages under their ids, see store_embedded_entities
+        self.embedded_cache = embedded_cache
+
+        self.prefetcher = None
+        if prefetch > 0:
+            self.prefetcher = Prefetcher(self.refetch, self.cache, self.endpoint, max_in_flight=prefetch)
 
         self.client = OParl.Client()
         self.client.set_strict(False)
@@ -73,30 +124,249 @@ class Client:
         if url is None:  # This is from objects liboparl failed to resolve!
             return None
 
-        if not self.cache.has(url):
-            r = requests.get(url, verify=self.network['ssl'])
+        start = time.perf_counter()
+        result, source = self.resolve(url)
+
+        # resolved in the threads of the walkers and workers, whose names identify them
+        metrics.observe('resolve_seconds', time.perf_counter() - start, thread=current_thread().name, source=source)
+        self.transport.network_statistics.record_served(source)
+
+        return result
+
+    def resolve(self, url):
+        """ Resolves an url, returns the liboparl result and whether it was served from the cache or the network """
+        url = self.filter_list_url(url)
+
+        if self.prefetcher is not None:
+            self.prefetcher.wait(url)
+
+        if self.negative_cache is not None:
+            status = self.negative_cache.get_or_none(url)
+
+            if status is not None:
+                self.add_failed_reference(url, int(status))
+                return OParl.ResolveUrlResult(resolved_data=None, success=False, status_code=-1), 'failed'
+
+        if self.has_failed(url):
+            self.add_failed_reference(url)
+            return OParl.ResolveUrlResult(resolved_data=None, success=False, status_code=-1), 'failed'
+
+        entry = self.cache.get_entry(url)
+
+        if entry is not None and entry.is_fresh():
+            if self.prefetcher is not None:
+                self.prefetcher.was_prefetched(url)
+
+            if self.modified_since is not None:
+                self.collect_list_urls(entry.body)
+
+            return OParl.ResolveUrlResult(resolved_data=entry.body, success=True, status_code=-1), 'cache'
+
+        data = self.fetch(url, entry)
+
+        if data is None:
+            self.add_failed_reference(url)
+            return OParl.ResolveUrlResult(resolved_data=None, success=False, status_code=-1), 'failed'
+
+        if self.modified_since is not None:
+            self.collect_list_urls(data)
 
-            try:
-                r.raise_for_status()
-            except HTTPError:
-                return OParl.ResolveUrlResult(resolved_data=None, success=False, status_code=-1)
+        if self.prefetcher is not None:
+            self.prefetcher.schedule_from(data)
 
-            self.cache.set(url, r.text)
+        return OParl.ResolveUrlResult(resolved_data=data, success=True, status_code=200), 'network'
 
-            # TODO: should probably switch this code over to a moving average of a few (all?) requests
-            # TODO: should track ttl of cached requests to make this more accurate
-            if self.network['average_ttl'] == 0:
-                self.network['average_ttl'] = r.elapsed
+    def fetch(self, url, entry=None):
+        """
+            Fetch an url from the network and store it in the cache
+
+            If a stale cache entry is given, it is revalidated with a
+            conditional request. Returns the document text or None if
+            the request failed, even after retrying.
+        """
+        headers = {}
+        if entry is not None and self.revalidate:
+            headers = entry.get_conditional_headers()
+
+        try:
+            r = self.transport.get(url, headers=headers, verify=self.network['ssl'])
+        except RequestException as exception:
+            self.set_failure(url, type(exception).__name__)
+            return None
+
+        if r.status_code == 304 and entry is not None:
+            self.cache.refresh(url, entry, get_max_age(r.headers, 3600))
+            self.network['revalidated'] += 1
+
+            return entry.body
+
+        # without an entry to revalidate there is no document to return
+        if r.status_code == 304:
+            self.set_failure(url, r.status_code)
+            return None
+
+        try:
+            r.raise_for_status()
+        except HTTPError:
+            self.set_failure(url, r.status_code)
+
+            if self.negative_cache is not None and r.status_code in PERMANENT_STATUS_CODES:
+                self.negative_cache.set(url, str(r.status_code), self.negative_ttl)
+
+            return None
+
+        self.cache.set(
+            url,
+            r.text,
+            get_max_age(r.headers, 3600),
+            etag=r.headers.get('etag'),
+            last_modified=r.headers.get('last-modified')
+        )
+
+        if self.embedded_cache is not None:
+            self.store_embedded_entities(r.text)
+
+        self.transport.network_statistics.record_document(
+            get_entity_type_from_document(r.text),
+            r.elapsed.total_seconds()
+        )
+
+        if 'content-encoding' in r.headers and \
+            r.headers['content-encoding'] not in self.network['encodings']:
+            self.network['encodings'].append(r.headers['content-encoding'])
+
+        return r.text
+
+    def set_failure(self, url, status):
+        """ Remembers why an url failed, the status code or the name of the exception """
+        with self.failed_urls_lock:
+            if url not in self.failed_urls:
+                self.failed_urls[url] = {'status': status, 'references': 0}
             else:
-                self.network['average_ttl'] = (self.network['average_ttl'] + r.elapsed) / 2
+                self.failed_urls[url]['status'] = status
+
+    def has_failed(self, url):
+        """ Checks whether requesting an url already failed in this run """
+        with self.failed_urls_lock:
+            return url in self.failed_urls
+
+    def add_failed_reference(self, url, status=None):
+        """ Counts a resolve of an url which failed """
+        with self.failed_urls_lock:
+            if url not in self.failed_urls:
+                self.failed_urls[url] = {'status': status, 'references': 0}
+
+            self.failed_urls[url]['references'] += 1
 
-            if 'content-encoding' in r.headers and \
-                r.headers['content-encoding'] not in self.network['encodings']:
-                self.network['encodings'].append(r.headers['content-encoding'])
+    def get_failed_urls(self):
+        """ The urls which could not be resolved, most often referenced first """
+        with self.failed_urls_lock:
+            failed_urls = [
+                {'url': url, 'status': failure['status'], 'references': failure['references']}
+                for url, failure in self.failed_urls.items()
+                if failure['references'] > 0
+            ]
 
-            return OParl.ResolveUrlResult(resolved_data=r.text, success=True, status_code=r.status_code)
-        else:
-            return OParl.ResolveUrlResult(resolved_data=self.cache.get(url), success=True, status_code=-1)
+        return sorted(failed_urls, key=lambda failure: (-failure['references'], failure['url']))
+
+    def filter_list_url(self, url):
+        """ Adds the modified_since filter to the entity list urls of bodies """
+        if self.modified_since is None or url not in self.list_urls:
+            return url
+
+        return add_query_parameter(url, 'modified_since', self.modified_since.isoformat())
+
+    def collect_list_urls(self, data):
+        """
+            Remember the entity list urls of all bodies in a document
+
+            Bodies are resolved before their lists are walked, either as
+            a document of their own or embedded in the body list.
+        """
+        if 'Body"' not in data:
+            return
+
+        try:
+            document = json.loads(data)
+        except ValueError:
+            return
+
+        if not isinstance(document, dict):
+            return
+
+        bodies = [document]
+        if isinstance(document.get('data'), list):
+            bodies = document['data']
+
+        for body in bodies:
+            if not isinstance(body, dict) or not str(body.get('type', '')).endswith('/Body'):
+                continue
+
+            for list_name in BODY_LISTS:
+                if isinstance(body.get(list_name), str):
+                    self.list_urls.add(body[list_name])
+
+    def store_embedded_entities(self, data):
+        """
+            Store the documents of all entities embedded in a list page
+
+            They are kept apart from the regular cache, as the document of
+            an entity's own url may well differ from the embedded one.
+        """
+        try:
+            document = json.loads(data)
+        except ValueError:
+            return
+
+        if not isinstance(document, dict) or not isinstance(document.get('data'), list):
+            return
+
+        entities = {}
+        for entity in document['data']:
+            if isinstance(entity, dict) and isinstance(entity.get('id'), str):
+                entities[entity['id']] = json.dumps(entity)
+
+        if len(entities) > 0:
+            self.embedded_cache.set_many(entities)
+
+    def get_document(self, entity_id):
+        """ Returns the raw document of an entity, preferring the one embedded in a list page """
+        document = None
+
+        if self.embedded_cache is not None:
+            document = self.embedded_cache.get_or_none(entity_id)
+
+        if document is None:
+            document = self.cache.get_or_none(entity_id)
+
+        return document
+
+    def refetch(self, url):
+        """
+            Fetch an url for the prefetcher, revalidating its stale cache entry if there is one
+
+            In incremental validations the list urls of bodies are also
+            collected from prefetched documents and only fetched with
+            their filter, as the unfiltered lists would lead the
+            prefetcher through the whole endpoint.
+
+            Urls in the negative cache or which already failed in this
+            run are not requested.
+        """
+        url = self.filter_list_url(url)
+
+        if self.has_failed(url):
+            return None
+
+        if self.negative_cache is not None and self.negative_cache.get_or_none(url) is not None:
+            return None
+
+        data = self.fetch(url, self.cache.get_entry(url))
+
+        if data is not None and self.modified_since is not None:
+            self.collect_list_urls(data)
+
+        return data
 
     def is_reachable(self):
         """
@@ -105,15 +375,15 @@ class Client:
             the provided URI and, if that 404s, trying again
         """
         try:
-            r = requests.head(self.endpoint)
+            r = self.transport.head(self.endpoint)
             return r.status_code in [200, 304]
-        except requests.exceptions.RequestException:
+        except RequestException:
             return False
 
     def check_ssl(self):
         # TODO: this feels very much incorrect to me
         try:
-            requests.get(self.endpoint)
+            self.transport.get(self.endpoint)
 
             components = urlparse(self.endpoint)
             if components.scheme != 'http':
@@ -127,5 +397,36 @@ class Client:
         except GLib.Error:
             raise EndpointIsNotAnOParlEndpointException()
 
-    def create_body_walker(self, body, queue):
-        return BodyWalker(self.client, body, queue)
+    def load_entity(self, url):
+        """
+            Rebuild the liboparl object of an entity from its url
+
+            The document is resolved through the resolve_url callback,
+            i.e. it is usually served from the cache. Returns None if
+            the entity could not be rebuilt.
+        """
+        try:
+            return self.client.parse_url(url)
+        except GLib.Error:
+            return None
+
+    def update_network_statistics(self):
+        self.network['connections'] = self.transport.statistics()
+        self.network.update(self.transport.network_statistics.to_dict())
+
+        if self.transport.rate_limiter is not None:
+            self.network['limits'] = self.transport.rate_limiter.get_statistics()
+
+        if self.prefetcher is not None:
+            self.network['prefetch'] = dict(self.prefetcher.statistics)
+
+    def close(self):
+        if self.prefetcher is not None:
+            self.prefetcher.shutdown()
+
+    def create_body_walker(self, body, queue, seen_list):
+        created_since = None
+        if self.modified_since is not None:
+            created_since = self.modified_since.timestamp()
+
+        return BodyWalker(self.client, body, queue, seen_list, created_since)
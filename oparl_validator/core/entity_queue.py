@@ -22,40 +22,273 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-from functools import reduce
-from queue import Queue
-from threading import Lock
+from collections import deque
+import os
+from queue import Empty, Full
+import tempfile
+from threading import Condition, Lock, get_ident
+import time
+
+from oparl_validator.core.metrics import metrics
+
 
 class EntityQueue:
-    def __init__(self, maxsize = 1000):
-        self.queue = Queue(maxsize)
+    """
+        Queue of entities waiting for validation
+
+        The queue keeps up to `maxsize` entities in memory. If it is given
+        a serializer, entities beyond that bound are written to an
+        append-only log on disk and read back in order once the in-memory
+        part has been consumed, so that producers never have to wait and no
+        entity is dropped. Without a serializer, `put` blocks while the
+        queue is full.
+
+        `serialize` must turn an entity into a single line of text
+        and `deserialize` must rebuild the entity from it, returning
+        None if that is not possible.
+
+        Producers register themselves with an enqueuing flag and clear
+        it once they are done. `get` blocks until an entity is available
+        and returns None once the queue is drained, i.e. it is empty and
+        no producer is enqueuing anymore.
+
+        An entity counts as in flight from the moment `get` handed it
+        to a consumer until the same consumer asks for the next one,
+        `snapshot` includes these entities so that nothing which was
+        not processed completely is missing from a checkpoint.
+    """
+
+    def __init__(self, maxsize = 1000, serialize = None, deserialize = None, spill_directory = None):
+        self.maxsize = maxsize
+        self.items = deque()
+        self.condition = Condition(Lock())
         self.enqueuing_flags = {}
+        self.in_flight = {}
+
+        self.serialize = serialize
+        self.deserialize = deserialize
+        self.spill_directory = spill_directory
+        self.spill_writer = None
+        self.spill_reader = None
+        self.spill_pending = 0
+        self.spill_read_offset = 0
+        self.spill_write_offset = 0
+        self.spill_generation = 0
+
+        self.statistics = {
+            'max_depth': 0,
+            'spilled': 0,
+            'spilled_bytes': 0,
+            'spill_reads': 0,
+            'spill_read_seconds': 0,
+            'spill_read_max_seconds': 0,
+            'unrecoverable': 0
+        }
+
+    def can_spill(self):
+        return self.serialize is not None and self.deserialize is not None
 
     def put(self, item, block = True, timeout = None):
-        self.queue.put(item, block, timeout=timeout)
+        with self.condition:
+            if self.spill_pending > 0 or len(self.items) >= self.maxsize:
+                if self.can_spill():
+                    self.spill(item)
+                    self.update_depth()
+                    self.condition.notify()
+                    return
+
+                if not self.condition.wait_for(lambda: len(self.items) < self.maxsize, timeout if block else 0):
+                    raise Full
+
+            self.items.append((item, time.monotonic()))
+            self.update_depth()
+            self.condition.notify()
 
     def get(self, block = True, timeout = None):
-        return self.queue.get(block, timeout)
+        """
+            Entities read back from the overflow log which cannot be
+            deserialized are skipped, waiting for the next one keeps to
+            what is left of the timeout.
+        """
+        deadline = None
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+
+        while True:
+            if deadline is not None:
+                timeout = max(deadline - time.monotonic(), 0)
+
+            with self.condition:
+                available = lambda: self.qsize() > 0 or not self.is_enqueuing()
+
+                if not self.condition.wait_for(available, timeout if block else 0):
+                    raise Empty
+
+                if self.qsize() == 0:
+                    self.in_flight.pop(get_ident(), None)
+                    return None
+
+                if len(self.items) > 0:
+                    item, enqueued_at = self.items.popleft()
+                    metrics.observe('queue_wait_seconds', time.monotonic() - enqueued_at)
+                    self.in_flight[get_ident()] = (item, None)
+                    self.condition.notify_all()
+                    return item
+
+                line = self.spill_reader.readline()
+                enqueued_at, serialized = line.rstrip('\n').split('\t', 1)
+                metrics.observe('queue_wait_seconds', time.monotonic() - float(enqueued_at))
+
+                self.in_flight[get_ident()] = (None, serialized)
+                self.spill_pending -= 1
+                self.spill_read_offset += len(line.encode('utf-8'))
+
+                if self.spill_pending == 0:
+                    self.reset_spill()
+
+            item = self.read_back(serialized)
+
+            if item is not None:
+                return item
+
+    def spill(self, item):
+        """ Appends an entity to the on-disk overflow log, the queue lock must be held """
+        self.spill_line(self.serialize(item))
+
+        self.statistics['spilled'] += 1
+
+    def spill_line(self, serialized):
+        """
+            Appends a serialized entity to the overflow log along with the
+            time it was enqueued, the queue lock must be held
+        """
+        if self.spill_writer is None:
+            handle, path = tempfile.mkstemp(prefix='oparl_validator_queue_', dir=self.spill_directory)
+            self.spill_writer = os.fdopen(handle, 'w', encoding='utf-8')
+            self.spill_reader = open(path, 'r', encoding='utf-8')
+            os.unlink(path)
+
+        line = '{}\t{}\n'.format(time.monotonic(), serialized)
+        self.spill_writer.write(line)
+        self.spill_writer.flush()
+        self.spill_pending += 1
+        self.spill_write_offset += len(line.encode('utf-8'))
+
+        self.statistics['spilled_bytes'] += len(line)
+
+    def reset_spill(self):
+        """ Empties the overflow log once everything was read back, the queue lock must be held """
+        self.spill_writer.seek(0)
+        self.spill_writer.truncate()
+        self.spill_reader.seek(0)
+        self.spill_read_offset = 0
+        self.spill_write_offset = 0
+        self.spill_generation += 1
+
+    def read_back(self, serialized):
+        start = time.perf_counter()
+        item = self.deserialize(serialized)
+        elapsed = time.perf_counter() - start
+
+        with self.condition:
+            if item is not None:
+                self.in_flight[get_ident()] = (item, None)
+            else:
+                self.in_flight.pop(get_ident(), None)
+
+            self.statistics['spill_reads'] += 1
+            self.statistics['spill_read_seconds'] += elapsed
+            self.statistics['spill_read_max_seconds'] = max(self.statistics['spill_read_max_seconds'], elapsed)
+
+            if item is None:
+                self.statistics['unrecoverable'] += 1
+
+        return item
+
+    def restore(self, lines):
+        """
+            Adds serialized entities, e.g. from a checkpoint, to the
+            overflow log. They are deserialized once a consumer gets them.
+        """
+        with self.condition:
+            for line in lines:
+                self.spill_line(line)
+
+            self.update_depth()
+            self.condition.notify_all()
+
+    def snapshot(self, serialize = None):
+        """
+            Returns all queued and in-flight entities in serialized form
+
+            Only the in-memory entities are copied while holding the
+            lock, the overflow log is read afterwards. If the log was
+            emptied in the meantime, the snapshot is taken again.
+        """
+        serialize = serialize or self.serialize
+
+        while True:
+            with self.condition:
+                items = list(self.items)
+                in_flight = list(self.in_flight.values())
+                generation = self.spill_generation
+                spill_range = None
+
+                if self.spill_pending > 0:
+                    spill_range = (self.spill_read_offset, self.spill_write_offset)
+
+            spilled = []
+            if spill_range is not None:
+                start, end = spill_range
+                data = os.pread(self.spill_reader.fileno(), end - start, start)
+                spilled = [line.split('\t', 1)[1] for line in data.decode('utf-8').splitlines()]
+
+            with self.condition:
+                if generation == self.spill_generation:
+                    break
+
+        lines = [line if entity is None else serialize(entity) for entity, line in in_flight]
+        lines.extend(serialize(item) for item, _ in items)
+
+        return lines + spilled
+
+    def update_depth(self):
+        self.statistics['max_depth'] = max(self.statistics['max_depth'], self.qsize())
 
     def qsize(self):
-        return self.queue.qsize()
+        return len(self.items) + self.spill_pending
 
     def empty(self):
-        return self.queue.empty() and not self.is_enqueuing()
+        return self.qsize() == 0 and not self.is_enqueuing()
 
     def full(self):
-        return self.queue.full()
+        return len(self.items) >= self.maxsize and not self.can_spill()
+
+    def get_statistics(self):
+        with self.condition:
+            statistics = dict(self.statistics)
+            statistics['depth'] = self.qsize()
+            statistics['spill_pending'] = self.spill_pending
+
+        if statistics['spill_reads'] > 0:
+            statistics['spill_read_average_seconds'] = statistics['spill_read_seconds'] / statistics['spill_reads']
+
+        return statistics
+
+    def close(self):
+        if self.spill_writer is not None:
+            self.spill_writer.close()
+            self.spill_reader.close()
 
     def add_enqueuing_flag(self, id):
-        self.enqueuing_flags[id] = True
+        with self.condition:
+            self.enqueuing_flags[id] = True
 
     def update_enqueuing_flag(self, id, state):
-        self.enqueuing_flags[id] = state
+        with self.condition:
+            self.enqueuing_flags[id] = state
+            self.condition.notify_all()
 
     def is_enqueuing(self):
-        is_enqueuing = True
-
-        for flag in self.enqueuing_flags.values():
-            is_enqueuing = is_enqueuing and flag
-
-        return is_enqueuing
+        """ Checks whether any producer is still enqueuing """
+        return any(self.enqueuing_flags.values())
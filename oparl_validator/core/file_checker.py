@@ -0,0 +1,302 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2017 Stefan Graupner
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+from threading import BoundedSemaphore, Lock
+import time
+
+import requests
+
+from oparl_validator.core.metrics import metrics
+from oparl_validator.core.result import ResultAccumulator
+from oparl_validator.core.validation_worker import save_entity_results
+
+# response headers kept in the outcome of an url
+OUTCOME_HEADERS = ['content-disposition', 'content-type', 'content-length']
+
+
+def get_error_outcome(exception):
+    """ The outcome of an url whose check failed without a response """
+    return {'status': None, 'error': type(exception).__name__, 'headers': {}}
+
+
+def get_url_outcome(transport, url):
+    """
+        Sends a HEAD request to an url and returns its outcome
+
+        The outcome holds the status code and the headers relevant to
+        the file checks, or the name of the exception if the request
+        failed without a response.
+    """
+    try:
+        response = transport.head(url)
+    except requests.exceptions.RequestException as exception:
+        return get_error_outcome(exception)
+
+    return {
+        'status': response.status_code,
+        'error': None,
+        'headers': {name: response.headers[name] for name in OUTCOME_HEADERS if name in response.headers}
+    }
+
+
+class FileChecker:
+    """
+        Stage checking the urls of files apart from the validation workers
+
+        Workers hand the urls of deferred checks (see Check.deferred)
+        together with the entity's other validation results to the file
+        checker and continue with the next entity. The urls are requested
+        through the shared transport by a thread pool per check, so that
+        slow downloads of one check do not hold up the requests of the
+        others. Every check requests an url only once per run, however
+        many files reference it. Outcomes are kept in the cache for `ttl`
+        seconds, so that later runs do not need to request unchanged
+        urls again.
+
+        Once all urls of an entity are checked, the deferred checks turn
+        the outcomes into messages and the entity is saved with all of
+        its messages, see save_entity_results.
+
+        At most `max_pending` entities wait for their urls at a time,
+        `submit` blocks beyond that so that slow requests hold up the
+        workers instead of piling up entities. Checked urls only keep
+        their outcome as JSON text.
+    """
+
+    def __init__(self, transport, result, cache=None, ttl=86400, max_workers=8, max_pending=1000):
+        self.transport = transport
+        self.result = result
+        self.cache = cache
+        self.ttl = ttl
+
+        self.max_workers = max_workers
+        self.lock = Lock()
+
+        # serializes saving entities, which is kept out of self.lock as it writes the result stream
+        self.save_lock = Lock()
+
+        self.slots = BoundedSemaphore(max_pending)
+
+        # the thread pools by check name
+        self.executors = {}
+
+        # the checks which had urls submitted, by name
+        self.checks = {}
+
+        # the entities waiting for urls being checked, by check name and url
+        self.in_flight = {}
+
+        # the outcomes of all checked urls of this run as JSON text, by check name and url
+        self.outcomes = {}
+
+        # entities waiting for outcomes, by id
+        self.pending = {}
+
+        self.accumulator = ResultAccumulator(result.max_samples)
+
+        self.statistics = {
+            'entities': 0,
+            'urls': 0,
+            'deduplicated': 0,
+            'cached': 0,
+            'requested': 0,
+            'failed': 0
+        }
+
+    def submit(self, entity_type, entity_id, checks, validation_results):
+        """
+            Check the urls of an entity's deferred checks
+
+            `checks` are (check, urls, context) triples, with the urls
+            and the context the check returned for the entity. Returns
+            once the entity is accepted, it is saved once all of its urls
+            were checked.
+        """
+        self.slots.acquire()
+
+        keys = set()
+        for check, urls, context in checks:
+            keys.update((check, url) for url in urls.values() if url is not None)
+
+        entity = {
+            'type': entity_type,
+            'id': entity_id,
+            'checks': checks,
+            'results': validation_results,
+            'remaining': len(keys),
+            'submitted': time.perf_counter()
+        }
+
+        to_check = []
+
+        with self.lock:
+            self.statistics['entities'] += 1
+            self.pending[entity_id] = entity
+
+            for check, url in keys:
+                key = (check.__class__.__name__, url)
+
+                if key in self.outcomes:
+                    self.statistics['deduplicated'] += 1
+                    entity['remaining'] -= 1
+                elif key in self.in_flight:
+                    self.statistics['deduplicated'] += 1
+                    self.in_flight[key].append(entity)
+                else:
+                    self.statistics['urls'] += 1
+                    self.in_flight[key] = [entity]
+                    to_check.append((self.get_executor(check), check, url))
+
+            completed = entity['remaining'] == 0
+
+        for executor, check, url in to_check:
+            executor.submit(self.run_check, check, url)
+
+        if completed:
+            self.complete(entity)
+
+    def get_executor(self, check):
+        """ The thread pool of a check, the lock has to be held """
+        name = check.__class__.__name__
+
+        if name not in self.executors:
+            self.checks[name] = check
+            self.executors[name] = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix='file_checker_{}'.format(name)
+            )
+
+        return self.executors[name]
+
+    def run_check(self, check, url):
+        """ Checks an url and completes the entities which waited for nothing else """
+        try:
+            outcome = self.check_url(check, url)
+        except Exception as exception:
+            # a failing cache or check must not leave the entities waiting for the url forever
+            outcome = json.dumps(get_error_outcome(exception))
+
+            with self.lock:
+                self.statistics['failed'] += 1
+
+        key = (check.__class__.__name__, url)
+
+        completed = []
+
+        with self.lock:
+            self.outcomes[key] = outcome
+
+            for entity in self.in_flight.pop(key):
+                entity['remaining'] -= 1
+
+                if entity['remaining'] == 0:
+                    completed.append(entity)
+
+        for entity in completed:
+            self.complete(entity)
+
+    def check_url(self, check, url):
+        """ Returns the outcome of an url as JSON text """
+        name = check.__class__.__name__
+        key = '{}:{}'.format(name, url)
+
+        if self.cache is not None:
+            cached = self.cache.get_or_none(key)
+
+            if cached is not None:
+                with self.lock:
+                    self.statistics['cached'] += 1
+
+                return cached
+
+        start = time.perf_counter()
+        outcome = check.check_url(self.transport, url)
+        metrics.observe('file_check_seconds', time.perf_counter() - start, check=name)
+
+        with self.lock:
+            self.statistics['requested'] += 1
+
+            if outcome.get('error') is not None:
+                self.statistics['failed'] += 1
+
+        serialized = json.dumps(outcome)
+
+        # failures without a response are transient, the next run should try again
+        if self.cache is not None and outcome.get('error') is None:
+            self.cache.set(key, serialized, self.ttl)
+
+        return serialized
+
+    def complete(self, entity):
+        with self.lock:
+            outcomes = [
+                {url: self.outcomes[(check.__class__.__name__, url)] for url in urls.values() if url is not None}
+                for check, urls, context in entity['checks']
+            ]
+
+        results = list(entity['results'])
+
+        try:
+            for (check, urls, context), check_outcomes in zip(entity['checks'], outcomes):
+                check_outcomes = {url: json.loads(outcome) for url, outcome in check_outcomes.items()}
+                results.extend(check.evaluate_outcomes(urls, check_outcomes, context))
+
+            with self.save_lock:
+                save_entity_results(self.result, self.accumulator, entity['type'], entity['id'], results)
+        finally:
+            with self.lock:
+                del self.pending[entity['id']]
+
+            self.slots.release()
+
+        metrics.observe('file_check_entity_seconds', time.perf_counter() - entity['submitted'])
+
+    def get_pending(self):
+        """ Ids of the entities still waiting for the outcomes of their urls """
+        with self.lock:
+            return list(self.pending.keys())
+
+    def get_statistics(self):
+        with self.lock:
+            statistics = dict(self.statistics)
+            checks = dict(self.checks)
+
+        statistics['checks'] = {}
+        for name, check in checks.items():
+            check_statistics = check.get_statistics()
+
+            if check_statistics is not None:
+                statistics['checks'][name] = check_statistics
+
+        return statistics
+
+    def join(self):
+        """ Waits for all submitted entities to be saved """
+        with self.lock:
+            executors = list(self.executors.values())
+
+        for executor in executors:
+            executor.shutdown(wait=True)
@@ -0,0 +1,124 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2017 Stefan Graupner
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from array import array
+from threading import Lock
+
+# numeric suffixes up to this bound are stored inline with the prefix index
+SUFFIX_BITS = 40
+MAX_PREFIXES = 1 << 22
+
+
+class IdInterner:
+    """
+        Maps entity id urls to 64 bit integers and back
+
+        OParl ids usually share a handful of prefixes and end in a number,
+        e.g. `https://oparl.example.org/paper/4711`. Such ids are encoded
+        as the index of their interned prefix combined with the numeric
+        suffix. All other ids are interned as a whole and encoded as a
+        negative index.
+    """
+
+    def __init__(self):
+        self.prefixes = []
+        self.prefix_indices = {}
+        self.strings = []
+        self.string_indices = {}
+        self.lock = Lock()
+
+    def encode(self, entity_id):
+        prefix, _, suffix = entity_id.rpartition('/')
+
+        if suffix.isdigit() and (suffix == '0' or suffix[0] != '0') and int(suffix) < (1 << SUFFIX_BITS):
+            prefix_index = self.intern(self.prefixes, self.prefix_indices, prefix + '/')
+
+            if prefix_index < MAX_PREFIXES:
+                return (prefix_index << SUFFIX_BITS) | int(suffix)
+
+        return -1 - self.intern(self.strings, self.string_indices, entity_id)
+
+    def decode(self, key):
+        if key < 0:
+            return self.strings[-1 - key]
+
+        return '{}{}'.format(self.prefixes[key >> SUFFIX_BITS], key & ((1 << SUFFIX_BITS) - 1))
+
+    def intern(self, values, indices, value):
+        index = indices.get(value)
+
+        if index is None:
+            with self.lock:
+                index = indices.get(value)
+
+                if index is None:
+                    index = len(values)
+                    values.append(value)
+                    indices[value] = index
+
+        return index
+
+
+# the interner shared by all id lists, so that lists can be merged without re-encoding
+interner = IdInterner()
+
+
+class CompactIdList:
+    """
+        Append-only list of entity ids stored as an array of integers
+
+        Repeating the last appended id is ignored, as all messages of an
+        entity are recorded one after another.
+    """
+
+    __slots__ = ['keys']
+
+    def __init__(self, entity_ids=None):
+        self.keys = array('q')
+
+        for entity_id in entity_ids or []:
+            self.append(entity_id)
+
+    def append(self, entity_id):
+        key = interner.encode(entity_id)
+
+        if len(self.keys) == 0 or self.keys[-1] != key:
+            self.keys.append(key)
+
+    def is_last(self, entity_id):
+        """ Checks whether an id was the last one appended, without interning it """
+        return len(self.keys) > 0 and interner.decode(self.keys[-1]) == entity_id
+
+    def extend(self, other, limit=None):
+        if limit is None:
+            self.keys.extend(other.keys)
+        else:
+            self.keys.extend(other.keys[:max(limit - len(self.keys), 0)])
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __iter__(self):
+        for key in self.keys:
+            yield interner.decode(key)
@@ -0,0 +1,102 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2017 Stefan Graupner
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import json
+from threading import Lock
+
+from oparl_validator.core.utils import sha1_hexdigest
+
+
+class ValidationMemo:
+    """
+        Persistent memo of validation messages keyed by entity content
+
+        Entities whose raw document did not change since an earlier run
+        produce the same messages, as long as the validator and its checks
+        did not change either. The memo maps a key made of the validator
+        identity (memo version, liboparl build and check set) and the SHA-1
+        of an entity's raw document to the (severity, description) pairs of
+        its messages.
+
+        Memos are stored in the tiers of the document cache under a key
+        prefix of their own. Messages of checks which depend on more than
+        the document, like the reachability of files, are never memoized.
+    """
+
+    # memos outlive the documents they were made for
+    ttl = 30 * 24 * 3600
+
+    # bump whenever the validator changes the messages of memoizable checks
+    version = 1
+
+    def __init__(self, cache, get_document, ident):
+        self.cache = cache
+        self.get_document = get_document
+        self.ident = ident
+        self.lock = Lock()
+
+        self.statistics = {
+            'lookups': 0,
+            'hits': 0,
+            'misses': 0,
+            'unavailable': 0
+        }
+
+    def get_key(self, entity_id):
+        """ Returns the memo key of an entity, None if its raw document is not available """
+        document = self.get_document(entity_id)
+
+        if document is None:
+            with self.lock:
+                self.statistics['unavailable'] += 1
+
+            return None
+
+        return sha1_hexdigest('{}:{}'.format(self.ident, sha1_hexdigest(document)))
+
+    def get(self, key):
+        """ Returns the memoized messages of a key, None if there are none """
+        messages = self.cache.get_or_none(key)
+
+        with self.lock:
+            self.statistics['lookups'] += 1
+            self.statistics['hits' if messages is not None else 'misses'] += 1
+
+        if messages is None:
+            return None
+
+        return [tuple(message) for message in json.loads(messages)]
+
+    def set(self, key, messages):
+        self.cache.set(key, json.dumps(messages), self.ttl)
+
+    def get_statistics(self):
+        with self.lock:
+            statistics = dict(self.statistics)
+
+        statistics['hit_rate'] = 0
+        if statistics['lookups'] > 0:
+            statistics['hit_rate'] = statistics['hits'] / statistics['lookups']
+
+        return statistics
@@ -0,0 +1,264 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2017 Stefan Graupner
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from bisect import bisect_left
+import os
+from threading import Event, Lock, Thread
+import time
+
+# upper bounds in seconds, suitable for both cache hits and slow servers
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60
+)
+
+METRIC_PREFIX = 'oparl_validator_'
+
+
+class Histogram:
+    """
+        Streaming histogram with fixed buckets
+
+        Only the number of observations per bucket is kept, quantiles
+        are estimated by interpolating within the bucket they fall into.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0
+        self.max = 0
+        self.lock = Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+            self.max = max(self.max, value)
+
+    def merge(self, histogram):
+        with self.lock:
+            for index, count in enumerate(histogram.counts):
+                self.counts[index] += count
+
+            self.count += histogram.count
+            self.sum += histogram.sum
+            self.max = max(self.max, histogram.max)
+
+    def quantile(self, q):
+        with self.lock:
+            if self.count == 0:
+                return 0
+
+            rank = q * self.count
+            seen = 0
+
+            for index, count in enumerate(self.counts):
+                if count > 0 and seen + count >= rank:
+                    lower = self.buckets[index - 1] if index > 0 else 0
+                    upper = self.buckets[index] if index < len(self.buckets) else self.max
+
+                    return min(lower + (upper - lower) * (rank - seen) / count, self.max)
+
+                seen += count
+
+            return self.max
+
+    def get_cumulative_counts(self):
+        """ Returns (upper bound, cumulative count) pairs, the last bound is infinite """
+        with self.lock:
+            counts = list(self.counts)
+
+        cumulative = []
+        total = 0
+        for bound, count in zip(self.buckets + [float('inf')], counts):
+            total += count
+            cumulative.append((bound, total))
+
+        return cumulative
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99)
+        }
+
+
+class Metrics:
+    """
+        Registry of the metrics of a validation run
+
+        Metrics are identified by their name and labels. Histograms
+        collect durations, counters and gauges single values and series
+        the samples of a value over the time of the run.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+            self.counters = {}
+            self.gauges = {}
+            self.series = {}
+            self.started = time.monotonic()
+
+    def get_key(self, name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def histogram(self, name, **labels):
+        key = self.get_key(name, labels)
+        histogram = self.histograms.get(key)
+
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(key, Histogram())
+
+        return histogram
+
+    def observe(self, name, value, **labels):
+        self.histogram(name, **labels).observe(value)
+
+    def increment(self, name, value=1, **labels):
+        key = self.get_key(name, labels)
+
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        with self.lock:
+            self.gauges[self.get_key(name, labels)] = value
+
+    def sample(self, name, value):
+        """ Adds a sample of a value at the current time of the run """
+        with self.lock:
+            self.series.setdefault(name, []).append((round(time.monotonic() - self.started, 3), value))
+
+    def to_dict(self):
+        with self.lock:
+            histograms = list(self.histograms.items())
+            counters = list(self.counters.items())
+            gauges = list(self.gauges.items())
+            series = {name: list(samples) for name, samples in self.series.items()}
+
+        metrics = {
+            'histograms': {},
+            'counters': {},
+            'gauges': {},
+            'series': series
+        }
+
+        for kind, values in [('histograms', histograms), ('counters', counters), ('gauges', gauges)]:
+            for (name, labels), value in sorted(values, key=lambda item: item[0]):
+                if kind == 'histograms':
+                    value = value.to_dict()
+
+                metrics[kind].setdefault(name, []).append({'labels': dict(labels), 'value': value})
+
+        return metrics
+
+    def to_prometheus(self):
+        """ Renders all metrics except series in the Prometheus text exposition format """
+        with self.lock:
+            histograms = sorted(self.histograms.items(), key=lambda item: item[0])
+            counters = sorted(self.counters.items(), key=lambda item: item[0])
+            gauges = sorted(self.gauges.items(), key=lambda item: item[0])
+
+        lines = []
+        types = set()
+
+        def add_type(name, kind):
+            if name not in types:
+                lines.append('# TYPE {}{} {}'.format(METRIC_PREFIX, name, kind))
+                types.add(name)
+
+        for (name, labels), histogram in histograms:
+            add_type(name, 'histogram')
+
+            for bound, count in histogram.get_cumulative_counts():
+                bucket_labels = labels + (('le', '+Inf' if bound == float('inf') else repr(bound)),)
+                lines.append('{}{}_bucket{} {}'.format(METRIC_PREFIX, name, format_labels(bucket_labels), count))
+
+            lines.append('{}{}_sum{} {}'.format(METRIC_PREFIX, name, format_labels(labels), histogram.sum))
+            lines.append('{}{}_count{} {}'.format(METRIC_PREFIX, name, format_labels(labels), histogram.count))
+
+        for kind, values in [('counter', counters), ('gauge', gauges)]:
+            for (name, labels), value in values:
+                add_type(name, kind)
+                lines.append('{}{}{} {}'.format(METRIC_PREFIX, name, format_labels(labels), value))
+
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, file_name):
+        """ Writes a textfile for e.g. the textfile collector of the node exporter, replacing it atomically """
+        temporary_file_name = '{}.tmp'.format(file_name)
+
+        with open(temporary_file_name, 'w') as f:
+            f.write(self.to_prometheus())
+
+        os.replace(temporary_file_name, file_name)
+
+
+def format_labels(labels):
+    if len(labels) == 0:
+        return ''
+
+    return '{' + ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+        for name, value in labels
+    ) + '}'
+
+
+class MetricsSampler(Thread):
+    """ Thread sampling values, e.g. the depth of the entity queue, in a fixed interval """
+
+    def __init__(self, metrics, samplers, interval=1):
+        super(MetricsSampler, self).__init__()
+        self.metrics = metrics
+        self.samplers = samplers
+        self.interval = interval
+        self.stopped = Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            for name, sampler in self.samplers.items():
+                self.metrics.sample(name, sampler())
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+# the metrics of the current validation run, reset when a validation starts
+metrics = Metrics()
@@ -0,0 +1,122 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2017 Stefan Graupner
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from threading import Lock
+from urllib.parse import urlparse
+
+from oparl_validator.core.metrics import Histogram
+
+
+class NetworkStatistics:
+    """
+        Telemetry of all requests of a validation run
+
+        Keeps response time histograms per host and per entity type,
+        the number of responses per status code, the bytes transferred
+        on the wire and after decoding, and how many documents were
+        served from the cache instead of the network and how many
+        requests were retried.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.hosts = {}
+        self.types = {}
+        self.status = {}
+        self.served = {
+            'cache': 0,
+            'network': 0,
+            'failed': 0
+        }
+        self.wire_bytes = 0
+        self.decoded_bytes = 0
+        self.retries = 0
+
+    def get_histogram(self, histograms, key):
+        with self.lock:
+            if key not in histograms:
+                histograms[key] = Histogram()
+
+            return histograms[key]
+
+    def record_response(self, response, stream=False):
+        """ Records a response of the transport, the bodies of streamed responses are counted by record_streamed """
+        self.get_histogram(self.hosts, urlparse(response.url).netloc).observe(response.elapsed.total_seconds())
+
+        decoded_bytes = 0
+        wire_bytes = 0
+
+        if not stream:
+            decoded_bytes = len(response.content or b'')
+            wire_bytes = decoded_bytes
+
+            # the raw urllib3 response knows the number of (compressed) bytes read from the connection
+            if response.raw is not None and hasattr(response.raw, 'tell'):
+                wire_bytes = response.raw.tell()
+
+        with self.lock:
+            status = str(response.status_code)
+            self.status[status] = self.status.get(status, 0) + 1
+            self.decoded_bytes += decoded_bytes
+            self.wire_bytes += wire_bytes
+
+    def record_streamed(self, num_bytes):
+        """ Counts the bytes read from the body of a streamed response """
+        with self.lock:
+            self.wire_bytes += num_bytes
+            self.decoded_bytes += num_bytes
+
+    def record_document(self, entity_type, elapsed):
+        """ Records the response time of a document of the given entity type """
+        self.get_histogram(self.types, entity_type).observe(elapsed)
+
+    def record_served(self, source):
+        """ Counts a resolved document by its source, `cache`, `network` or `failed` """
+        with self.lock:
+            self.served[source] += 1
+
+    def record_retry(self):
+        with self.lock:
+            self.retries += 1
+
+    def to_dict(self):
+        with self.lock:
+            hosts = dict(self.hosts)
+            types = dict(self.types)
+            statistics = {
+                'status': dict(self.status),
+                'served': dict(self.served),
+                'retries': self.retries,
+                'bytes': {
+                    'wire': self.wire_bytes,
+                    'decoded': self.decoded_bytes
+                }
+            }
+
+        statistics['latency'] = {
+            'hosts': {host: histogram.to_dict() for host, histogram in hosts.items()},
+            'types': {entity_type: histogram.to_dict() for entity_type, histogram in types.items()}
+        }
+
+        return statistics
@@ -24,24 +24,38 @@ SOFTWARE.
 
 from glob import glob
 from importlib import import_module
+import os
+import time
 
+from oparl_validator.core.metrics import metrics
 from oparl_validator.core.utils import camelize_snake, get_base_classes_from_instance
 
 class Pool:
     """
         Collect all extra checks and provide them in a pool
         for easy use across validation worker threads.^
+
+        Every check is configured with the validator's options and
+        left out if it is not enabled, see Check.configure.
     """
 
-    def __init__(self):
+    def __init__(self, transport=None, options=None):
         self.checks = {}
-        check_files = glob('extra/check_*.py')
+        self.transport = transport
+
+        extra_directory = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'extra')
+        check_files = glob(os.path.join(extra_directory, 'check_*.py'))
         for check_file in check_files:
             class_instance = self.load_class_from_file(check_file)
 
             if not self.is_check(class_instance):
                 continue
 
+            class_instance.transport = self.transport
+
+            if not class_instance.configure(options):
+                continue
+
             self.add_check(class_instance)
 
 
@@ -55,25 +69,66 @@ class Pool:
         return class_instance
 
     def extract_loading_info(self, filename):
-        module_name = filename.split('.py')[0].replace('/', '.')
-        class_name = camelize_snake(module_name.split('.')[1])
+        check_name = os.path.basename(filename).split('.py')[0]
+        module_name = 'oparl_validator.extra.{}'.format(check_name)
+        class_name = camelize_snake(check_name)
 
         return (module_name, class_name)
 
     def is_check(self, class_instance):
-        return 'core.check.Check' in get_base_classes_from_instance(class_instance)
+        return 'oparl_validator.core.check.Check' in get_base_classes_from_instance(class_instance)
 
     def add_check(self, class_instance):
         entity = class_instance.evaluates_entity_type()
-        if not entity in self.checks.keys() or type(self.checks[entity]) is not 'list':
+        if entity not in self.checks:
             self.checks[entity] = []
 
         self.checks[entity].append(class_instance)
 
-    def get_checks_for_type(self, type : str):
+    def get_checks_for_type(self, type : str, memoizable : bool = None, deferred : bool = None):
+        """
+            Return the checks for an entity type, optionally only the
+            (not) memoizable or (not) deferred ones
+        """
         type = type.lower()
 
-        if type in self.checks.keys():
-            return self.checks[type]
-
-        return []
\ No newline at end of file
+        if type not in self.checks.keys():
+            return []
+
+        return [
+            check for check in self.checks[type]
+            if (memoizable is None or check.memoizable == memoizable) and
+                (deferred is None or check.deferred == deferred)
+        ]
+
+    def count_deferred_checks(self):
+        """ Return the number of deferred checks of all entity types """
+        return sum(1 for checks in self.checks.values() for check in checks if check.deferred)
+
+    def evaluate(self, entity, type : str, memoizable : bool = None, deferred : bool = None):
+        """
+            Evaluate the checks for an entity type on an entity
+
+            Returns the results of all checks and records the duration of
+            every check in the run's metrics.
+        """
+        results = []
+
+        for check in self.get_checks_for_type(type, memoizable, deferred):
+            start = time.perf_counter()
+            check_results = check.evaluate(entity)
+            metrics.observe('check_seconds', time.perf_counter() - start, check=check.__class__.__name__)
+
+            if check_results is not None and isinstance(check_results, list):
+                results.extend(check_results)
+
+        return results
+
+    def get_ident(self):
+        """ Identifies the set of memoizable checks """
+        return ','.join(sorted(
+            check.__class__.__name__
+            for checks in self.checks.values()
+            for check in checks
+            if check.memoizable
+        ))
\ No newline at end of file
@@ -0,0 +1,211 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2017 Stefan Graupner
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import json
+from threading import BoundedSemaphore, Lock
+from urllib.parse import urlparse
+
+# keys of OParl entities which reference urls that are not fetched through liboparl
+IGNORED_KEYS = [
+    'id',
+    'web',
+    'accessUrl',
+    'downloadUrl',
+    'externalServiceUrl',
+    'license',
+    'type',
+    'first',
+    'prev',
+    'last',
+    'self'
+]
+
+
+class Prefetcher:
+    """
+        Fetch urls ahead of liboparl
+
+        liboparl resolves urls one at a time through the synchronous
+        `resolve_url` callback of the client. The prefetcher inspects
+        every fetched document for the next page of a list and for
+        referenced entities and fetches those concurrently into the
+        cache, so that most callbacks become cache hits.
+
+        The number of prefetches which are either queued or running is
+        limited, urls discovered beyond that limit are simply left
+        for liboparl to request. Urls whose prefetch failed are never
+        scheduled again.
+    """
+
+    def __init__(self, fetch, cache, endpoint, max_in_flight=8):
+        """
+        Initialize a Prefetcher instance
+
+        `fetch` is called with an url, it must store the document in
+        the cache and return its text or None if fetching failed.
+        Only urls on the same host as the endpoint are prefetched.
+        """
+        self.fetch = fetch
+        self.cache = cache
+        self.host = urlparse(endpoint).netloc
+
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight)
+        self.slots = BoundedSemaphore(max_in_flight)
+        self.lock = Lock()
+
+        self.in_flight = {}
+        self.prefetched = set()
+        self.failed = set()
+
+        self.statistics = {
+            'scheduled': 0,
+            'fetched': 0,
+            'failed': 0,
+            'served': 0
+        }
+
+    def schedule_from(self, data):
+        """
+        Schedule the prefetching of all urls referenced by a document
+
+        The urls of a document are looked up in the cache in one batch.
+        """
+        urls = [url for url in self.extract_urls(data) if not self.is_known(url)]
+        urls = list(OrderedDict.fromkeys(urls))
+
+        if len(urls) == 0:
+            return
+
+        cached = self.cache.get_many(urls)
+
+        for url in urls:
+            entry = cached.get(url)
+
+            if entry is not None and entry.is_fresh():
+                continue
+
+            self.schedule(url)
+
+    def schedule(self, url):
+        if not self.slots.acquire(blocking=False):
+            return
+
+        with self.lock:
+            if url in self.in_flight or url in self.prefetched or url in self.failed:
+                self.slots.release()
+                return
+
+            self.statistics['scheduled'] += 1
+            self.in_flight[url] = self.executor.submit(self.prefetch, url)
+
+    def is_known(self, url):
+        with self.lock:
+            return url in self.in_flight or url in self.prefetched or url in self.failed
+
+    def prefetch(self, url):
+        try:
+            data = self.fetch(url)
+        except Exception:
+            data = None
+        finally:
+            self.slots.release()
+
+        with self.lock:
+            del self.in_flight[url]
+
+            if data is None:
+                self.statistics['failed'] += 1
+                self.failed.add(url)
+                return
+
+            self.statistics['fetched'] += 1
+            self.prefetched.add(url)
+
+        self.schedule_from(data)
+
+    def wait(self, url):
+        """ Wait for a pending prefetch of an url to finish """
+        with self.lock:
+            future = self.in_flight.get(url)
+
+        if future is not None:
+            future.exception()
+
+    def was_prefetched(self, url):
+        """
+        Checks whether an url is served from a prefetch
+
+        Every prefetched url is counted only once, later requests
+        of the same url are regular cache hits.
+        """
+        with self.lock:
+            if url not in self.prefetched:
+                return False
+
+            self.prefetched.remove(url)
+            self.statistics['served'] += 1
+
+            return True
+
+    def extract_urls(self, data):
+        """ Collects the next page link and all referenced entity urls of a document """
+        try:
+            document = json.loads(data)
+        except ValueError:
+            return []
+
+        urls = []
+
+        if isinstance(document, dict) and isinstance(document.get('links'), dict):
+            next_url = document['links'].get('next')
+            if isinstance(next_url, str):
+                urls.append(next_url)
+
+        self.collect_urls(document, urls)
+
+        return urls
+
+    def collect_urls(self, node, urls):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key in IGNORED_KEYS:
+                    continue
+
+                self.collect_urls(value, urls)
+        elif isinstance(node, list):
+            for value in node:
+                self.collect_urls(value, urls)
+        elif isinstance(node, str) and self.is_prefetchable(node):
+            urls.append(node)
+
+    def is_prefetchable(self, value):
+        if not value.startswith('http'):
+            return False
+
+        return urlparse(value).netloc == self.host
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,187 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2017 Stefan Graupner
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+import gi
+
+gi.require_version('OParl', '0.2')
+from gi.repository import OParl
+from gi.repository import GLib
+
+from oparl_validator.core.cache import Cache
+from oparl_validator.core.cache_backends import create_cache_backends
+from oparl_validator.core.pool import Pool
+from oparl_validator.core.rate_limiter import RateLimiter
+from oparl_validator.core.result import Result
+from oparl_validator.core.transport import PERMANENT_STATUS_CODES, Transport
+from oparl_validator.core.utils import get_entity_type_from_object
+
+# State of a validation process, set up once per process by initialize_process
+process_state = {}
+
+
+def create_process_pool(num_processes, configuration):
+    """
+        Create the pool of validation processes
+
+        The configuration must be picklable, see initialize_process for
+        the expected keys. Processes are spawned rather than forked as the
+        parent process is running threads and a GLib main context.
+    """
+    return ProcessPoolExecutor(
+        max_workers=num_processes,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=initialize_process,
+        initargs=(configuration,)
+    )
+
+
+def initialize_process(configuration):
+    """
+        Set up the liboparl client, cache and checks of a validation process
+
+        Documents are resolved from the cache shared with the parent
+        process (redis or sqlite) and fetched from the network if missing.
+    """
+    tiers = create_cache_backends(
+        configuration['cache'],
+        path=configuration['cache_file'],
+        redis_server=configuration['redis_host'],
+        redis_port=configuration['redis_port']
+    )
+
+    rate_limiter = None
+    if configuration['max_concurrency'] > 0:
+        rate_limiter = RateLimiter(
+            initial_limit=configuration['initial_concurrency'],
+            max_limit=configuration['max_concurrency'],
+            max_rps=configuration['max_rps']
+        )
+
+    transport = Transport(
+        timeout=configuration['timeout'],
+        user_agent=configuration['user_agent'],
+        rate_limiter=rate_limiter,
+        retries=configuration['retries'],
+        retry_backoff=configuration['retry_backoff']
+    )
+
+    # responses are only recorded by the parent process, which fetches nearly all documents
+    if configuration['replay'] is not None:
+        transport.replay(configuration['replay'], configuration['replay_latency'])
+
+    client = OParl.Client()
+    client.set_strict(False)
+    client.connect('resolve_url', resolve_url)
+
+    process_state['cache'] = Cache(tiers=tiers, compression=configuration['cache_compression'])
+    process_state['negative_ttl'] = configuration['negative_ttl']
+    process_state['negative_cache'] = Cache(
+        basekey='OParlValidator_Failed_',
+        tiers=tiers,
+        compression=configuration['cache_compression']
+    )
+    process_state['transport'] = transport
+    process_state['verify'] = configuration['ssl']
+    process_state['client'] = client
+    process_state['check_pool'] = Pool(transport)
+    process_state['documents'] = {}
+
+
+def resolve_url(client, url):
+    if url is None:
+        return None
+
+    data = process_state['documents'].get(url)
+
+    if data is None:
+        data = process_state['cache'].get_or_none(url)
+
+    # failed urls are only counted by the parent process, which resolves the references of nearly all entities
+    if data is None and process_state['negative_ttl'] > 0:
+        status = process_state['negative_cache'].get_or_none(url)
+
+        if status is not None:
+            return OParl.ResolveUrlResult(resolved_data=None, success=False, status_code=-1)
+
+    if data is None:
+        try:
+            r = process_state['transport'].get(url, verify=process_state['verify'])
+        except Exception:
+            return OParl.ResolveUrlResult(resolved_data=None, success=False, status_code=-1)
+
+        if r.status_code in PERMANENT_STATUS_CODES and process_state['negative_ttl'] > 0:
+            process_state['negative_cache'].set(url, str(r.status_code), process_state['negative_ttl'])
+
+        if not r.ok:
+            return OParl.ResolveUrlResult(resolved_data=None, success=False, status_code=-1)
+
+        data = r.text
+        process_state['cache'].set(url, data)
+
+    return OParl.ResolveUrlResult(resolved_data=data, success=True, status_code=-1)
+
+
+def validate_entity(entity_id, document=None):
+    """
+        Rebuild and validate an entity in a validation process
+
+        The raw document can be passed along for entities which were
+        embedded in list pages and thus are not cached under their own
+        url. Returns a compact record of the entity type, whether the
+        validation failed fatally and the (severity, description) pairs
+        of all messages.
+    """
+    if document is not None:
+        process_state['documents'][entity_id] = document
+
+    record = {
+        'id': entity_id,
+        'type': None,
+        'fatal': False,
+        'messages': []
+    }
+
+    try:
+        entity = process_state['client'].parse_url(entity_id)
+        record['type'] = get_entity_type_from_object(entity)
+
+        validation_results = list(entity.validate())
+
+        # checks which cannot be memoized are evaluated by the validation workers
+        validation_results.extend(process_state['check_pool'].evaluate(entity, record['type'], memoizable=True))
+
+        for validation_result in validation_results:
+            record['messages'].append((
+                Result.format_severity(validation_result.get_severity()),
+                validation_result.get_description()
+            ))
+    except GLib.Error:
+        record['fatal'] = True
+    finally:
+        process_state['documents'].pop(entity_id, None)
+
+    return record
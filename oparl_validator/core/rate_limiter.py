@@ -0,0 +1,321 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2017 Stefan Graupner
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from threading import Condition, Lock
+import time
+from urllib.parse import urlparse
+
+from oparl_validator.core.output import Output
+
+# status codes with which servers signal that they are overloaded
+THROTTLE_STATUS_CODES = [429, 503]
+
+# response times rising by less than this many seconds are considered noise
+MIN_LATENCY_INCREASE = 0.05
+
+
+def get_retry_after(headers, default=None):
+    """ Returns the seconds to wait given by a Retry-After header, either in seconds or as a date """
+    value = headers.get('retry-after')
+
+    if value is None:
+        return default
+
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0)
+    except (TypeError, ValueError):
+        return default
+
+
+class HostLimiter:
+    """
+        Adaptive concurrency limit of a single host
+
+        The limit is adjusted once per window of `limit` completed
+        requests: it grows by one if the window went well and shrinks
+        multiplicatively if the server throttled or failed requests or
+        if its response times rose well above the fastest window seen
+        so far. Requests are additionally spaced to stay below the
+        requests per second ceiling, and nothing is sent to a host
+        until the time given in its last Retry-After header passed.
+    """
+
+    def __init__(self, host, initial_limit=4, max_limit=32, max_rps=0,
+                 latency_tolerance=2.0, error_threshold=0.05):
+        self.host = host
+        self.limit = float(min(initial_limit, max_limit))
+        self.max_limit = max_limit
+        self.min_interval = 1 / max_rps if max_rps > 0 else 0
+        self.latency_tolerance = latency_tolerance
+        self.error_threshold = error_threshold
+
+        self.condition = Condition()
+        self.in_flight = 0
+        self.next_start = 0
+        self.blocked_until = 0
+        self.decreased_at = 0
+
+        self.window_requests = 0
+        self.window_errors = 0
+        self.window_latency = 0
+        self.base_latency = None
+
+        self.statistics = {
+            'requests': 0,
+            'errors': 0,
+            'throttled': 0,
+            'increases': 0,
+            'decreases': 0,
+            'peak_limit': int(self.limit),
+            'waited_seconds': 0.0
+        }
+
+    def acquire(self):
+        """ Blocks until a request may be sent to the host, returns when it was sent """
+        start = time.monotonic()
+
+        with self.condition:
+            while True:
+                now = time.monotonic()
+
+                if now < self.blocked_until:
+                    self.condition.wait(self.blocked_until - now)
+                    continue
+
+                if self.in_flight >= int(self.limit):
+                    self.condition.wait()
+                    continue
+
+                break
+
+            self.in_flight += 1
+
+            # reserve the next start slot below the requests per second ceiling
+            delay = max(self.next_start - now, 0)
+            self.next_start = max(self.next_start, now) + self.min_interval
+
+        if delay > 0:
+            time.sleep(delay)
+
+        sent = time.monotonic()
+
+        with self.condition:
+            self.statistics['waited_seconds'] += sent - start
+
+        return sent
+
+    def release(self, sent, latency, status_code=None, retry_after=None):
+        """
+            Frees the slot of a completed request and adjusts the limit
+
+            The status code is None if the request failed without a
+            response, e.g. because of a timeout. Requests which were
+            sent before the last decrease do not decrease the limit
+            again, as they were sent at the old limit.
+        """
+        with self.condition:
+            self.in_flight -= 1
+            self.statistics['requests'] += 1
+
+            throttled = status_code in THROTTLE_STATUS_CODES
+            failed = status_code is None or status_code >= 500
+
+            if throttled:
+                self.statistics['throttled'] += 1
+
+                if retry_after is not None:
+                    self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+            elif failed:
+                self.statistics['errors'] += 1
+                self.window_errors += 1
+
+            self.window_requests += 1
+            self.window_latency += latency
+
+            if throttled and sent > self.decreased_at:
+                # the server asked us to slow down, react right away instead of waiting for the window
+                self.decrease(0.5, 'throttled by the server')
+            elif self.window_requests >= max(int(self.limit), 1):
+                self.adjust()
+
+            self.condition.notify_all()
+
+    def adjust(self):
+        """ Adjusts the limit at the end of a window, the lock has to be held """
+        error_rate = self.window_errors / self.window_requests
+        latency = self.window_latency / self.window_requests
+
+        if self.base_latency is None or latency < self.base_latency:
+            self.base_latency = latency
+
+        if error_rate > self.error_threshold:
+            self.decrease(0.5, '{:.0%} failed requests'.format(error_rate))
+        elif latency > self.base_latency * self.latency_tolerance and \
+                latency - self.base_latency > MIN_LATENCY_INCREASE:
+            self.decrease(0.75, 'response times rose to {:.0f}ms'.format(latency * 1000))
+        else:
+            self.increase()
+
+    def increase(self):
+        if self.limit < self.max_limit:
+            self.limit = min(self.limit + 1, self.max_limit)
+            self.statistics['increases'] += 1
+
+            if self.limit > self.statistics['peak_limit']:
+                self.statistics['peak_limit'] = int(self.limit)
+
+        self.reset_window()
+
+    def decrease(self, factor, reason):
+        limit = max(self.limit * factor, 1)
+
+        if int(limit) < int(self.limit):
+            Output.message('Limiting {} to {} concurrent requests, {}', self.host, int(limit), reason)
+
+        self.limit = limit
+        self.decreased_at = time.monotonic()
+        self.statistics['decreases'] += 1
+
+        # the slower responses of the overloaded server must not become the new normal
+        self.reset_window()
+
+    def reset_window(self):
+        self.window_requests = 0
+        self.window_errors = 0
+        self.window_latency = 0
+
+    def get_statistics(self):
+        with self.condition:
+            statistics = dict(self.statistics)
+            statistics['limit'] = int(self.limit)
+            statistics['waited_seconds'] = round(statistics['waited_seconds'], 3)
+
+        return statistics
+
+
+class RateLimiter:
+    """
+        Per-host concurrency and rate limits of the transport
+
+        Every host gets its own HostLimiter, so a slow download host
+        of the files does not throttle the requests to the endpoint.
+    """
+
+    def __init__(self, initial_limit=4, max_limit=32, max_rps=0):
+        self.initial_limit = initial_limit
+        self.max_limit = max_limit
+        self.max_rps = max_rps
+
+        self.lock = Lock()
+        self.hosts = {}
+
+    def get_host_limiter(self, url):
+        host = urlparse(url).netloc
+
+        with self.lock:
+            if host not in self.hosts:
+                self.hosts[host] = HostLimiter(host, self.initial_limit, self.max_limit, self.max_rps)
+
+            return self.hosts[host]
+
+    @contextmanager
+    def limit(self, url):
+        """
+            Wraps a request to the url
+
+            The context yields a dict in which the request stores its
+            `response`, which is evaluated once the request completed.
+        """
+        limiter = self.get_host_limiter(url)
+        sent = limiter.acquire()
+
+        outcome = {'response': None}
+
+        try:
+            yield outcome
+        finally:
+            response = outcome['response']
+
+            if response is None:
+                limiter.release(sent, time.monotonic() - sent)
+            else:
+                limiter.release(
+                    sent,
+                    response.elapsed.total_seconds(),
+                    response.status_code,
+                    get_retry_after(response.headers)
+                )
+
+    def get_statistics(self):
+        with self.lock:
+            hosts = dict(self.hosts)
+
+        return {host: limiter.get_statistics() for host, limiter in hosts.items()}
+
+    def log_limits(self):
+        """ Prints the concurrency limit each host settled on """
+        for host, statistics in sorted(self.get_statistics().items()):
+            Output.message(
+                'Settled on {} concurrent requests to {} (peak {}, {} throttled, {} failed)',
+                statistics['limit'],
+                host,
+                statistics['peak_limit'],
+                statistics['throttled'],
+                statistics['errors']
+            )
+
+
+class BandwidthBudget:
+    """
+        Global limit of the bytes per second read from downloads
+
+        Readers consume the bytes of every chunk they read and are held
+        back until the budget covers them, so that the downloads of all
+        threads together stay below the limit. TCP flow control then
+        slows down the senders as well.
+    """
+
+    def __init__(self, bytes_per_second=0):
+        self.bytes_per_second = bytes_per_second
+        self.lock = Lock()
+        self.next_free = 0
+
+    def consume(self, num_bytes):
+        if self.bytes_per_second <= 0:
+            return
+
+        with self.lock:
+            now = time.monotonic()
+            self.next_free = max(self.next_free, now) + num_bytes / self.bytes_per_second
+            delay = self.next_free - now
+
+        if delay > 0:
+            time.sleep(delay)
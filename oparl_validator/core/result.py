@@ -22,14 +22,18 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
+import io
 import json
-from datetime import datetime, timedelta
+from datetime import datetime
 from subprocess import check_output
 from threading import Lock
 
 from beautifultable import BeautifulTable
 import gi
 
+from oparl_validator.core.id_table import CompactIdList
+from oparl_validator.core.output import Output
+from oparl_validator.core.result_stream import DateTimeEncoder, is_stream_file, read_records
 from oparl_validator.core.utils import get_entity_type_from_object
 from oparl_validator.core.utils import sha1_hexdigest
 
@@ -41,10 +45,63 @@ Totals:
 \t{} fatal
 """
 
+incremental_template = """
+Incremental:
+\t{} entities changed since {}, {} of them created, {} entities deleted
+\t{} failed and {} fatal unchanged entities carried forward from the baseline
+"""
+
 network_template = """
 Network:
 \t{}
-\tAverage response time: {}
+\tServed: {} documents from the cache, {} from the network, {} failed
+\tRetried: {} requests
+\tTransferred: {} bytes on the wire, {} bytes decoded
+\tStatus codes: {}
+\tConnections: {} opened, {} reused
+\tPrefetched: {} entities, {} served from prefetch
+\tRevalidated: {} unchanged entities
+"""
+
+latency_template = """\tResponse times by {} (p50 / p90 / p99 / max):
+{}"""
+
+limits_template = """\tConcurrent requests per host (final / peak):
+{}"""
+
+cache_template = """
+Cache:
+\t{} lookups, {} hits, {} misses
+{}\tStored {} of {} bytes ({:.0%}), {:.2f}s spent decompressing
+"""
+
+memo_template = """\tMemoized: {} lookups, {} hits ({:.0%}), {} entities without document
+"""
+
+queue_template = """
+Queue:
+\tMaximum depth: {}
+\tSpilled to disk: {} entities ({} bytes), read back in {:.2f}ms on average
+"""
+
+files_template = """
+Files:
+\t{} files with {} distinct url checks, {} more skipped as they were shared with other files
+\t{} outcomes from the cache, {} urls requested, {} failed
+"""
+
+integrity_template = """\tVerified: {} files downloaded completely, {} sampled, {} exceeding the download limit
+\tDownloaded: {} bytes at {:.2f} MB/s
+"""
+
+unreachable_template = """
+Unreachable URLs:
+{}"""
+
+deduplication_template = """
+Deduplication:
+\t{} distinct entities ({} seen list)
+\t{} entities shared between bodies fetched only once
 """
 
 gi.require_version('OParl', '0.2')
@@ -52,7 +109,106 @@ gi.require_version('OParl', '0.2')
 from gi.repository.OParl import ErrorSeverity
 
 
-class Result:
+class ResultAccumulator:
+    """
+    Partial Validation Result
+
+    Every validation worker collects its messages in an accumulator of
+    its own without any locking, the accumulators are merged into the
+    Result once the workers are done. Messages are keyed by entity type
+    and description, the ids of their affected entities are kept in
+    compact integer lists (see id_table).
+
+    With `max_samples`, only that many affected entities are kept per
+    message in addition to the total count, messages which dropped an
+    entity are marked as sampled.
+    """
+
+    def __init__(self, max_samples=None):
+        self.failed_entities = 0
+        self.max_samples = max_samples
+
+        # ids of the objects that lead to unrecoverable error in respect to the spec
+        self.fatal_objects = CompactIdList()
+
+        self.messages = {}
+
+    def parse_validation_result(self, object, validation_result):
+        """ Parses a liboparl ValidationResult into a validator message. """
+        self.add_message(
+            get_entity_type_from_object(object),
+            object.get_id(),
+            validation_result.get_severity(),
+            validation_result.get_description()
+        )
+
+    def add_message(self, entity_type, entity_id, severity, description):
+        """ Adds an occurence of a message for an entity. """
+        key = (entity_type, description)
+        message = self.messages.get(key)
+
+        if message is None:
+            message = {
+                'severity': Result.format_severity(severity),
+                'count': 0,
+                'objects': CompactIdList(),
+                'sampled': False
+            }
+            self.messages[key] = message
+
+        message['count'] += 1
+
+        if self.max_samples is None or len(message['objects']) < self.max_samples:
+            message['objects'].append(entity_id)
+        elif not message['objects'].is_last(entity_id):
+            message['sampled'] = True
+
+    def merge(self, accumulator):
+        """ Adds the messages and counts of another accumulator """
+        self.failed_entities += accumulator.failed_entities
+        self.fatal_objects.extend(accumulator.fatal_objects)
+
+        for key, other_message in accumulator.messages.items():
+            message = self.messages.get(key)
+
+            if message is None:
+                message = {
+                    'severity': other_message['severity'],
+                    'count': 0,
+                    'objects': CompactIdList(),
+                    'sampled': False
+                }
+                self.messages[key] = message
+
+            if other_message['sampled'] or (
+                self.max_samples is not None
+                and len(message['objects']) + len(other_message['objects']) > self.max_samples
+            ):
+                message['sampled'] = True
+
+            message['count'] += other_message['count']
+            message['objects'].extend(other_message['objects'], self.max_samples)
+
+    def get_object_messages(self):
+        """ The messages in the result format: by entity type and message hash """
+        object_messages = {}
+
+        for (entity_type, description), message in self.messages.items():
+            if entity_type not in object_messages:
+                object_messages[entity_type] = {}
+
+            object_messages[entity_type][sha1_hexdigest(entity_type + description)] = {
+                'severity': message['severity'],
+                'message': description,
+                'count': message['count'],
+                'objects': list(message['objects']),
+                'sampled': message['sampled']
+            }
+
+        return object_messages
+
+
+class Result(ResultAccumulator):
     """
     Validation Result
 
@@ -63,30 +219,54 @@ class Result:
     or files were unreachable.
     """
 
-    def __init__(self, compiled_result = None):
-        self.total_entities = 0
-        self.failed_entities = 0
+    def __init__(self, compiled_result = None, max_samples = None):
+        super(Result, self).__init__(max_samples)
 
-        self.object_messages = {}
+        self.total_entities = 0
 
-        # this is a list of objects that lead to unrecoverable error in respect to the spec
-        self.fatal_objects = []
+        # start of the validation, later runs can use it as the baseline for incremental validations
+        self.started = None
+        self.incremental = None
 
         self.network = {
-            'average_ttl': 0,
             'ssl': False,
-            'encodings': []
+            'encodings': [],
+            'connections': {},
+            'prefetch': {},
+            'revalidated': 0
         }
 
+        self.cache = {}
+        self.memo = None
+        self.metrics = None
+        self.deduplication = {}
+        self.queue = {}
+
+        # urls which could not be resolved, with their status and number of references
+        self.unreachable = []
+
+        # statistics of the FileChecker
+        self.files = None
+
         self.oparl_version = '1.0'
         self.lock = Lock()
 
         self.system = None
 
+        # the ResultStream messages are written to while validating
+        self.stream = None
+
+        # the streamed result file this result was read from
+        self.stream_file = None
+
+        # the Checkpoint finished entities are recorded in while validating
+        self.checkpoint = None
+
         self.compiled_result = compiled_result
 
-    def format_severity(self, severity):
-        if type(severity) is 'string':
+    @staticmethod
+    def format_severity(severity):
+        if isinstance(severity, str):
             return severity
 
         mapping = {
@@ -97,38 +277,6 @@ class Result:
 
         return mapping[severity]
 
-    def parse_validation_result(self, object, validation_result):
-        """ Parses a liboparl ValidationResult into a validator message. """
-        severity = validation_result.get_severity()
-        description = validation_result.get_description()
-
-        entity_type = get_entity_type_from_object(object)
-
-        if entity_type not in self.object_messages:
-            self.object_messages[entity_type] = {}
-
-        new_message = {
-            'severity': self.format_severity(severity),
-            'message': description,
-            'count': 0,
-            'objects': []
-        }
-
-        message_hash = sha1_hexdigest(entity_type + description)
-
-        # insert message dict
-        if message_hash not in self.object_messages[entity_type]:
-            self.object_messages[entity_type][message_hash] = new_message
-
-        # increment message occurence counter and add object id to reference list
-        message = self.object_messages[entity_type][message_hash]
-
-        message['count'] += 1
-        if object.get_id() not in message['objects']:
-            message['objects'].append(object.get_id())
-
-        self.object_messages[entity_type][message_hash] = message
-
     def compile(self):
         timestamp = datetime.now().isoformat()
 
@@ -139,9 +287,19 @@ class Result:
                 'failed': self.failed_entities,
                 'fatal': len(self.fatal_objects)
             },
-            'object_messages': self.object_messages,
+            'object_messages': self.get_object_messages(),
+            'fatal_objects': list(self.fatal_objects),
             'network': self.network,
+            'unreachable': self.unreachable,
+            'files': self.files,
+            'cache': self.cache,
+            'memo': self.memo,
+            'deduplication': self.deduplication,
+            'queue': self.queue,
+            'incremental': self.incremental,
+            'metrics': self.metrics,
             'oparl_version': self.oparl_version,
+            'started': self.started.isoformat() if self.started is not None else None,
             'timestamp': timestamp
             # TODO: make self.system json serializable
             # 'system': self.system
@@ -151,6 +309,18 @@ class Result:
         return self.text()
 
     def text(self):
+        output = io.StringIO()
+        self.write_text(output)
+
+        return output.getvalue()
+
+    def write_text(self, output):
+        """
+        Writes the text representation of the result to a file object
+
+        For results read from a stream, the affected entities are read
+        from the stream file while writing.
+        """
         totals = summary_template.format(
             self.compiled_result['counts']['total'],
             self.compiled_result['counts']['valid'],
@@ -158,31 +328,196 @@ class Result:
             self.compiled_result['counts']['fatal']
         )
 
+        incremental = self.compiled_result.get('incremental')
+        if incremental is not None:
+            totals += incremental_template.format(
+                incremental['changed'],
+                incremental['modified_since'],
+                incremental['created'],
+                incremental.get('deleted', 0),
+                incremental['carried_failed'],
+                incremental['carried_fatal']
+            )
+
         ssl_info = 'No valid SSL certificate detected'
         if self.compiled_result['network']['ssl']:
             ssl_info = 'Valid SSL certificate detected'
 
+        connections = self.compiled_result['network'].get('connections', {})
+        prefetch = self.compiled_result['network'].get('prefetch', {})
+        served = self.compiled_result['network'].get('served', {})
+        transferred = self.compiled_result['network'].get('bytes', {})
+
+        status_codes = ', '.join(
+            '{}: {}'.format(status, count)
+            for status, count in sorted(self.compiled_result['network'].get('status', {}).items())
+        )
+
         network = network_template.format(
             ssl_info,
-            self.compiled_result['network']['average_ttl']
+            served.get('cache', 0),
+            served.get('network', 0),
+            served.get('failed', 0),
+            self.compiled_result['network'].get('retries', 0),
+            transferred.get('wire', 0),
+            transferred.get('decoded', 0),
+            status_codes or 'none',
+            connections.get('opened', 0),
+            connections.get('reused', 0),
+            prefetch.get('fetched', 0),
+            prefetch.get('served', 0),
+            self.compiled_result['network'].get('revalidated', 0)
+        )
+
+        if 'recorded' in connections:
+            network += '\tRecorded {} responses\n'.format(connections['recorded'])
+
+        if 'replayed' in connections:
+            network += '\tReplayed {} responses, {} requests not in the archive\n'.format(
+                connections['replayed']['served'],
+                connections['replayed']['missing']
+            )
+
+        latency = self.compiled_result['network'].get('latency', {})
+        for category, key in [('host', 'hosts'), ('entity type', 'types')]:
+            if len(latency.get(key, {})) == 0:
+                continue
+
+            rows = ''
+            for name, histogram in sorted(latency[key].items()):
+                rows += '\t\t{}: {:.1f}ms / {:.1f}ms / {:.1f}ms / {:.1f}ms ({} responses)\n'.format(
+                    name,
+                    histogram['p50'] * 1000,
+                    histogram['p90'] * 1000,
+                    histogram['p99'] * 1000,
+                    histogram['max'] * 1000,
+                    histogram['count']
+                )
+
+            network += latency_template.format(category, rows)
+
+        limits = self.compiled_result['network'].get('limits', {})
+        if len(limits) > 0:
+            rows = ''
+            for host, statistics in sorted(limits.items()):
+                rows += '\t\t{}: {} / {} ({} throttled, {} failed, {:.2f}s waited)\n'.format(
+                    host,
+                    statistics['limit'],
+                    statistics['peak_limit'],
+                    statistics['throttled'],
+                    statistics['errors'],
+                    statistics['waited_seconds']
+                )
+
+            network += limits_template.format(rows)
+
+        cache = self.compiled_result.get('cache', {})
+
+        cache_tiers = ''
+        for tier, statistics in cache.get('tiers', {}).items():
+            cache_tiers += '\t{}: {} hits, {} misses\n'.format(tier, statistics['hits'], statistics['misses'])
+
+        compression = cache.get('compression', {})
+
+        cache = cache_template.format(
+            cache.get('lookups', 0),
+            cache.get('hits', 0),
+            cache.get('misses', 0),
+            cache_tiers,
+            compression.get('stored_bytes', 0),
+            compression.get('original_bytes', 0),
+            compression.get('ratio', 0),
+            compression.get('decompression_seconds', 0)
+        )
+
+        memo = self.compiled_result.get('memo')
+        if memo is not None:
+            cache += memo_template.format(
+                memo['lookups'],
+                memo['hits'],
+                memo['hit_rate'],
+                memo['unavailable']
+            )
+
+        queue = self.compiled_result.get('queue', {})
+
+        queue_info = queue_template.format(
+            queue.get('max_depth', 0),
+            queue.get('spilled', 0),
+            queue.get('spilled_bytes', 0),
+            queue.get('spill_read_average_seconds', 0) * 1000
+        )
+
+        deduplication = self.compiled_result.get('deduplication', {})
+
+        deduplication_info = deduplication_template.format(
+            deduplication.get('ids', 0),
+            deduplication.get('mode', 'unknown'),
+            deduplication.get('cross_body_duplicates', 0)
         )
 
+        if 'estimated_error_rate' in deduplication:
+            deduplication_info += '\tEstimated false positive rate: {:.4%} (configured {:.4%})\n'.format(
+                deduplication['estimated_error_rate'],
+                deduplication['configured_error_rate']
+            )
+
+        files_info = ''
+
+        files = self.compiled_result.get('files')
+        if files is not None:
+            files_info = files_template.format(
+                files['entities'],
+                files['urls'],
+                files['deduplicated'],
+                files['cached'],
+                files['requested'],
+                files['failed']
+            )
+
+            integrity = files.get('checks', {}).get('CheckFileIntegrity')
+            if integrity is not None:
+                files_info += integrity_template.format(
+                    integrity['downloaded'],
+                    integrity['sampled'],
+                    integrity['truncated'],
+                    integrity['bytes'],
+                    integrity['megabytes_per_second']
+                )
+
+        unreachable = self.compiled_result.get('unreachable') or []
+        if len(unreachable) > 0:
+            rows = ''
+            for failure in unreachable:
+                rows += '\t{}: {} ({} references)\n'.format(failure['url'], failure['status'], failure['references'])
+
+            deduplication_info += unreachable_template.format(rows)
+
         try:
             max_columns = int(subprocess.check_output(['stty', 'size']).split()[1])
         except Exception:
             max_columns = 80
 
-        entities = ''
+        output.write('Validation Result:\n\n{}\n{}\n{}\n{}{}\n{}\n'.format(
+            totals,
+            network,
+            cache,
+            queue_info,
+            files_info,
+            deduplication_info
+        ))
+
+        entity_separator = ''
 
         for entity, messages in self.compiled_result['object_messages'].items():
             table = BeautifulTable(max_columns)
             table.column_headers = ['', 'severity', 'message', 'occurences']
 
-            entity_list = ''
+            message_keys = {}
 
             message_key = 1
-            for message in messages:
-                message = self.compiled_result['object_messages'][entity][message]
+            for message_hash in messages:
+                message = messages[message_hash]
 
                 row = []
 
@@ -191,25 +526,63 @@ class Result:
                 row.append(message['message'])
                 row.append(message['count'])
 
-                for object in message['objects']:
-                    entity_list += '[{}] {},\n'.format(message_key, object)
-
                 table.append_row(row)
+                message_keys[message_hash] = message_key
                 message_key += 1
 
-            entities += '# {}\n{}\n\nAffected Entities:\n\n{}\n\n'.format(entity, table, entity_list[:-2])
+            output.write('{}# {}\n{}\n\nAffected Entities:\n\n'.format(entity_separator, entity, table))
+            entity_separator = '\n\n'
 
-        return 'Validation Result:\n\n{}\n{}\n{}'.format(totals, network, entities[:-2])
+            entity_list_separator = ''
+            for message_key, object in self.get_affected_entities(entity, message_keys):
+                output.write('{}[{}] {}'.format(entity_list_separator, message_key, object))
+                entity_list_separator = ',\n'
 
-    def json(self):
-        class DateTimeEncoder(json.JSONEncoder):
-            """ Fixup for timedelta not being json serializable. https://stackoverflow.com/a/27058505/3549270 """
+    def get_affected_entities(self, entity, message_keys):
+        """ Yields the message key and id of all entities affected by the messages of an entity type """
+        messages = self.compiled_result['object_messages'][entity]
+
+        if self.stream_file is not None:
+            for record in read_records(self.stream_file):
+                if record['record'] == 'message' and record['type'] == entity:
+                    yield message_keys[sha1_hexdigest(entity + record['message'])], record['id']
+
+            return
 
-            def default(self, o):
-                if isinstance(o, timedelta):
-                    return o.total_seconds()
+        for message_hash, message in messages.items():
+            for object in message['objects']:
+                yield message_keys[message_hash], object
 
-                return json.JSONEncoder.default(self, o)
+            if message.get('sampled', False):
+                yield message_keys[message_hash], 'and {} further occurences'.format(
+                    message['count'] - len(message['objects'])
+                )
+
+    def get_message_occurences(self):
+        """ Yields the entity type, entity id, severity and description of every listed message occurence """
+        if self.stream_file is not None:
+            for record in read_records(self.stream_file):
+                if record['record'] == 'message':
+                    yield record['type'], record['id'], record['severity'], record['message']
+
+            return
+
+        for entity_type, messages in self.compiled_result['object_messages'].items():
+            for message in messages.values():
+                for object in message['objects']:
+                    yield entity_type, object, message['severity'], message['message']
+
+    def is_sampled(self):
+        """ Checks whether only samples of the affected entities are listed """
+        return any(
+            message.get('sampled', False)
+            for messages in self.compiled_result['object_messages'].values()
+            for message in messages.values()
+        )
+
+    def json(self):
+        if self.stream_file is not None:
+            self.load_stream_objects()
 
         try:
             return json.dumps(self.compiled_result, cls=DateTimeEncoder)
@@ -217,6 +590,24 @@ class Result:
         except KeyError as e:
             Output.exception(e)
 
+    def load_stream_objects(self):
+        """ Reads the affected entities of a streamed result into the compiled result """
+        for record in read_records(self.stream_file):
+            if record['record'] == 'message':
+                message_hash = sha1_hexdigest(record['type'] + record['message'])
+                self.compiled_result['object_messages'][record['type']][message_hash]['objects'].append(record['id'])
+
+        self.stream_file = None
+
+    def finish_stream(self):
+        """ Writes the summary record and closes the result stream """
+        self.stream.write_summary(self.compiled_result)
+        self.stream.close()
+
+    def merge(self, accumulator):
+        with self.lock:
+            super(Result, self).merge(accumulator)
+
     def acquire(self):
         self.lock.acquire()
 
@@ -225,7 +616,76 @@ class Result:
 
     @staticmethod
     def from_file(file_name):
+        if is_stream_file(file_name):
+            return Result.from_stream_file(file_name)
+
         with open(file_name, 'r') as f:
             compiled_result = json.load(f)
             result = Result(compiled_result=compiled_result)
             return result
+
+    @staticmethod
+    def from_stream_file(file_name):
+        """
+        Reads a streamed result
+
+        Only the message counts are aggregated in memory, the affected
+        entities stay in the file. If the stream lacks its summary, e.g.
+        because the run was aborted, the counts are derived from the
+        records.
+        """
+        object_messages = {}
+        summary = None
+        fatal_objects = []
+        failed = 0
+        last_id = None
+
+        for record in read_records(file_name):
+            if record['record'] == 'summary':
+                summary = record
+            elif record['record'] == 'fatal':
+                fatal_objects.append(record['id'])
+            elif record['record'] == 'message':
+                entity_type = record['type']
+
+                if entity_type not in object_messages:
+                    object_messages[entity_type] = {}
+
+                message_hash = sha1_hexdigest(entity_type + record['message'])
+
+                if message_hash not in object_messages[entity_type]:
+                    object_messages[entity_type][message_hash] = {
+                        'severity': record['severity'],
+                        'message': record['message'],
+                        'count': 0,
+                        'objects': []
+                    }
+
+                object_messages[entity_type][message_hash]['count'] += 1
+
+                # the messages of an entity are written together
+                if record['id'] != last_id:
+                    failed += 1
+                    last_id = record['id']
+
+        if summary is None:
+            summary = {
+                'counts': {
+                    'total': failed + len(fatal_objects),
+                    'valid': 0,
+                    'failed': failed,
+                    'fatal': len(fatal_objects)
+                },
+                'fatal_objects': fatal_objects,
+                'network': {
+                    'ssl': False
+                }
+            }
+
+        summary.pop('record', None)
+        summary['object_messages'] = object_messages
+
+        result = Result(compiled_result=summary)
+        result.stream_file = file_name
+
+        return result
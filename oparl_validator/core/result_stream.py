@@ -0,0 +1,137 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2017 Stefan Graupner
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import json
+import os
+from datetime import timedelta
+from threading import Lock
+import time
+
+
+class DateTimeEncoder(json.JSONEncoder):
+    """ Fixup for timedelta not being json serializable. https://stackoverflow.com/a/27058505/3549270 """
+
+    def default(self, o):
+        if isinstance(o, timedelta):
+            return o.total_seconds()
+
+        return json.JSONEncoder.default(self, o)
+
+
+def message_record(entity_type, entity_id, severity, description):
+    return {
+        'record': 'message',
+        'type': entity_type,
+        'id': entity_id,
+        'severity': severity,
+        'message': description
+    }
+
+
+def fatal_record(entity_id):
+    return {
+        'record': 'fatal',
+        'id': entity_id
+    }
+
+
+def is_stream_file(file_name):
+    """ Checks whether a file is a streamed (NDJSON) result """
+    with open(file_name, 'r') as f:
+        first_line = f.readline()
+
+    try:
+        record = json.loads(first_line)
+    except ValueError:
+        return False
+
+    return isinstance(record, dict) and 'record' in record
+
+
+def read_records(file_name):
+    """ Iterates over the records of a streamed result, ignoring a truncated last line """
+    with open(file_name, 'r') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+class ResultStream:
+    """
+        Streaming NDJSON result writer
+
+        Validation workers append one record per validation message or
+        fatal entity while they run, the summary of the compiled result
+        is appended as the last record. The file is flushed at least
+        every `flush_interval` seconds, so an aborted run leaves all but
+        the last moments of its results on disk.
+
+        With `append`, records are added to an existing file.
+    """
+
+    def __init__(self, file_name, flush_interval=1, append=False):
+        self.file_name = file_name
+        self.file = open(file_name, 'a' if append else 'w')
+        self.flush_interval = flush_interval
+        self.last_flush = time.monotonic()
+        self.lock = Lock()
+
+    def write_records(self, records):
+        """ Appends the records of an entity at once """
+        lines = ''.join(json.dumps(record) + '\n' for record in records)
+
+        with self.lock:
+            self.file.write(lines)
+
+            if time.monotonic() - self.last_flush >= self.flush_interval:
+                self.file.flush()
+                self.last_flush = time.monotonic()
+
+    def flush(self):
+        """
+            Writes the buffered records to disk
+
+            Only handing the buffer to the OS holds the lock, the fsync
+            runs without it so that writers are not held up meanwhile.
+        """
+        with self.lock:
+            self.file.flush()
+            self.last_flush = time.monotonic()
+            fileno = self.file.fileno()
+
+        os.fsync(fileno)
+
+    def write_summary(self, compiled_result):
+        summary = dict(compiled_result)
+        summary.pop('object_messages', None)
+        summary['record'] = 'summary'
+
+        with self.lock:
+            self.file.write(json.dumps(summary, cls=DateTimeEncoder) + '\n')
+
+    def close(self):
+        with self.lock:
+            self.file.close()
@@ -22,22 +22,229 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
+import hashlib
+import math
+from threading import Lock
 import time
+import uuid
+
 import redis
 
+
 class SeenList:
+    """
+        Set of entity ids which were already processed
+
+        `add` is an atomic test-and-insert, it returns whether an id was
+        newly inserted and can be used from many threads at once. This
+        implementation keeps the ids in process memory.
+
+        Ids can be added on behalf of an owner, e.g. the body walker which
+        found them. Ids which are added again by a different owner are
+        counted as cross-owner duplicates.
+    """
+
+    mode = 'memory'
+
+    def __init__(self):
+        self.items = {}
+        self.lock = Lock()
+        self.cross_owner_duplicates = 0
+
+    def __contains__(self, item):
+        return item in self.items
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, item, owner=None):
+        """ Adds an id, returns False if it was already seen """
+        with self.lock:
+            if item in self.items:
+                if self.items[item] != owner:
+                    self.cross_owner_duplicates += 1
+
+                return False
+
+            self.items[item] = owner
+
+            return True
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+    def statistics(self):
+        return {
+            'mode': self.mode,
+            'ids': len(self),
+            'cross_owner_duplicates': self.cross_owner_duplicates
+        }
+
+
+class ShardedSeenList(SeenList):
+    """
+        In-memory seen list split into independently locked shards
+
+        Meant to be shared between many threads, which then only contend
+        for a lock if they add ids falling into the same shard.
+    """
+
+    def __init__(self, num_shards=16):
+        super(ShardedSeenList, self).__init__()
+        self.shards = [SeenList() for _ in range(num_shards)]
+
+    def get_shard(self, item):
+        return self.shards[hash(item) % len(self.shards)]
+
+    def __contains__(self, item):
+        return item in self.get_shard(item)
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+
+    def add(self, item, owner=None):
+        return self.get_shard(item).add(item, owner)
+
+    def clear(self):
+        for shard in self.shards:
+            shard.clear()
+
+    def statistics(self):
+        statistics = super(ShardedSeenList, self).statistics()
+        statistics['cross_owner_duplicates'] = sum(shard.cross_owner_duplicates for shard in self.shards)
+
+        return statistics
+
+
+class RedisSeenList(SeenList):
+    """
+        Seen list stored as a Redis hash of ids to their owners
+
+        Hashes expire a day after their creation so that aborted runs
+        do not leave them behind forever.
+    """
+
+    mode = 'redis'
+
     def __init__(self, redis_server='localhost', redis_port=6379):
+        super(RedisSeenList, self).__init__()
         self.redis = redis.Redis(host=redis_server, port=redis_port, db=0)
-        self.seen = 'OParlValidator_SeenList_' + str(int(time.time()))
+        self.seen = 'OParlValidator_SeenList_{}_{}'.format(int(time.time()), uuid.uuid4().hex[:8])
+        self.expiry_set = False
 
-    def __contains__(self, key):
-        return key in self.seen
+    def __contains__(self, item):
+        return bool(self.redis.hexists(self.seen, item))
 
     def __len__(self):
-        return self.redis.llen(self.seen)
+        return self.redis.hlen(self.seen)
+
+    def add(self, item, owner=None):
+        added = self.redis.hsetnx(self.seen, item, owner or '') == 1
+
+        if added and not self.expiry_set:
+            self.redis.expire(self.seen, 24 * 3600)
+            self.expiry_set = True
+
+        if not added and str(self.redis.hget(self.seen, item) or b'', 'utf-8') != (owner or ''):
+            with self.lock:
+                self.cross_owner_duplicates += 1
+
+        return added
+
+    def clear(self):
+        self.redis.delete(self.seen)
+
+
+class BloomSeenList(SeenList):
+    """
+        Memory-compact seen list backed by a Bloom filter
+
+        The filter is sized for an expected number of ids and a false
+        positive rate. A false positive makes an id look seen although
+        it was not, i.e. the entity is skipped. The estimated rate for
+        the actual number of inserted ids is reported in the statistics.
+
+        As owners can not be stored, every repeated id is counted as a
+        cross-owner duplicate.
+    """
+
+    mode = 'bloom'
+
+    def __init__(self, capacity=10000000, error_rate=0.001):
+        super(BloomSeenList, self).__init__()
+        self.capacity = capacity
+        self.error_rate = error_rate
+
+        self.num_bits = max(int(-capacity * math.log(error_rate) / (math.log(2) ** 2)), 8)
+        self.num_hashes = max(int(round(self.num_bits / capacity * math.log(2))), 1)
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def get_positions(self, item):
+        digest = hashlib.blake2b(str(item).encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+
+        return [(first + i * second) % self.num_bits for i in range(self.num_hashes)]
+
+    def __contains__(self, item):
+        for position in self.get_positions(item):
+            if not self.bits[position >> 3] & (1 << (position & 7)):
+                return False
+
+        return True
+
+    def __len__(self):
+        return self.count
+
+    def add(self, item, owner=None):
+        positions = self.get_positions(item)
+
+        with self.lock:
+            added = False
+
+            for position in positions:
+                mask = 1 << (position & 7)
+
+                if not self.bits[position >> 3] & mask:
+                    self.bits[position >> 3] |= mask
+                    added = True
+
+            if added:
+                self.count += 1
+            else:
+                self.cross_owner_duplicates += 1
+
+            return added
+
+    def clear(self):
+        with self.lock:
+            self.bits = bytearray(len(self.bits))
+            self.count = 0
+
+    def estimated_error_rate(self):
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+    def statistics(self):
+        statistics = super(BloomSeenList, self).statistics()
+        statistics['bytes'] = len(self.bits)
+        statistics['configured_error_rate'] = self.error_rate
+        statistics['estimated_error_rate'] = self.estimated_error_rate()
+
+        return statistics
+
+
+def create_seen_list(mode='memory', redis_server='localhost', redis_port=6379, capacity=10000000, error_rate=0.001,
+                     shared=False):
+    """ Create a seen list, shared seen lists are used by many threads at once """
+    if mode == 'redis':
+        return RedisSeenList(redis_server, redis_port)
+
+    if mode == 'bloom':
+        return BloomSeenList(capacity, error_rate)
 
-    def push(self, item):
-        self.redis.lpush(self.seen, item)
+    if mode == 'memory':
+        return ShardedSeenList() if shared else SeenList()
 
-    def pop(self):
-        return self.redis.lpop(self.seen)
+    raise ValueError('Unknown seen list mode {}'.format(mode))
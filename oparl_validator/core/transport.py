@@ -0,0 +1,266 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2017 Stefan Graupner
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import random
+from threading import Lock
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from oparl_validator.core.archive import ArchiveWriter, ReplayAdapter
+from oparl_validator.core.network_statistics import NetworkStatistics
+from oparl_validator.core.rate_limiter import get_retry_after
+
+DEFAULT_USER_AGENT = 'OParlValidator (https://dev.oparl.org/validator)'
+
+# responses which are worth retrying, as the server might answer the next request
+TRANSIENT_STATUS_CODES = [429, 500, 502, 503, 504]
+
+# responses which are not worth asking again for, see the negative cache of the client
+PERMANENT_STATUS_CODES = [404, 410]
+
+# upper bound for the seconds waited before a single retry
+MAX_RETRY_DELAY = 60
+
+
+class Transport:
+    """
+        Shared HTTP transport for all network access of the Validator
+
+        Wraps a requests.Session with keep-alive connection pools so
+        that the client, the body walkers and the extra checks reuse
+        their connections to an endpoint instead of doing a new
+        TCP/TLS handshake for every single entity.
+
+        All responses can be recorded into an archive, which can be
+        replayed later on without any network access.
+
+        Given a RateLimiter, the number of concurrent requests per host
+        adapts to how well the host copes with them, see
+        oparl_validator.core.rate_limiter.
+
+        Requests failing transiently, i.e. with a timeout, a reset
+        connection or a server error, are retried with exponential
+        backoff.
+    """
+
+    def __init__(self, pool_size=10, timeout=30, user_agent=DEFAULT_USER_AGENT, rate_limiter=None,
+                 retries=3, retry_backoff=0.5):
+        """
+        Initialize a Transport instance
+
+        The pool size is the number of connections kept alive per host,
+        it should be at least the number of threads doing requests
+        concurrently. The timeout is given in seconds and applies to
+        both connecting and reading. Retries wait `retry_backoff`
+        seconds at first and twice as long for every further retry.
+        """
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.pool_size = 0
+        self.lock = Lock()
+
+        # statistics of connection pools which were replaced by resize()
+        self.retired_connections = 0
+        self.retired_requests = 0
+
+        self.archive_writer = None
+        self.replay_adapter = None
+
+        self.network_statistics = NetworkStatistics()
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            'User-Agent': user_agent
+        })
+
+        self.resize(pool_size)
+
+    def resize(self, pool_size):
+        """
+        Resize the per-host connection pools
+
+        As the number of concurrently fetching threads is only known
+        after the endpoint's bodies have been retrieved, the pools
+        can be grown later on. Connections of the old pools are
+        dropped, their statistics are retained.
+        """
+        with self.lock:
+            if pool_size <= self.pool_size:
+                return
+
+            for adapter in set(self.session.adapters.values()):
+                opened, requested = self.get_adapter_statistics(adapter)
+                self.retired_connections += opened
+                self.retired_requests += requested
+                adapter.close()
+
+            self.pool_size = pool_size
+
+            if self.replay_adapter is not None:
+                return
+
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            self.session.mount('http://', adapter)
+            self.session.mount('https://', adapter)
+
+    def record(self, file_name):
+        """ Records all responses into an archive file """
+        self.archive_writer = ArchiveWriter(file_name)
+        self.session.hooks['response'].append(self.archive_writer.record)
+
+    def archive_stream(self, response):
+        """
+        Returns an ArchiveStream for the chunks read from a streamed
+        response, None if responses are not recorded
+        """
+        if self.archive_writer is None:
+            return None
+
+        return self.archive_writer.stream(response)
+
+    def replay(self, file_name, latency=False):
+        """ Serves all responses from an archive file instead of the network """
+        with self.lock:
+            self.replay_adapter = ReplayAdapter(file_name, latency)
+            self.session.mount('http://', self.replay_adapter)
+            self.session.mount('https://', self.replay_adapter)
+
+    def request(self, method, url, **kwargs):
+        """ Sends a request, retrying transient failures, and returns the last response """
+        kwargs.setdefault('timeout', self.timeout)
+
+        for attempt in range(self.retries + 1):
+            retry_after = None
+
+            try:
+                response = self.send(method, url, **kwargs)
+            except requests.exceptions.SSLError:
+                raise
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+                # archives hold responses only, a request missing in them fails every time
+                if attempt == self.retries or self.replay_adapter is not None:
+                    raise
+            else:
+                if response.status_code not in TRANSIENT_STATUS_CODES or attempt == self.retries:
+                    return response
+
+                retry_after = get_retry_after(response.headers)
+                response.close()
+
+            self.network_statistics.record_retry()
+
+            # every recorded response is in the archive, replays retry the same way without waiting
+            if self.replay_adapter is None:
+                time.sleep(self.get_retry_delay(attempt, retry_after))
+
+    def get_retry_delay(self, attempt, retry_after=None):
+        """
+            Seconds to wait before a retry
+
+            The backoff is jittered so that the threads which failed
+            together do not retry together. A Retry-After of the server
+            is waited for at least, the rate limiter holds back the
+            other requests to the host meanwhile.
+        """
+        delay = self.retry_backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+
+        return min(delay, MAX_RETRY_DELAY)
+
+    def send(self, method, url, **kwargs):
+        # replayed responses do not strain any server
+        if self.rate_limiter is None or self.replay_adapter is not None:
+            response = self.session.request(method, url, **kwargs)
+        else:
+            with self.rate_limiter.limit(url) as outcome:
+                response = self.session.request(method, url, **kwargs)
+                outcome['response'] = response
+
+        self.network_statistics.record_response(response, kwargs.get('stream', False))
+
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def head(self, url, **kwargs):
+        kwargs.setdefault('allow_redirects', False)
+
+        return self.request('HEAD', url, **kwargs)
+
+    def get_adapter_statistics(self, adapter):
+        """ Returns the number of opened connections and sent requests of an adapter """
+        opened = 0
+        requested = 0
+
+        if not isinstance(adapter, HTTPAdapter):
+            return opened, requested
+
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+
+            opened += pool.num_connections
+            requested += pool.num_requests
+
+        return opened, requested
+
+    def statistics(self):
+        """ Connection statistics suitable for a result's network section """
+        with self.lock:
+            opened = self.retired_connections
+            requested = self.retired_requests
+
+            for adapter in set(self.session.adapters.values()):
+                adapter_opened, adapter_requested = self.get_adapter_statistics(adapter)
+                opened += adapter_opened
+                requested += adapter_requested
+
+        statistics = {
+            'opened': opened,
+            'reused': max(requested - opened, 0),
+            'requests': requested
+        }
+
+        if self.archive_writer is not None:
+            statistics['recorded'] = self.archive_writer.num_records
+
+        if self.replay_adapter is not None:
+            statistics['replayed'] = dict(self.replay_adapter.statistics)
+
+        return statistics
+
+    def close(self):
+        self.session.close()
+
+        if self.archive_writer is not None:
+            self.archive_writer.close()
@@ -24,6 +24,8 @@ SOFTWARE.
 
 from functools import reduce
 import hashlib
+import re
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
 
 def camelize_snake(string):
     parts = string.split('_')
@@ -47,7 +49,33 @@ def get_entity_type_from_object(oparl_object):
     return oparl_object.get_oparl_type().split('/')[-1]
 
 
+# the last path segment of the first type, e.g. Paper for https://schema.oparl.org/1.0/Paper
+DOCUMENT_TYPE_PATTERN = re.compile(r'"type"\s*:\s*"[^"]*?(\w+)"')
+LIST_PATTERN = re.compile(r'"data"\s*:\s*\[')
+
+
+def get_entity_type_from_document(document):
+    """ Guesses the entity type of a raw document without parsing it, `List` for list pages """
+    if LIST_PATTERN.search(document) is not None:
+        return 'List'
+
+    match = DOCUMENT_TYPE_PATTERN.search(document)
+    if match is None:
+        return 'unknown'
+
+    return match.group(1)
+
+
 def sha1_hexdigest(string):
     string = str(string).encode('utf_8')
 
     return hashlib.sha1(string).hexdigest()
+
+
+def add_query_parameter(url, name, value):
+    components = urlparse(url)
+
+    query = parse_qsl(components.query, keep_blank_values=True)
+    query.append((name, value))
+
+    return urlunparse(components._replace(query=urlencode(query)))
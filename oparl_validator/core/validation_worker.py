@@ -22,33 +22,91 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-from time import sleep
 from threading import Thread
+import time
 
+from gi.repository import GLib
+
+from oparl_validator.core.check import CheckResult
 from oparl_validator.core.exceptions import ObjectValidationFailedException
+from oparl_validator.core.metrics import metrics
 from oparl_validator.core.output import Output
+from oparl_validator.core.process_validation import validate_entity
+from oparl_validator.core.result import Result, ResultAccumulator
+from oparl_validator.core.result_stream import fatal_record, message_record
 from oparl_validator.core.utils import get_entity_type_from_object
 
 
+def save_entity_results(result, accumulator, entity_type, entity_id, validation_results):
+    """
+        Saves the validation results of an entity in an accumulator and,
+        if enabled, in the result stream and the checkpoint of a result
+    """
+    if len(validation_results) > 0:
+        accumulator.failed_entities += 1
+
+    messages = [
+        (Result.format_severity(validation_result.get_severity()), validation_result.get_description())
+        for validation_result in validation_results
+    ]
+
+    for severity, description in messages:
+        accumulator.add_message(entity_type, entity_id, severity, description)
+
+    if result.stream is not None and len(messages) > 0:
+        result.stream.write_records([
+            message_record(entity_type, entity_id, severity, description)
+            for severity, description in messages
+        ])
+
+    if result.checkpoint is not None:
+        result.checkpoint.record_entity(entity_id, entity_type, messages)
+
+
 class ValidationWorker(Thread):
-    def __init__(self, id, queue, seen_list, check_pool, result):
-        super(ValidationWorker, self).__init__()
+    """
+        Worker Thread validating the entities of the queue
+
+        Results are collected in a worker-local accumulator, which is
+        merged into the validation result after the worker finished.
+
+        With a ValidationMemo, entities whose document was validated
+        before are not validated again, only the checks which cannot be
+        memoized are evaluated for them.
+
+        With a FileChecker, the deferred checks of an entity are handed
+        to it together with the entity's other results, the worker does
+        not wait for their requests.
+    """
+    def __init__(self, id, queue, seen_list, check_pool, result, memo=None, file_checker=None):
+        super(ValidationWorker, self).__init__(name=id)
         self.check_pool = check_pool
         self.current_object = None
         self.id = id
         self.queue = queue
         self.result = result
+        self.accumulator = ResultAccumulator(result.max_samples)
         self.seen_list = seen_list
+        self.memo = memo
+        self.file_checker = file_checker
 
     def run(self):
-        sleep(1)
-        while not self.queue.empty():
+        while True:
             self.current_object = self.queue.get()
 
+            if self.current_object is None:
+                break
+
             if not self.is_seen_object():
                 try:
-                    results = self.validate_object()
-                    self.save_validation_results(results)
+                    results = self.validate_memoized()
+
+                    if self.file_checker is None:
+                        results.extend(self.evaluate_checks(memoizable=False))
+                        self.save_validation_results(results)
+                    else:
+                        results.extend(self.evaluate_checks(memoizable=False, deferred=False))
+                        self.defer_validation_results(results)
                 except ObjectValidationFailedException:
                     self.save_failed_object()
 
@@ -56,43 +114,123 @@ class ValidationWorker(Thread):
         Output.message('Quitting validation thread {}', self.id)
 
     def is_seen_object(self):
-        if self.current_object.get_id() in self.seen_list:
-            return True
-
-        self.seen_list.push(self.current_object.get_id())
-
-        return False
+        return not self.seen_list.add(self.current_object.get_id())
 
     def validate_object(self):
         validation_results = []
 
+        object_type = get_entity_type_from_object(self.current_object)
+
+        start = time.perf_counter()
         try:
             validation_results = self.current_object.validate()
         except GLib.Error as glib_error:
             raise ObjectValidationFailedException from glib_error
+        finally:
+            metrics.observe('validate_seconds', time.perf_counter() - start, type=object_type)
+
+        validation_results.extend(self.evaluate_checks(memoizable=True))
 
+        return validation_results
+
+    def evaluate_checks(self, memoizable=None, deferred=None):
         object_type = get_entity_type_from_object(self.current_object)
-        extra_checks = self.check_pool.get_checks_for_type(object_type)
 
-        for extra_check in extra_checks:
-            extra_results = extra_check.evaluate(self.current_object)
-            if extra_results is not None and type(extra_results) is 'list':
-                 validation_results.extend(extra_results)
+        return self.check_pool.evaluate(self.current_object, object_type, memoizable, deferred)
+
+    def validate_memoized(self):
+        """
+            Validate the current object including the memoizable checks,
+            unless the messages of its document are memoized already
+        """
+        if self.memo is None:
+            return self.validate_object()
+
+        key = self.memo.get_key(self.current_object.get_id())
+
+        if key is None:
+            return self.validate_object()
+
+        messages = self.memo.get(key)
+
+        if messages is not None:
+            return [CheckResult(severity, description) for severity, description in messages]
+
+        validation_results = self.validate_object()
+
+        self.memo.set(key, [
+            (Result.format_severity(result.get_severity()), result.get_description())
+            for result in validation_results
+        ])
 
         return validation_results
 
     def save_validation_results(self, validation_results):
-        self.result.acquire()
+        save_entity_results(
+            self.result,
+            self.accumulator,
+            get_entity_type_from_object(self.current_object),
+            self.current_object.get_id(),
+            validation_results
+        )
+
+    def defer_validation_results(self, validation_results):
+        """ Saves the results right away unless the entity has deferred checks """
+        object_type = get_entity_type_from_object(self.current_object)
+        checks = self.check_pool.get_checks_for_type(object_type, memoizable=False, deferred=True)
+
+        if len(checks) == 0:
+            self.save_validation_results(validation_results)
+            return
+
+        self.file_checker.submit(
+            object_type,
+            self.current_object.get_id(),
+            [
+                (check, check.get_urls(self.current_object), check.get_context(self.current_object))
+                for check in checks
+            ],
+            validation_results
+        )
+
+    def save_failed_object(self):
+        self.accumulator.fatal_objects.append(self.current_object.get_id())
 
-        if len(validation_results) > 0:
-            self.result.failed_entities += 1
+        if self.result.stream is not None:
+            self.result.stream.write_records([fatal_record(self.current_object.get_id())])
 
-        for result in validation_results:
-            self.result.parse_validation_result(self.current_object, result)
+        if self.result.checkpoint is not None:
+            self.result.checkpoint.record_fatal(self.current_object.get_id())
 
-        self.result.release()
 
-    def save_failed_object(self):
-        self.result.acquire()
-        self.result.fatal_objects.append(self.current_object)
-        self.result.release()
\ No newline at end of file
+class ProcessValidationWorker(ValidationWorker):
+    """
+        Validation worker which delegates validation to a process pool
+
+        Only the id of an entity and, for entities embedded in list pages,
+        its raw document are sent to the validation processes. These
+        rebuild and validate the entity and return a compact record.
+    """
+    def __init__(self, id, queue, seen_list, check_pool, result, executor, embedded_cache=None, memo=None,
+                 file_checker=None):
+        super(ProcessValidationWorker, self).__init__(id, queue, seen_list, check_pool, result, memo, file_checker)
+        self.executor = executor
+        self.embedded_cache = embedded_cache
+
+    def validate_object(self):
+        entity_id = self.current_object.get_id()
+
+        document = None
+        if self.embedded_cache is not None:
+            document = self.embedded_cache.get_or_none(entity_id)
+
+        start = time.perf_counter()
+        record = self.executor.submit(validate_entity, entity_id, document).result()
+
+        # includes the round trip to the validation process
+        metrics.observe('validate_seconds', time.perf_counter() - start, type=record['type'] or 'unknown')
+
+        if record['fatal']:
+            raise ObjectValidationFailedException()
+
+        return [CheckResult(severity, description) for severity, description in record['messages']]
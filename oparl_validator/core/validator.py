@@ -22,18 +22,32 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
+from datetime import datetime
+import hashlib
 import sys
 
+import gi
+
+from oparl_validator.core.cache import Cache, get_available_compressions
+from oparl_validator.core.cache_backends import create_cache_backends
+from oparl_validator.core.checkpoint import Checkpoint, Checkpointer
 from oparl_validator.core.client import Client
 from oparl_validator.core.entity_queue import EntityQueue
+from oparl_validator.core.file_checker import FileChecker
+from oparl_validator.core.memo import ValidationMemo
+from oparl_validator.core.metrics import MetricsSampler, metrics
 from oparl_validator.core.exceptions import \
     EndpointNotReachableException, \
     EndpointIsNotAnOParlEndpointException
 from oparl_validator.core.output import Output
 from oparl_validator.core.pool import Pool
-from oparl_validator.core.result import Result
-from oparl_validator.core.seen_list import SeenList
-from oparl_validator.core.validation_worker import ValidationWorker
+from oparl_validator.core.process_validation import create_process_pool
+from oparl_validator.core.rate_limiter import RateLimiter
+from oparl_validator.core.result import Result, ResultAccumulator
+from oparl_validator.core.result_stream import ResultStream, fatal_record, message_record
+from oparl_validator.core.seen_list import create_seen_list
+from oparl_validator.core.transport import Transport
+from oparl_validator.core.validation_worker import ValidationWorker, ProcessValidationWorker
 
 VALIDATOR_VERSION = '$Id$'
 
@@ -41,6 +55,9 @@ VALID_OPARL_VERSIONS = [
     "https://schema.oparl.org/1.0/"
 ]
 
+# share of --max_rps left to the validation processes together, the parent fetches nearly all documents
+PROCESS_RPS_SHARE = 0.1
+
 class Validator:
     """
         This class provides a Validator instance.
@@ -52,8 +69,9 @@ class Validator:
         Please refer to `self.parse_options` for a listing of
         currently available options.
 
-        In order to run, the Validator requires a redis connection
-        which currently must be on the same machine.
+        By default, the Validator requires a redis connection for
+        caching, an embedded on-disk or a purely in-memory cache can
+        be selected with the `cache` option instead.
     """
 
     def __init__(self, endpoint, options = None):
@@ -70,6 +88,24 @@ class Validator:
             Output.message('You selected an invalid option, please provide a result destination filename')
             exit(1)
 
+        if self.options.format == 'ndjson' and not self.options.read and self.options.result is None:
+            Output.message('Streaming the result requires a result destination filename')
+            exit(1)
+
+        self.baseline = None
+        self.modified_since = None
+
+        self.resume_state = None
+        if self.options.resume is not None:
+            self.resume_state = Checkpoint.read_state(self.options.resume) or {'pending': [], 'walkers': {}}
+
+            if self.endpoint is None:
+                self.endpoint = self.resume_state.get('endpoint')
+
+            if self.endpoint is None:
+                Output.message('Checkpoint {} does not contain an endpoint, please provide it', self.options.resume)
+                exit(1)
+
     def parse_options(self, options):
         if 'format' not in options:
             options.format = 'json'
@@ -84,7 +120,7 @@ class Validator:
             options.porcelain = False
 
         if 'result' not in options:
-            options.output = None
+            options.result = None
 
         if 'read' not in options:
             options.read = False
@@ -92,16 +128,348 @@ class Validator:
         if 'silent' not in options:
             options.silent = True
 
+        if 'timeout' not in options:
+            options.timeout = 30
+
+        if 'prefetch' not in options:
+            options.prefetch = 8
+
+        if 'cache' not in options:
+            options.cache = 'redis'
+
+        if 'cache_memory' not in options:
+            options.cache_memory = 64 * 1024 * 1024
+
+        if 'cache_file' not in options:
+            options.cache_file = 'oparl_validator_cache.sqlite'
+
+        if 'cache_compression' not in options:
+            options.cache_compression = 'zlib'
+
+        if 'seen_list' not in options or options.seen_list is None:
+            options.seen_list = 'redis' if options.cache == 'redis' else 'memory'
+
+        if 'bloom_capacity' not in options:
+            options.bloom_capacity = 10000000
+
+        if 'bloom_error_rate' not in options:
+            options.bloom_error_rate = 0.001
+
+        if 'spill' not in options:
+            options.spill = True
+
+        if 'spill_directory' not in options:
+            options.spill_directory = None
+
+        if 'processes' not in options:
+            options.processes = 0
+
+        if 'max_affected_entities' not in options:
+            options.max_affected_entities = 0
+
+        if 'redis_host' not in options:
+            options.redis_host = 'localhost'
+
+        if 'redis_port' not in options:
+            options.redis_port = 6379
+
+        if 'checkpoint' not in options:
+            options.checkpoint = None
+
+        if 'checkpoint_interval' not in options:
+            options.checkpoint_interval = 60
+
+        if 'resume' not in options:
+            options.resume = None
+
+        if 'baseline' not in options:
+            options.baseline = None
+
+        if 'modified_since' not in options:
+            options.modified_since = None
+
+        if 'memo' not in options:
+            options.memo = False
+
+        if 'record' not in options:
+            options.record = None
+
+        if 'replay' not in options:
+            options.replay = None
+
+        if 'replay_latency' not in options:
+            options.replay_latency = False
+
+        if 'metrics_file' not in options:
+            options.metrics_file = None
+
+        if 'initial_concurrency' not in options:
+            options.initial_concurrency = 4
+
+        if 'max_concurrency' not in options:
+            options.max_concurrency = 32
+
+        if 'max_rps' not in options:
+            options.max_rps = 0
+
+        if 'retries' not in options:
+            options.retries = 3
+
+        if 'retry_backoff' not in options:
+            options.retry_backoff = 0.5
+
+        if 'negative_ttl' not in options:
+            options.negative_ttl = 300
+
+        if 'file_check_workers' not in options:
+            options.file_check_workers = 8
+
+        if 'file_check_ttl' not in options:
+            options.file_check_ttl = 86400
+
+        if 'verify_files' not in options:
+            options.verify_files = False
+
+        if 'file_bandwidth' not in options:
+            options.file_bandwidth = 0
+
+        if 'max_file_bytes' not in options:
+            options.max_file_bytes = 64 * 1024 * 1024
+
+        if 'range_samples' not in options:
+            options.range_samples = 0
+
+        # a resumed run continues to write the checkpoint it was resumed from
+        if options.resume is not None and options.checkpoint is None:
+            options.checkpoint = options.resume
+
         return options
 
+    def create_cache(self):
+        tiers = create_cache_backends(
+            self.options.cache,
+            memory_size=self.options.cache_memory,
+            path=self.options.cache_file,
+            redis_server=self.options.redis_host,
+            redis_port=self.options.redis_port
+        )
+
+        compression = self.options.cache_compression
+        if compression not in get_available_compressions():
+            Output.message('Cache compression {} is not available, falling back to zlib', compression)
+            compression = 'zlib'
+
+        return Cache(tiers=tiers, compression=compression)
+
+    def create_seen_list(self, shared=False):
+        mode = self.options.seen_list
+
+        # incremental validations tell changed from unchanged entities by the seen list, false positives would
+        # drop the messages of unchanged entities, and the few changed ones fit into memory anyway
+        if self.modified_since is not None and mode == 'bloom':
+            mode = 'memory'
+
+        return create_seen_list(
+            mode,
+            redis_server=self.options.redis_host,
+            redis_port=self.options.redis_port,
+            capacity=self.options.bloom_capacity,
+            error_rate=self.options.bloom_error_rate,
+            shared=shared
+        )
+
+    def create_entity_queue(self):
+        # entities restored from a checkpoint are loaded by the consumers even without spilling
+        if not self.options.spill:
+            return EntityQueue(maxsize=self.options.queue_size, deserialize=self.client.load_entity)
+
+        return EntityQueue(
+            maxsize=self.options.queue_size,
+            serialize=lambda entity: entity.get_id(),
+            deserialize=self.client.load_entity,
+            spill_directory=self.options.spill_directory
+        )
+
+    def get_user_agent(self):
+        return 'OParlValidator/{} (https://dev.oparl.org/validator)'.format(Validator.get_version_ident())
+
+    def get_rps_share(self, process=False):
+        """ The share of the requests per second of the parent's transport or of one validation process """
+        if self.options.processes == 0:
+            return 1
+
+        if process:
+            return PROCESS_RPS_SHARE / self.options.processes
+
+        return 1 - PROCESS_RPS_SHARE
+
+    def create_rate_limiter(self, share=1):
+        """ Creates the per-host limits of a transport, which gets the given share of the requests per second """
+        if self.options.max_concurrency <= 0:
+            return None
+
+        return RateLimiter(
+            initial_limit=self.options.initial_concurrency,
+            max_limit=self.options.max_concurrency,
+            max_rps=self.options.max_rps * share
+        )
+
+    def create_transport(self):
+        # the validation processes fetch the documents missing in the cache with transports of their own
+        transport = Transport(
+            pool_size=self.options.num_workers + self.options.prefetch + 1,
+            timeout=self.options.timeout,
+            user_agent=self.get_user_agent(),
+            rate_limiter=self.create_rate_limiter(self.get_rps_share()),
+            retries=self.options.retries,
+            retry_backoff=self.options.retry_backoff
+        )
+
+        if self.options.replay is not None:
+            transport.replay(self.options.replay, self.options.replay_latency)
+        elif self.options.record is not None:
+            transport.record(self.options.record)
+
+        return transport
+
+    def create_client(self):
+        # every response has to reach the archive instead of being served from documents cached by earlier runs
+        if self.options.record is not None and self.options.cache != 'memory':
+            Output.message('Recording uses a cold in-memory cache instead of the {} cache', self.options.cache)
+            self.options.cache = 'memory'
+
+        if self.options.processes > 0 and self.options.cache == 'memory':
+            Output.message('Validation processes require a shared cache, validating in threads instead')
+            self.options.processes = 0
+
+        cache = self.create_cache()
+
+        # validation processes and memos need the documents of entities embedded in list pages
+        embedded_cache = None
+        if self.options.processes > 0 or self.options.memo:
+            embedded_cache = Cache(
+                basekey='OParlValidator_Embedded_',
+                tiers=cache.tiers,
+                compression=cache.compression
+            )
+
+        negative_cache = None
+        if self.options.negative_ttl > 0:
+            negative_cache = Cache(
+                basekey='OParlValidator_Failed_',
+                tiers=cache.tiers,
+                compression=cache.compression
+            )
+
+        return Client(
+            self.endpoint,
+            self.create_transport(),
+            cache=cache,
+            prefetch=self.options.prefetch,
+            embedded_cache=embedded_cache,
+            modified_since=self.modified_since,
+            negative_cache=negative_cache,
+            negative_ttl=self.options.negative_ttl,
+            revalidate=self.options.record is None
+        )
+
+    def create_memo(self, check_pool):
+        if not self.options.memo:
+            return None
+
+        cache = Cache(
+            basekey='OParlValidator_Memo_',
+            tiers=self.client.cache.tiers,
+            compression=self.client.cache.compression
+        )
+
+        ident = '{}:{}:{}'.format(ValidationMemo.version, self.get_liboparl_version(), check_pool.get_ident())
+
+        return ValidationMemo(cache, self.client.get_document, ident)
+
+    def create_file_checker(self, result):
+        if self.options.file_check_workers <= 0:
+            return None
+
+        cache = None
+        if self.options.file_check_ttl > 0:
+            cache = Cache(
+                basekey='OParlValidator_Files_',
+                tiers=self.client.cache.tiers,
+                compression=self.client.cache.compression
+            )
+
+        return FileChecker(
+            self.client.transport,
+            result,
+            cache=cache,
+            ttl=self.options.file_check_ttl,
+            max_workers=self.options.file_check_workers,
+            max_pending=self.options.queue_size
+        )
+
+    def create_validation_workers(self, queue, seen_list, check_pool, result, memo=None, file_checker=None):
+        if self.options.processes == 0:
+            return [
+                ValidationWorker(
+                    'validation_worker_{}'.format(i),
+                    queue,
+                    seen_list,
+                    check_pool,
+                    result,
+                    memo,
+                    file_checker
+                )
+                for i in range(0, self.options.num_workers)
+            ]
+
+        self.process_pool = create_process_pool(self.options.processes, {
+            'cache': self.options.cache,
+            'cache_file': self.options.cache_file,
+            'cache_compression': self.client.cache.compression,
+            'redis_host': self.options.redis_host,
+            'redis_port': self.options.redis_port,
+            'timeout': self.options.timeout,
+            'user_agent': self.get_user_agent(),
+            'ssl': self.client.network['ssl'],
+            'replay': self.options.replay,
+            'replay_latency': self.options.replay_latency,
+            'initial_concurrency': self.options.initial_concurrency,
+            'max_concurrency': self.options.max_concurrency,
+            'max_rps': self.options.max_rps * self.get_rps_share(process=True),
+            'retries': self.options.retries,
+            'retry_backoff': self.options.retry_backoff,
+            'negative_ttl': self.options.negative_ttl
+        })
+
+        # every process should always have an entity waiting for it
+        num_workers = max(self.options.num_workers, 2 * self.options.processes)
+
+        return [
+            ProcessValidationWorker(
+                'validation_worker_{}'.format(i),
+                queue,
+                seen_list,
+                check_pool,
+                result,
+                self.process_pool,
+                self.client.embedded_cache,
+                memo,
+                file_checker
+            )
+            for i in range(0, num_workers)
+        ]
+
     def run(self):
         result = None
 
         if self.options.read:
             result = Result.from_file(self.endpoint)
         else:
+            self.load_baseline()
+
             try:
-                self.client = Client(self.endpoint)
+                self.client = self.create_client()
             except EndpointNotReachableException:
                 Output.message('Endpoint {} is not reachable, aborting validation.', self.endpoint)
                 exit(1)
@@ -115,6 +483,9 @@ class Validator:
         self.handle_result(result)
 
     def validate(self):
+        started = datetime.now()
+        metrics.reset()
+
         Output.message("Beginning validation of {}", self.endpoint)
         Output.message("Found '{}'", self.client.system.get_name())
         Output.add_progress_bar('validation_progress', 'Validating')
@@ -122,55 +493,292 @@ class Validator:
         bodies = self.client.system.get_body()
         num_bodies = len(bodies)
 
-        unprocessed_entities = EntityQueue(maxsize = self.options.queue_size)
+        unprocessed_entities = self.create_entity_queue()
+        check_pool = Pool(self.client.transport, self.options)
+
+        # the file check stage runs a thread pool per deferred check
+        num_file_checks = 0
+        if self.options.file_check_workers > 0:
+            num_file_checks = self.options.file_check_workers * check_pool.count_deferred_checks()
+
+        # every walker, worker, prefetch and file check may have a request in flight at the same time
+        self.client.transport.resize(
+            num_bodies + self.options.num_workers + self.options.prefetch + num_file_checks + 1
+        )
 
-        seen_list = SeenList()
-        result = Result()
-        check_pool = Pool()
+        seen_list = self.create_seen_list()
+        walker_seen_list = self.create_seen_list(shared=True)
+        result = Result(max_samples=self.options.max_affected_entities or None)
 
         result.system = self.client.system
+        result.started = started
+
+        # messages are written to the result file while validating
+        if self.options.format == 'ndjson':
+            result.stream = ResultStream(self.options.result)
+
+        if self.options.checkpoint is not None:
+            result.checkpoint = Checkpoint(self.options.checkpoint, resume=self.resume_state is not None)
+
+        resumed = self.resume(unprocessed_entities, seen_list, result)
+        finished_walkers = self.resume_state['walkers'] if self.resume_state is not None else {}
 
         walker_threads = []
-        worker_threads = []
 
         for body in bodies:
-            walker = self.client.create_body_walker(body, unprocessed_entities)
+            # bodies which were completely walked have all their entities validated or pending
+            if finished_walkers.get(body.get_id(), {}).get('finished', False):
+                continue
+
+            walker = self.client.create_body_walker(body, unprocessed_entities, walker_seen_list)
             walker_threads.append(walker)
 
-        for i in range(0, self.options.num_workers):
-            worker = ValidationWorker(
-                'validation_worker_{}'.format(i),
+        memo = self.create_memo(check_pool)
+        file_checker = self.create_file_checker(result)
+        worker_threads = self.create_validation_workers(
+            unprocessed_entities,
+            seen_list,
+            check_pool,
+            result,
+            memo,
+            file_checker
+        )
+
+        checkpointer = None
+        if result.checkpoint is not None:
+            checkpointer = Checkpointer(
+                result.checkpoint,
+                self.endpoint,
                 unprocessed_entities,
-                seen_list,
-                check_pool,
-                result
+                walker_threads,
+                interval=self.options.checkpoint_interval,
+                finished_walkers={id: progress for id, progress in finished_walkers.items() if progress['finished']},
+                file_checker=file_checker
             )
-            worker_threads.append(worker)
+            checkpointer.start()
 
-        for thread in walker_threads:
-            thread.start()
+        gauges = {'queue_depth': unprocessed_entities.qsize}
+        if file_checker is not None:
+            gauges['file_check_pending'] = lambda: len(file_checker.get_pending())
 
-        # let the walkers walk a little
-        while unprocessed_entities.empty():
-            pass
+        sampler = MetricsSampler(metrics, gauges)
+        sampler.start()
 
-        for thread in worker_threads:
+        for thread in walker_threads + worker_threads:
             thread.start()
 
-        for thread in worker_threads:
+        # workers return once all walkers finished and the queue is drained
+        for thread in walker_threads + worker_threads:
             thread.join()
 
+        # the last entities of the workers may still wait for their files
+        if file_checker is not None:
+            file_checker.join()
+
+        sampler.stop()
+
         Output.message("Validation finished")
 
+        if checkpointer is not None:
+            checkpointer.stop()
+            result.checkpoint.close()
+
+        result.merge(resumed)
+
+        for worker in worker_threads:
+            result.merge(worker.accumulator)
+
+        if file_checker is not None:
+            result.merge(file_checker.accumulator)
+            result.files = file_checker.get_statistics()
+
+        if self.options.processes > 0:
+            self.process_pool.shutdown()
+
+        self.client.close()
+
+        if self.client.transport.rate_limiter is not None:
+            self.client.transport.rate_limiter.log_limits()
+
+        self.client.update_network_statistics()
         result.network = self.client.network
+        result.unreachable = self.client.get_failed_urls()
+        self.client.transport.close()
+        result.cache = self.client.cache.statistics()
+
+        if memo is not None:
+            result.memo = memo.get_statistics()
+
         result.total_entities = len(seen_list)
 
+        if self.modified_since is not None:
+            self.carry_forward(result, seen_list, walker_threads)
+
+        result.queue = unprocessed_entities.get_statistics()
+        unprocessed_entities.close()
+        result.deduplication = seen_list.statistics()
+        result.deduplication['cross_body_duplicates'] = walker_seen_list.statistics()['cross_owner_duplicates']
+
+        walker_seen_list.clear()
+        seen_list.clear()
+
+        self.export_metrics(result)
+
         return result
 
+    def export_metrics(self, result):
+        """ Adds the metrics of the run to the result and writes them to the metrics file """
+        lookups = result.cache.get('lookups', 0)
+
+        metrics.set_gauge('cache_lookups', lookups)
+        metrics.set_gauge('cache_hits', result.cache.get('hits', 0))
+        metrics.set_gauge('cache_hit_ratio', result.cache.get('hits', 0) / lookups if lookups > 0 else 0)
+        metrics.set_gauge('queue_max_depth', result.queue.get('max_depth', 0))
+        metrics.set_gauge('entities', result.total_entities)
+
+        result.metrics = metrics.to_dict()
+
+        if self.options.metrics_file is not None:
+            metrics.write_prometheus(self.options.metrics_file)
+            Output.message('Metrics have been written to {}', self.options.metrics_file)
+
+    def load_baseline(self):
+        """
+            Loads the baseline result of an incremental validation
+
+            Unless a modified_since timestamp is given, entities changed
+            since the start of the baseline validation are validated.
+        """
+        modified_since = self.options.modified_since
+
+        if self.options.baseline is not None:
+            self.baseline = Result.from_file(self.options.baseline)
+
+            if modified_since is None:
+                modified_since = self.baseline.compiled_result.get('started') or \
+                    self.baseline.compiled_result.get('timestamp')
+
+            if self.baseline.is_sampled():
+                Output.message('The baseline only lists samples of the affected entities, '
+                               'not all messages of unchanged entities can be carried forward')
+
+        if modified_since is None:
+            return
+
+        try:
+            # timestamps without a timezone are local times
+            self.modified_since = datetime.fromisoformat(modified_since).astimezone()
+        except ValueError:
+            Output.message('{} is not a valid ISO 8601 timestamp, aborting validation.', modified_since)
+            exit(1)
+
+    def carry_forward(self, result, seen_list, walkers):
+        """
+            Carries the baseline messages of unchanged entities forward
+
+            Changed entities were validated again, all others keep the
+            messages they had in the baseline. Entities created since the
+            baseline are told apart from changed ones by their creation
+            date, so that the totals stay accurate over many incremental
+            validations. Deleted entities lose their messages and are no
+            longer counted.
+        """
+        carried = ResultAccumulator(result.max_samples)
+        num_changed = result.total_entities
+        num_created = sum(walker.num_created for walker in walkers)
+        num_deleted = sum(walker.num_deleted for walker in walkers)
+
+        deleted_ids = set()
+        for walker in walkers:
+            deleted_ids.update(walker.deleted_ids)
+
+        if self.baseline is not None:
+            failed_entities = set()
+
+            # a streamed result lists every message it counts, the carried ones included
+            records = []
+
+            for entity_type, entity_id, severity, description in self.baseline.get_message_occurences():
+                if entity_id in seen_list or entity_id in deleted_ids:
+                    continue
+
+                carried.add_message(entity_type, entity_id, severity, description)
+                failed_entities.add(entity_id)
+
+                if result.stream is not None:
+                    records.append(message_record(entity_type, entity_id, severity, description))
+
+            carried.failed_entities = len(failed_entities)
+
+            for entity_id in self.baseline.compiled_result.get('fatal_objects', []):
+                if entity_id not in seen_list and entity_id not in deleted_ids:
+                    carried.fatal_objects.append(entity_id)
+
+                    if result.stream is not None:
+                        records.append(fatal_record(entity_id))
+
+            if len(records) > 0:
+                result.stream.write_records(records)
+
+            result.total_entities = self.baseline.compiled_result['counts']['total'] + num_created - num_deleted
+
+        result.merge(carried)
+
+        result.incremental = {
+            'baseline': self.options.baseline,
+            'modified_since': self.modified_since.isoformat(),
+            'changed': num_changed,
+            'created': num_created,
+            'deleted': num_deleted,
+            'carried_failed': carried.failed_entities,
+            'carried_fatal': len(carried.fatal_objects)
+        }
+
+    def resume(self, queue, seen_list, result):
+        """
+            Restores the progress of a previous run from its checkpoint
+
+            Entities validated in that run are added to the seen list and
+            their messages to the returned accumulator, pending entities
+            are restored into the queue and loaded from the cache once a
+            worker gets them.
+        """
+        resumed = ResultAccumulator(result.max_samples)
+
+        if self.resume_state is None:
+            return resumed
+
+        # the result stream is written from scratch, the journal knows every entity validated so far
+        num_validated = Checkpoint.replay(self.options.resume, seen_list, resumed, result.stream)
+        queue.restore(self.resume_state['pending'])
+
+        Output.message(
+            'Resuming from {} with {} validated and {} pending entities',
+            self.options.resume,
+            num_validated,
+            len(self.resume_state['pending'])
+        )
+
+        return resumed
+
     def handle_result(self, result):
-        formatted_result = result.text()
-        if self.options.format == 'json':
+        if result.stream is not None:
+            result.finish_stream()
+            Output.message('Result has been written to {} as {}.', self.options.result, self.options.format)
+            exit(0)
+
+        if self.options.format == 'text' and self.options.result is not None:
+            # the text result is written directly, streamed results are not loaded into memory
+            with open(self.options.result, 'w+') as f:
+                result.write_text(f)
+                Output.message('Result has been written to {} as {}.', self.options.result, self.options.format)
+                exit(0)
+
+        # a stored result is always written as a complete json document
+        if self.options.format in ['json', 'ndjson']:
             formatted_result = result.json()
+        else:
+            formatted_result = result.text()
 
         if Output.porcelain or self.options.result is not None:
             with open(self.options.result, 'w+') as f:
@@ -181,13 +789,27 @@ class Validator:
         print(formatted_result)
 
     @staticmethod
-    def get_version():
+    def get_version_ident():
         ident = VALIDATOR_VERSION.replace('$', '').split(' ')
-        version = 'OParl Validator {}\n(c) 2017, OParl Contributors'
 
         if len(ident) == 1:
-            ident = ''
-        else:
-            ident = ident[1][:8]
+            return ''
+
+        return ident[1][:8]
+
+    @staticmethod
+    def get_liboparl_version():
+        """ The version of liboparl's typelib and a digest of the typelib file, which differs for every build """
+        repository = gi.Repository.get_default()
+        version = repository.get_version('OParl')
+
+        with open(repository.get_typelib_path('OParl'), 'rb') as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+
+        return '{}-{}'.format(version, digest[:8])
+
+    @staticmethod
+    def get_version():
+        version = 'OParl Validator {}\n(c) 2017, OParl Contributors'
 
-        return version.format(ident)
+        return version.format(Validator.get_version_ident())
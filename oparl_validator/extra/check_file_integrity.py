@@ -0,0 +1,316 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2017 Stefan Graupner
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import hashlib
+import re
+from threading import Lock
+import time
+
+import requests
+
+from oparl_validator.core.check import Check, CheckResult
+from oparl_validator.core.rate_limiter import BandwidthBudget
+from oparl_validator.core.transport import Transport
+
+# bytes read from a download at once
+CHUNK_SIZE = 64 * 1024
+
+CONTENT_RANGE_PATTERN = re.compile(r'bytes \d+-\d+/(\d+)')
+
+
+def get_mime_type(content_type):
+    """ The mime type of a Content-Type header without its parameters """
+    if content_type is None:
+        return None
+
+    return content_type.split(';')[0].strip().lower()
+
+
+class CheckFileIntegrity (Check):
+    """
+        Compare the declared size, mimeType and sha1Checksum of files
+        with their downloads
+
+        Downloads are streamed in chunks and hashed incrementally, at
+        most `max_file_bytes` of a file are read. Larger files are either
+        read only up to that limit, which leaves their checksum
+        unverified, or sampled with HTTP Range requests, which verify
+        their size. All downloads share a global bandwidth budget.
+
+        Opt-in with the `verify_files` option.
+    """
+
+    # files may change without their entity changing
+    memoizable = False
+
+    # the downloads are run by the file check stage if there is one
+    deferred = True
+
+    def __init__(self):
+        self.max_file_bytes = 64 * 1024 * 1024
+        self.range_samples = 0
+        self.budget = BandwidthBudget()
+
+        self.lock = Lock()
+        self.statistics = {
+            'downloaded': 0,
+            'truncated': 0,
+            'sampled': 0,
+            'bytes': 0,
+            'seconds': 0.0
+        }
+        self.first_start = None
+        self.last_end = None
+
+    def configure(self, options):
+        if options is None or not options.verify_files:
+            return False
+
+        self.max_file_bytes = options.max_file_bytes
+        self.range_samples = options.range_samples
+        self.budget = BandwidthBudget(options.file_bandwidth * 1000000)
+
+        return True
+
+    def get_transport(self):
+        if self.transport is None:
+            self.transport = Transport()
+
+        return self.transport
+
+    def evaluates_entity_type(self):
+        return 'file'
+
+    def evaluate(self, entity):
+        urls = self.get_urls(entity)
+        outcomes = {
+            url: self.check_url(self.get_transport(), url)
+            for url in urls.values()
+            if url is not None
+        }
+
+        return self.evaluate_outcomes(urls, outcomes, self.get_context(entity))
+
+    def get_urls(self, entity):
+        return {
+            'file': entity.get_download_url() or entity.get_access_url()
+        }
+
+    def get_context(self, entity):
+        # liboparl reports undeclared sizes as 0
+        return {
+            'size': entity.get_size() or None,
+            'mime_type': entity.get_mime_type(),
+            'sha1_checksum': entity.get_sha1_checksum()
+        }
+
+    def check_url(self, transport, url):
+        """
+            Download an url and return its size, mime type and sha1
+
+            The size is None if it could not be determined and the sha1
+            is None if the file was not read completely.
+        """
+        outcome = {
+            'status': None,
+            'error': None,
+            'mime_type': None,
+            'size': None,
+            'sha1': None,
+            'sampled': False
+        }
+
+        start = time.perf_counter()
+        num_bytes = 0
+
+        try:
+            response = transport.get(url, stream=True)
+            archive = transport.archive_stream(response)
+
+            try:
+                outcome['status'] = response.status_code
+                outcome['mime_type'] = get_mime_type(response.headers.get('content-type'))
+
+                if response.status_code != 200:
+                    return outcome
+
+                content_length = response.headers.get('content-length')
+                if content_length is not None and content_length.isdigit():
+                    outcome['size'] = int(content_length)
+
+                if outcome['size'] is not None and outcome['size'] > self.max_file_bytes and self.range_samples > 0:
+                    response.close()
+                    num_bytes = self.sample(transport, url, outcome)
+                else:
+                    num_bytes = self.download(response, outcome, archive)
+            finally:
+                response.close()
+
+                if archive is not None:
+                    archive.close()
+        except requests.exceptions.RequestException as exception:
+            outcome['error'] = type(exception).__name__
+
+        self.record_download(num_bytes, start, outcome)
+        transport.network_statistics.record_streamed(num_bytes)
+
+        return outcome
+
+    def download(self, response, outcome, archive=None):
+        """
+            Reads a response in chunks up to the byte limit, returns the number of bytes read
+
+            The chunks read are recorded into the archive stream if one
+            is given, see Transport.archive_stream.
+        """
+        sha1 = hashlib.sha1()
+        num_bytes = 0
+
+        for chunk in response.iter_content(CHUNK_SIZE):
+            self.budget.consume(len(chunk))
+            num_bytes += len(chunk)
+
+            if archive is not None:
+                archive.write(chunk)
+
+            if num_bytes > self.max_file_bytes:
+                return num_bytes
+
+            sha1.update(chunk)
+
+        outcome['size'] = num_bytes
+        outcome['sha1'] = sha1.hexdigest()
+
+        return num_bytes
+
+    def sample(self, transport, url, outcome):
+        """
+            Reads evenly spaced ranges of a large file, returns the number of bytes read
+
+            Every range response states the total size of the file, a
+            server ignoring the ranges ends the sampling.
+        """
+        outcome['sampled'] = True
+        num_bytes = 0
+
+        positions = self.range_samples
+        last_offset = max(outcome['size'] - CHUNK_SIZE, 0)
+
+        for index in range(positions):
+            offset = last_offset * index // max(positions - 1, 1)
+            headers = {'Range': 'bytes={}-{}'.format(offset, offset + CHUNK_SIZE - 1)}
+
+            response = transport.get(url, headers=headers, stream=True)
+            archive = transport.archive_stream(response)
+
+            try:
+                if response.status_code != 206:
+                    outcome['sampled'] = False
+                    return num_bytes
+
+                match = CONTENT_RANGE_PATTERN.match(response.headers.get('content-range', ''))
+                if match is not None:
+                    outcome['size'] = int(match.group(1))
+
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    self.budget.consume(len(chunk))
+                    num_bytes += len(chunk)
+
+                    if archive is not None:
+                        archive.write(chunk)
+            finally:
+                response.close()
+
+                if archive is not None:
+                    archive.close()
+
+        return num_bytes
+
+    def record_download(self, num_bytes, start, outcome):
+        end = time.perf_counter()
+
+        with self.lock:
+            self.statistics['bytes'] += num_bytes
+            self.statistics['seconds'] += end - start
+
+            if outcome['sampled']:
+                self.statistics['sampled'] += 1
+            elif outcome['status'] == 200 and outcome['sha1'] is None:
+                self.statistics['truncated'] += 1
+            elif outcome['sha1'] is not None:
+                self.statistics['downloaded'] += 1
+
+            if self.first_start is None:
+                self.first_start = start
+
+            self.last_end = end
+
+    def evaluate_outcomes(self, urls, outcomes, context=None):
+        results = []
+
+        # missing urls are reported by CheckFileReachability
+        if urls['file'] is None:
+            return results
+
+        outcome = outcomes[urls['file']]
+
+        if outcome['error'] is not None:
+            results.append(CheckResult('info', 'File could not be verified, its download failed'))
+            return results
+
+        if outcome['status'] != 200:
+            results.append(CheckResult('warning', 'File could not be downloaded for verification'))
+            return results
+
+        if context['size'] is not None and outcome['size'] is not None and context['size'] != outcome['size']:
+            results.append(CheckResult('error', 'File size does not match the size of the download'))
+
+        mime_type = get_mime_type(context['mime_type'])
+        if mime_type is not None and outcome['mime_type'] is not None and mime_type != outcome['mime_type']:
+            results.append(CheckResult('warning', 'File mimeType does not match the Content-Type of the download'))
+
+        if context['sha1_checksum'] is not None:
+            if outcome['sha1'] is None:
+                results.append(CheckResult(
+                    'info',
+                    'File sha1Checksum was not verified, the file exceeds the download limit'
+                ))
+            elif context['sha1_checksum'].lower() != outcome['sha1']:
+                results.append(CheckResult('error', 'File sha1Checksum does not match the checksum of the download'))
+
+        return results
+
+    def get_statistics(self):
+        with self.lock:
+            statistics = dict(self.statistics)
+
+            # throughput of all downloads together, from the start of the first to the end of the last
+            elapsed = 0
+            if self.first_start is not None:
+                elapsed = self.last_end - self.first_start
+
+        statistics['seconds'] = round(statistics['seconds'], 3)
+        statistics['megabytes_per_second'] = statistics['bytes'] / elapsed / 1000000 if elapsed > 0 else 0
+
+        return statistics
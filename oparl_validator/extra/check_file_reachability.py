@@ -22,51 +22,78 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-import requests
-
-from core.check import Check, CheckResult
+from oparl_validator.core.check import Check, CheckResult
+from oparl_validator.core.file_checker import get_url_outcome
+from oparl_validator.core.transport import Transport
 
 class CheckFileReachability (Check):
+    # files may become (un)reachable without their entity changing
+    memoizable = False
+
+    # the urls are requested by the file check stage if there is one
+    deferred = True
+
+    def get_transport(self):
+        if self.transport is None:
+            self.transport = Transport()
+
+        return self.transport
+
     def evaluates_entity_type(self):
         return 'file'
 
     def evaluate(self, entity):
+        urls = self.get_urls(entity)
+        outcomes = {
+            url: self.check_url(self.get_transport(), url)
+            for url in set(urls.values())
+            if url is not None
+        }
+
+        return self.evaluate_outcomes(urls, outcomes)
+
+    def get_urls(self, entity):
+        return {
+            'access': entity.get_access_url(),
+            'download': entity.get_download_url()
+        }
+
+    def check_url(self, transport, url):
+        return get_url_outcome(transport, url)
+
+    def evaluate_outcomes(self, urls, outcomes, context=None):
         results = []
 
-        results.join(self.check_access_url(entity))
-        results.join(self.check_download_url(entity))
+        results.extend(self.check_access_url(urls['access'], outcomes))
+        results.extend(self.check_download_url(urls['download'], outcomes))
 
         return results
 
-    def check_access_url(self, entity):
+    def check_access_url(self, url, outcomes):
         results = []
 
-        if entity.get_access_url() is None:
+        if url is None:
             results.append(CheckResult('error', 'Object is missing an access url'))
             return results
 
-        try:
-            head = requests.head(entity.get_access_url())
-        except requests.exceptions.RequestException:
+        if outcomes[url]['error'] is not None:
             results.append(CheckResult('warning', 'Failed to connect to access url'))
             return results
 
         return results
 
-    def check_download_url(self, entity):
+    def check_download_url(self, url, outcomes):
         results = []
 
-        if entity.get_download_url() is None:
+        if url is None:
             results.append(CheckResult('info', 'It is recommended to provide a separate download url'))
             return results
 
-        try:
-            head = requests.head(entity.get_download_url())
-        except requests.exceptions.RequestException:
+        if outcomes[url]['error'] is not None:
             results.append(CheckResult('warning', 'Failed to connect to download url'))
             return results
 
-        if 'content-disposition' not in head.headers:
-            results.append('warning', 'Download url should have a Content-Disposition header')
+        if 'content-disposition' not in outcomes[url]['headers']:
+            results.append(CheckResult('warning', 'Download url should have a Content-Disposition header'))
 
-        return results
\ No newline at end of file
+        return results
@@ -15,6 +15,7 @@ setup(
     long_description=open('README.md').read(),
     name = 'oparl_validator',
     packages=['oparl_validator', 'oparl_validator.core', 'oparl_validator.extra'],
+    python_requires='>=3.7',
     url='https://github.com/OParl/validator',
     version= 'master'
 )
\ No newline at end of file
@@ -0,0 +1,174 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2017 Stefan Graupner
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import time
+
+import pytest
+import requests
+
+from benchmarks.oparl_server import Configuration, OParlServer
+from oparl_validator.core.transport import Transport
+
+
+@pytest.fixture(scope='module')
+def server():
+    server = OParlServer(Configuration(papers=5, file_size=200 * 1024)).start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+def record(server, archive_file, urls):
+    """ Requests the urls with a recording transport, returns their response bodies """
+    transport = Transport()
+    transport.record(str(archive_file))
+
+    bodies = [transport.get(url).content for url in urls]
+    transport.close()
+
+    return bodies
+
+
+def replay(archive_file, **kwargs):
+    transport = Transport()
+    transport.replay(str(archive_file), **kwargs)
+
+    return transport
+
+
+def test_replay_serves_the_recorded_responses(server, tmp_path):
+    archive_file = tmp_path / 'endpoint.archive'
+    urls = [server.endpoint, server.generator.url('/oparl/v1/body/0/paper')]
+    bodies = record(server, archive_file, urls)
+
+    transport = replay(archive_file)
+    num_requests = server.num_requests
+
+    for url, body in zip(urls, bodies):
+        response = transport.get(url)
+
+        assert response.status_code == 200
+        assert response.content == body
+
+    assert transport.get(server.endpoint).json()['id'] == server.endpoint
+    assert server.num_requests == num_requests
+    assert transport.statistics()['replayed'] == {'served': 3, 'missing': 0}
+
+
+def test_requests_missing_in_the_archive_fail(server, tmp_path):
+    archive_file = tmp_path / 'endpoint.archive'
+    record(server, archive_file, [server.endpoint])
+
+    transport = replay(archive_file)
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        transport.get(server.generator.url('/oparl/v1/body'))
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        transport.head(server.endpoint)
+
+    assert transport.statistics()['replayed']['missing'] == 2
+
+
+def test_repeated_requests_are_served_in_order(server, tmp_path):
+    archive_file = tmp_path / 'endpoint.archive'
+    writer = Transport()
+    writer.record(str(archive_file))
+
+    etag = writer.get(server.endpoint).headers['etag']
+    assert writer.get(server.endpoint, headers={'If-None-Match': etag}).status_code == 304
+    writer.close()
+
+    transport = replay(archive_file)
+
+    # the last recorded response is repeated
+    assert [transport.get(server.endpoint).status_code for _ in range(3)] == [200, 304, 304]
+
+
+def test_streamed_downloads_are_recorded_as_read(server, tmp_path):
+    archive_file = tmp_path / 'endpoint.archive'
+    url = server.generator.url('/oparl/v1/body/0/file/0-0/download')
+
+    transport = Transport()
+    transport.record(str(archive_file))
+
+    response = transport.get(url, stream=True)
+    archive = transport.archive_stream(response)
+    chunks = []
+
+    for chunk in response.iter_content(64 * 1024):
+        chunks.append(chunk)
+        archive.write(chunk)
+
+        if len(chunks) == 2:
+            break
+
+    response.close()
+    archive.close()
+    transport.close()
+
+    replayed = replay(archive_file).get(url, stream=True)
+
+    assert replayed.headers['content-length'] == response.headers['content-length']
+    assert b''.join(replayed.iter_content(64 * 1024)) == b''.join(chunks)
+    replayed.close()
+
+
+def test_replay_with_latency(server, tmp_path):
+    archive_file = tmp_path / 'endpoint.archive'
+    record(server, archive_file, [server.endpoint])
+
+    transport = replay(archive_file, latency=True)
+
+    start = time.monotonic()
+    response = transport.get(server.endpoint)
+
+    assert response.status_code == 200
+    assert time.monotonic() - start >= response.elapsed.total_seconds()
+
+
+def test_replay_retries_like_the_recording(tmp_path):
+    server = OParlServer(Configuration(papers=5, error_rate=0.5)).start()
+    archive_file = tmp_path / 'errors.archive'
+    urls = [server.generator.url(path) for path in ['/oparl/v1/body/0/paper', '/oparl/v1/body', '/oparl/v1/body/0']]
+
+    writer = Transport(retry_backoff=0)
+    writer.record(str(archive_file))
+    recorded = [writer.get(url).status_code for url in urls]
+    writer.close()
+
+    assert server.num_requests > len(urls)
+
+    server.shutdown()
+    server.server_close()
+
+    transport = replay(archive_file)
+    started = time.time()
+
+    # the failed attempts are replayed first and retried without waiting
+    assert [transport.get(url).status_code for url in urls] == recorded
+    assert transport.statistics()['replayed']['served'] == server.num_requests
+    assert time.time() - started < 1
@@ -0,0 +1,147 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2017 Stefan Graupner
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from queue import Empty, Full
+
+import pytest
+
+from oparl_validator.core.entity_queue import EntityQueue
+
+
+def create_queue(maxsize=2, unrecoverable=()):
+    """ Queue of strings, the unrecoverable ones cannot be read back from the overflow log """
+    queue = EntityQueue(
+        maxsize=maxsize,
+        serialize=lambda item: item,
+        deserialize=lambda line: None if line in unrecoverable else line
+    )
+    queue.add_enqueuing_flag('producer')
+
+    return queue
+
+
+def drain(queue):
+    queue.update_enqueuing_flag('producer', False)
+
+    items = []
+    while True:
+        item = queue.get()
+
+        if item is None:
+            return items
+
+        items.append(item)
+
+
+def test_overflow_is_spilled_and_read_back_in_order():
+    queue = create_queue()
+    items = ['entity_{}'.format(index) for index in range(10)]
+
+    for item in items:
+        queue.put(item)
+
+    statistics = queue.get_statistics()
+    assert statistics['spilled'] == 8
+    assert statistics['depth'] == 10
+
+    assert drain(queue) == items
+    assert queue.get_statistics()['spill_reads'] == 8
+
+
+def test_spill_log_is_reused_once_read_back():
+    queue = create_queue(maxsize=1)
+
+    queue.put('a')
+    queue.put('b')
+    assert queue.get() == 'a'
+    assert queue.get() == 'b'
+
+    queue.put('c')
+    queue.put('d')
+
+    assert drain(queue) == ['c', 'd']
+    assert queue.spill_generation == 2
+
+
+def test_restored_entities_are_read_after_queued_ones():
+    queue = create_queue(maxsize=5)
+
+    queue.put('queued')
+    queue.restore(['restored_1', 'restored_2'])
+
+    assert drain(queue) == ['queued', 'restored_1', 'restored_2']
+
+
+def test_snapshot_holds_in_flight_queued_and_spilled_entities():
+    queue = create_queue(maxsize=2)
+
+    for item in ['a', 'b', 'c', 'd']:
+        queue.put(item)
+
+    assert queue.get() == 'a'
+    assert queue.snapshot() == ['a', 'b', 'c', 'd']
+
+    assert queue.get() == 'b'
+    assert queue.get() == 'c'
+    assert queue.snapshot() == ['c', 'd']
+
+
+def test_unrecoverable_entities_are_skipped():
+    unrecoverable = ['bad_{}'.format(index) for index in range(3000)]
+    queue = create_queue(maxsize=1, unrecoverable=set(unrecoverable))
+
+    queue.put('first')
+    for item in unrecoverable:
+        queue.put(item)
+    queue.put('last')
+
+    assert drain(queue) == ['first', 'last']
+    assert queue.get_statistics()['unrecoverable'] == 3000
+
+
+def test_get_times_out_while_producers_enqueue():
+    queue = create_queue()
+
+    with pytest.raises(Empty):
+        queue.get(timeout=0.05)
+
+    with pytest.raises(Empty):
+        queue.get(block=False)
+
+
+def test_get_returns_none_once_drained():
+    queue = create_queue()
+
+    assert drain(queue) == []
+    assert queue.empty()
+
+
+def test_put_blocks_without_spilling():
+    queue = EntityQueue(maxsize=1)
+    queue.put('a')
+
+    assert queue.full()
+
+    with pytest.raises(Full):
+        queue.put('b', timeout=0.05)
@@ -0,0 +1,73 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2017 Stefan Graupner
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from oparl_validator.core.metrics import Histogram
+
+
+def test_quantile_of_an_empty_histogram():
+    assert Histogram().quantile(0.5) == 0
+
+
+def test_quantile_interpolates_within_a_bucket():
+    histogram = Histogram(buckets=(1, 2, 3))
+
+    for value in [1.1, 1.5, 1.9, 1.95]:
+        histogram.observe(value)
+
+    assert histogram.quantile(0.5) == 1.5
+    assert histogram.quantile(1) == 1.95
+
+
+def test_quantiles_across_buckets():
+    histogram = Histogram(buckets=(1, 2, 3))
+
+    for value in [0.5] * 50 + [2.5] * 50:
+        histogram.observe(value)
+
+    assert histogram.quantile(0.25) == 0.5
+    assert 2 < histogram.quantile(0.9) <= 2.5
+
+
+def test_quantile_beyond_the_last_bucket_is_bounded_by_the_maximum():
+    histogram = Histogram(buckets=(1,))
+
+    histogram.observe(0.5)
+    histogram.observe(10)
+
+    assert 1 < histogram.quantile(0.99) <= 10
+    assert histogram.quantile(1) == 10
+
+
+def test_merged_histograms_add_up():
+    first = Histogram(buckets=(1, 2))
+    second = Histogram(buckets=(1, 2))
+
+    first.observe(0.5)
+    second.observe(1.5)
+    second.observe(3)
+    first.merge(second)
+
+    assert first.count == 3
+    assert first.max == 3
+    assert first.get_cumulative_counts() == [(1, 1), (2, 2), (float('inf'), 3)]
@@ -0,0 +1,59 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2017 Stefan Graupner
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import json
+from threading import Lock
+
+from oparl_validator.core.prefetcher import Prefetcher
+
+ENDPOINT = 'http://localhost/oparl/v1/system'
+MISSING = 'http://localhost/oparl/v1/missing'
+
+
+class EmptyCache:
+    def get_many(self, keys):
+        return {}
+
+
+def test_failed_urls_are_not_prefetched_again():
+    fetched = []
+    lock = Lock()
+
+    def fetch(url):
+        with lock:
+            fetched.append(url)
+
+        return None
+
+    prefetcher = Prefetcher(fetch, EmptyCache(), ENDPOINT, max_in_flight=2)
+    document = json.dumps({'id': 'http://localhost/oparl/v1/paper/1', 'mainFile': MISSING})
+
+    for _ in range(20):
+        prefetcher.schedule_from(document)
+        prefetcher.wait(MISSING)
+
+    prefetcher.executor.shutdown(wait=True)
+
+    assert fetched == [MISSING]
+    assert prefetcher.statistics['failed'] == 1
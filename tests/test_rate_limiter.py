@@ -0,0 +1,188 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2017 Stefan Graupner
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from email.utils import formatdate
+import time
+
+import pytest
+
+from oparl_validator.core.output import Output
+from oparl_validator.core.rate_limiter import BandwidthBudget, HostLimiter, get_retry_after
+
+
+@pytest.fixture(autouse=True)
+def silent_output():
+    Output.initialize(silent=True)
+
+
+def release_window(limiter, latency=0.01, status_code=200, failures=0):
+    """ Releases a full window of requests, the first `failures` of them without a response """
+    sent = time.monotonic()
+
+    for index in range(int(limiter.limit)):
+        limiter.in_flight += 1
+        limiter.release(sent, latency, None if index < failures else status_code)
+
+
+def test_retry_after_in_seconds():
+    assert get_retry_after({'retry-after': '7'}) == 7
+    assert get_retry_after({'retry-after': '-3'}) == 0
+
+
+def test_retry_after_as_date():
+    delay = get_retry_after({'retry-after': formatdate(time.time() + 30, usegmt=True)})
+
+    assert 28 <= delay <= 30
+
+
+def test_retry_after_missing_or_invalid():
+    assert get_retry_after({}) is None
+    assert get_retry_after({}, default=5) == 5
+    assert get_retry_after({'retry-after': 'soon'}, default=5) == 5
+
+
+def test_limit_grows_by_one_per_good_window():
+    limiter = HostLimiter('example.org', initial_limit=4, max_limit=6)
+
+    release_window(limiter)
+    assert limiter.get_statistics()['limit'] == 5
+
+    release_window(limiter)
+    release_window(limiter)
+    assert limiter.get_statistics()['limit'] == 6
+    assert limiter.get_statistics()['peak_limit'] == 6
+
+
+def test_limit_is_not_adjusted_within_a_window():
+    limiter = HostLimiter('example.org', initial_limit=4)
+
+    for _ in range(3):
+        limiter.in_flight += 1
+        limiter.release(time.monotonic(), 0.01, 200)
+
+    assert limiter.get_statistics()['limit'] == 4
+
+
+def test_failed_requests_halve_the_limit():
+    limiter = HostLimiter('example.org', initial_limit=8)
+
+    release_window(limiter, failures=1)
+
+    statistics = limiter.get_statistics()
+    assert statistics['limit'] == 4
+    assert statistics['errors'] == 1
+    assert statistics['decreases'] == 1
+
+
+def test_server_errors_count_as_failures():
+    limiter = HostLimiter('example.org', initial_limit=4)
+
+    release_window(limiter, status_code=500)
+
+    assert limiter.get_statistics()['limit'] == 2
+
+
+def test_rising_latency_decreases_the_limit():
+    limiter = HostLimiter('example.org', initial_limit=8)
+
+    release_window(limiter, latency=0.1)
+    assert limiter.get_statistics()['limit'] == 9
+
+    release_window(limiter, latency=0.5)
+    assert limiter.get_statistics()['limit'] == 6
+
+
+def test_small_latency_rises_are_noise():
+    limiter = HostLimiter('example.org', initial_limit=4)
+
+    release_window(limiter, latency=0.001)
+    release_window(limiter, latency=0.01)
+
+    assert limiter.get_statistics()['limit'] == 6
+
+
+def test_throttling_halves_the_limit_right_away():
+    limiter = HostLimiter('example.org', initial_limit=8)
+
+    limiter.in_flight += 1
+    limiter.release(time.monotonic(), 0.01, 429, retry_after=30)
+
+    statistics = limiter.get_statistics()
+    assert statistics['limit'] == 4
+    assert statistics['throttled'] == 1
+    assert limiter.blocked_until >= time.monotonic() + 29
+
+
+def test_requests_sent_before_a_decrease_do_not_decrease_again():
+    limiter = HostLimiter('example.org', initial_limit=8)
+    sent = time.monotonic()
+
+    for _ in range(3):
+        limiter.in_flight += 1
+        limiter.release(sent, 0.01, 503)
+
+    assert limiter.get_statistics()['limit'] == 4
+
+
+def test_limit_never_drops_below_one():
+    limiter = HostLimiter('example.org', initial_limit=1)
+
+    for _ in range(3):
+        limiter.in_flight += 1
+        limiter.release(time.monotonic(), 0.01, 429)
+
+    assert limiter.get_statistics()['limit'] == 1
+
+
+def test_initial_limit_is_capped():
+    assert HostLimiter('example.org', initial_limit=8, max_limit=2).get_statistics()['limit'] == 2
+
+
+def test_requests_are_spaced_below_the_ceiling():
+    limiter = HostLimiter('example.org', initial_limit=8, max_rps=50)
+
+    start = time.monotonic()
+    for _ in range(6):
+        limiter.acquire()
+
+    assert time.monotonic() - start >= 0.1
+
+
+def test_bandwidth_budget_holds_readers_back():
+    budget = BandwidthBudget(1000000)
+
+    start = time.monotonic()
+    for _ in range(4):
+        budget.consume(50000)
+
+    assert time.monotonic() - start >= 0.15
+
+
+def test_unlimited_bandwidth_budget():
+    budget = BandwidthBudget()
+
+    start = time.monotonic()
+    budget.consume(10 ** 9)
+
+    assert time.monotonic() - start < 0.1